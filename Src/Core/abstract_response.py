@@ -12,4 +12,10 @@ class abstract_response(abc.ABC):
         if len(data) == 0:
             raise operation_exception("Нет данных!")
 
-        return ""
\ No newline at end of file
+        return ""
+
+    # Сформировать ответ по частям для потоковой выдачи: сначала шапка, затем строки
+    # data - список или итератор (элементы могут строиться по мере выдачи)
+    # По умолчанию ответ выдается одной частью
+    def iter_build(self, data):
+        yield self.build(list(data))
@@ -0,0 +1,108 @@
+from Src.Core.validator import validator, argument_exception
+from datetime import datetime
+from decimal import Decimal
+from Src.Core.abstract_model import abstact_model
+from Src.Core.entity_model import entity_model
+from Src.Core.field_getter import field_getter
+from Src.Dtos.aggregation_dto import aggregation_dto
+
+
+"""
+Агрегация коллекции (count / sum / min / max) с группировкой по любым вложенным путям
+Выполняется одним проходом с хеш-группировкой
+"""
+class aggregator:
+    # Функции получения значений группировки
+    __keys: list = []
+
+    # Агрегаты: (наименование столбца, функция обновления, функция получения значения, функция)
+    __metrics: list = []
+
+    __group_by: list = []
+
+    def __init__(self, dto: aggregation_dto):
+        validator.validate(dto, aggregation_dto)
+        self.__group_by = list(dto.group_by)
+        self.__keys = [field_getter.create(path) for path in dto.group_by]
+        self.__metrics = []
+        for function, field in dto.aggregates:
+            caption = function if field == "" else f"{function}({field})"
+            getter = field_getter.create(field) if field != "" else None
+            self.__metrics.append((caption, aggregator.__updater(function), getter, function))
+
+    """
+    Выполнить агрегацию
+    Результат - список строк (словарей) в порядке появления групп
+    """
+    def build(self, data) -> list:
+        groups = {}
+        captions = {}
+        for item in data:
+            values = [getter(item) for getter in self.__keys]
+            key = tuple(aggregator.__group_key(path, value) for path, value in zip(self.__group_by, values))
+
+            state = groups.get(key)
+            if state is None:
+                state = [None] * len(self.__metrics)
+                groups[key] = state
+                captions[key] = [aggregator.__caption(value) for value in values]
+
+            for position, (caption, update, getter, function) in enumerate(self.__metrics):
+                value = item if getter is None else getter(item)
+                if value is not None:
+                    if function != "count":
+                        aggregator.__validate_operand(caption, function, value)
+                    try:
+                        state[position] = update(state[position], value)
+                    except TypeError:
+                        raise argument_exception(f"Значения {caption} разных типов и не сравниваются между собой!")
+
+        result = []
+        for key, state in groups.items():
+            row = dict(zip(self.__group_by, captions[key]))
+            for position, (caption, _, _, _) in enumerate(self.__metrics):
+                value = state[position]
+                row[caption] = 0 if value is None and caption.startswith("count") else value
+            result.append(row)
+
+        return result
+
+    # Функция обновления состояния агрегата
+    @staticmethod
+    def __updater(function: str):
+        if function == "count":
+            return lambda state, value: 1 if state is None else state + 1
+        if function == "sum":
+            return lambda state, value: value if state is None else state + value
+        if function == "min":
+            return lambda state, value: value if state is None or value < state else state
+        return lambda state, value: value if state is None or value > state else state
+
+    # Проверить значение агрегата: sum - только числа, min / max - числа, строки и даты
+    @staticmethod
+    def __validate_operand(caption: str, function: str, value):
+        numeric = isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+        if function == "sum" and not numeric:
+            raise argument_exception(f"Агрегат {caption} возможен только по числовому полю!")
+        if not numeric and not isinstance(value, (str, datetime)):
+            raise argument_exception(f"Агрегат {caption} возможен только по числам, строкам и датам!")
+
+    # Ключ группы. Модели группируются по уникальному коду
+    @staticmethod
+    def __group_key(path: str, value):
+        if isinstance(value, abstact_model):
+            return value.unique_code
+        try:
+            hash(value)
+        except TypeError:
+            raise argument_exception(f"Группировка по полю {path} невозможна: значение - список или словарь!")
+        return value
+
+    # Значение группы для вывода. Для моделей - наименование
+    @staticmethod
+    def __caption(value):
+        if isinstance(value, entity_model):
+            return value.name
+        if isinstance(value, abstact_model):
+            return value.unique_code
+        return value
@@ -0,0 +1,109 @@
+from Src.Core.validator import validator, argument_exception
+
+
+"""
+BK-дерево (Burkhard-Keller) для поиска строк в пределах расстояния Левенштейна
+Поиск отсекает ветви по неравенству треугольника и не сравнивает запрос со всеми ключами
+"""
+class bk_tree:
+    # Корневой узел: [ключ, элементы с этим ключом, дочерние узлы {расстояние: узел}]
+    __root: list = None
+
+    # Количество элементов
+    __count: int = 0
+
+    def __init__(self, data: list = None, key_getter=None):
+        self.__root = None
+        self.__count = 0
+        if data is None:
+            return
+
+        validator.validate(data, list)
+        if not callable(key_getter):
+            raise argument_exception("Не указана функция получения ключа!")
+
+        for item in data:
+            self.add(key_getter(item), item)
+
+    # Количество элементов в дереве
+    def __len__(self) -> int:
+        return self.__count
+
+    """
+    Добавить элемент с ключом
+    """
+    def add(self, key: str, item):
+        validator.validate(key, str)
+        self.__count += 1
+        if self.__root is None:
+            self.__root = [key, [item], {}]
+            return
+
+        node = self.__root
+        while True:
+            distance = bk_tree.distance(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [item], {}]
+                return
+            node = child
+
+    """
+    Найти элементы, ключ которых отличается от запроса не более чем на max_distance правок
+    Результат - список пар (расстояние, элемент), по возрастанию расстояния
+    """
+    def search(self, query: str, max_distance: int) -> list:
+        if self.__root is None:
+            return []
+        if max_distance < 0:
+            raise argument_exception("Некорректно указано расстояние!")
+
+        found = []
+        stack = [self.__root]
+        while len(stack) > 0:
+            key, items, children = stack.pop()
+            distance = bk_tree.distance(query, key)
+            if distance <= max_distance:
+                found.append((distance, key, items))
+
+            low = distance - max_distance
+            high = distance + max_distance
+            for child_distance, child in children.items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+
+        found.sort(key=lambda entry: (entry[0], entry[1]))
+        return [(distance, item) for distance, _, items in found for item in items]
+
+    """
+    Расстояние Левенштейна
+        - limit - если задан, расчет прекращается, как только расстояние гарантированно больше limit
+          (возвращается limit + 1)
+    """
+    @staticmethod
+    def distance(first: str, second: str, limit: int = None) -> int:
+        if first == second:
+            return 0
+        if len(first) < len(second):
+            first, second = second, first
+        if len(second) == 0:
+            return len(first)
+        if limit is not None and len(first) - len(second) > limit:
+            return limit + 1
+
+        previous = list(range(len(second) + 1))
+        for row, first_char in enumerate(first, 1):
+            current = [row]
+            for column, second_char in enumerate(second, 1):
+                cost = 0 if first_char == second_char else 1
+                current.append(min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + cost))
+
+            if limit is not None and min(current) > limit:
+                return limit + 1
+            previous = current
+
+        return previous[-1]
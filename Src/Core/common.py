@@ -20,6 +20,7 @@ class common:
     """
     Получить полный список полей любой модели
         - is_common = True - исключить из списка словари и списки
+    Служебные свойства моделей (entity_model.service_fields) в список не входят
     """
     @staticmethod
     def get_fields(source, is_common: bool = False) -> list:
@@ -27,6 +28,8 @@ class common:
             raise argument_exception("Некорректно переданы аргументы!")
 
         items = list(filter(lambda x: not x.startswith("_") , dir(source))) 
+        if isinstance(source, entity_model):
+            items = [item for item in items if item not in entity_model.service_fields()]
         result = []
 
         for item in items:
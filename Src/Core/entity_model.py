@@ -1,5 +1,7 @@
 from Src.Core.abstract_model import abstact_model
 from Src.Core.validator import validator
+from Src.Core.text_normalizer import text_normalizer
+import itertools
 
 
 """
@@ -7,6 +9,11 @@ from Src.Core.validator import validator
 """
 class entity_model(abstact_model):
     __name:str = ""
+    __search_key:str = ""
+
+    # Счетчик смены наименований (общий для всех моделей)
+    __renames = itertools.count(1)
+    __rename_version:int = 0
 
     # Наименование
     @property
@@ -17,7 +24,24 @@ class entity_model(abstact_model):
     def name(self, value:str):
         validator.validate(value, str)
         self.__name = value.strip()
+        self.__search_key = text_normalizer.normalize(self.__name)
+        entity_model.__rename_version = next(entity_model.__renames)
+
+    # Ключ поиска. Нормализованное наименование, пересчитывается при смене наименования
+    @property
+    def search_key(self) -> str:
+        return self.__search_key
 
+    # Служебные свойства: вычисляются по данным модели и не выводятся в ответах
+    @staticmethod
+    def service_fields() -> list:
+        return ["search_key"]
+
+    # Номер последней смены наименования среди всех моделей
+    # Структуры, построенные по наименованиям, сравнивают его, чтобы заметить переименование
+    @staticmethod
+    def rename_version() -> int:
+        return entity_model.__rename_version
 
     # Фабричный метод
     @staticmethod
@@ -25,5 +49,4 @@ class entity_model(abstact_model):
         item = entity_model()
         item.name = name
         return item
-    
-  
\ No newline at end of file
+
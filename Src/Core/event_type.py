@@ -0,0 +1,9 @@
+from enum import Enum
+
+class event_type(Enum):
+    """
+    Перечисление событий изменения данных репозитория
+    """
+    APPEND = "append"   # Добавлен элемент
+    REMOVE = "remove"   # Удален элемент
+    RESET = "reset"     # Данные инициализированы заново
@@ -0,0 +1,69 @@
+from Src.Core.validator import validator, argument_exception
+
+
+"""
+Дерево Фенвика (двоичное индексированное дерево) над целочисленными позициями
+Узлы хранятся в словаре - память расходуется только на позиции, по которым были изменения.
+Изменение и префиксная сумма выполняются за O(log size)
+"""
+class fenwick_tree:
+    # Размер диапазона позиций [0, size)
+    __size: int = 0
+
+    # Узлы дерева: позиция (с 1) -> частичная сумма
+    __nodes: dict = {}
+
+    def __init__(self, size: int):
+        validator.validate(size, int)
+        if size <= 0:
+            raise argument_exception("Некорректно указан размер!")
+
+        self.__size = size
+        self.__nodes = {}
+
+    # Размер диапазона позиций
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    """
+    Добавить delta к значению в позиции position
+    """
+    def add(self, position: int, delta: int):
+        self.__validate(position)
+        nodes = self.__nodes
+        index = position + 1
+        while index <= self.__size:
+            value = nodes.get(index, 0) + delta
+            if value == 0:
+                nodes.pop(index, None)
+            else:
+                nodes[index] = value
+            index += index & -index
+
+    """
+    Сумма значений в позициях [0, position]. Для position < 0 - ноль
+    """
+    def prefix(self, position: int) -> int:
+        if position < 0:
+            return 0
+
+        nodes = self.__nodes
+        index = min(position, self.__size - 1) + 1
+        total = 0
+        while index > 0:
+            total += nodes.get(index, 0)
+            index -= index & -index
+        return total
+
+    """
+    Сумма значений в позициях [lo, hi]
+    """
+    def range_sum(self, lo: int, hi: int) -> int:
+        if hi < lo:
+            return 0
+        return self.prefix(hi) - self.prefix(lo - 1)
+
+    def __validate(self, position: int):
+        if position < 0 or position >= self.__size:
+            raise argument_exception(f"Позиция вне диапазона: {position}!")
@@ -0,0 +1,70 @@
+import operator
+from Src.Core.validator import validator, argument_exception
+from Src.Core.entity_model import entity_model
+from Src.Core.text_normalizer import text_normalizer
+
+
+"""
+Получение значений полей по пути вида "nomenclature.group.name"
+Путь разбирается один раз, далее используется готовая функция
+"""
+class field_getter:
+
+    """
+    Создать функцию получения значения по пути
+    Если по пути встречается пустое значение - возвращается None
+    """
+    @staticmethod
+    def create(path: str):
+        validator.validate(path, str)
+        parts = path.strip().split(".")
+        if any(part == "" or part.startswith("_") for part in parts):
+            raise argument_exception(f"Некорректный путь к полю: {path}")
+
+        getter = operator.attrgetter(".".join(parts))
+
+        def get(item):
+            try:
+                return getter(item)
+            except AttributeError:
+                return None
+
+        return get
+
+    """
+    Создать функцию получения значений нескольких полей элемента (кортеж в порядке fields)
+    Используется при выводе, когда поля известны заранее
+    """
+    @staticmethod
+    def values(fields: list):
+        validator.validate(fields, list)
+        if len(fields) == 0:
+            raise argument_exception("Не указаны поля!")
+        if len(fields) == 1:
+            single = operator.attrgetter(fields[0])
+            return lambda item: (single(item),)
+
+        return operator.attrgetter(*fields)
+
+    """
+    Создать функцию ключа сортировки по пути
+        - модели сравниваются по ключу поиска наименования, строки - по нормализованному значению
+        - пустые значения всегда в конце списка
+    """
+    @staticmethod
+    def sort_key(path: str, descending: bool = False):
+        getter = field_getter.create(path)
+        empty_rank, value_rank = (0, 1) if descending else (1, 0)
+
+        def key(item):
+            value = getter(item)
+            if value is None:
+                return (empty_rank, "")
+            if isinstance(value, entity_model):
+                return (value_rank, value.search_key)
+            if isinstance(value, str):
+                return (value_rank, text_normalizer.normalize(value))
+
+            return (value_rank, value)
+
+        return key
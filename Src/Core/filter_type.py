@@ -5,4 +5,15 @@ class FilterType(Enum):
     Перечисление с вариантами фильтрации
     """
     EQUALS = "equals"      # Полное совпадение
-    LIKE = "like"         # Вхождение строки
\ No newline at end of file
+    LIKE = "like"         # Вхождение строки
+    GREATER_OR_EQUALS = "greater_or_equals"  # Больше или равно (>=)
+    LESS_OR_EQUALS = "less_or_equals"        # Меньше или равно (<=)
+    BETWEEN = "between"                      # Диапазон value .. value_to включительно
+    FUZZY = "fuzzy"                          # Похожие строки (расстояние Левенштейна <= max_distance)
+
+    @staticmethod
+    def comparisons() -> list:
+        """
+        Типы фильтрации с типизированным сравнением (даты, числа)
+        """
+        return [FilterType.GREATER_OR_EQUALS, FilterType.LESS_OR_EQUALS, FilterType.BETWEEN]
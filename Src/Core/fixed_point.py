@@ -0,0 +1,81 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+from Src.Core.validator import validator, argument_exception
+
+
+"""
+Количество в фиксированной точке: целое число единиц 10^-scale
+Суммирование выполняется в целых числах, перевод в десятичное значение - только при выводе
+"""
+class fixed_point:
+    # Количество знаков по умолчанию (тысячные доли)
+    __default_scale: int = 3
+
+    # Количество знаков по умолчанию
+    @staticmethod
+    def default_scale() -> int:
+        return fixed_point.__default_scale
+
+    """
+    Количество знаков для единицы измерения (None - по умолчанию)
+    """
+    @staticmethod
+    def scale_of(unit) -> int:
+        return unit.scale if unit is not None else fixed_point.__default_scale
+
+    """
+    Перевести значение в целые единицы с указанной точностью
+    Округление - банковское (до четного)
+    """
+    @staticmethod
+    def from_value(value, scale: int) -> int:
+        fixed_point.__validate_scale(scale)
+        if isinstance(value, float):
+            value = repr(value)
+
+        return int(Decimal(value).scaleb(scale).to_integral_value(ROUND_HALF_EVEN))
+
+    """
+    Количество знаков после запятой, необходимое для точного хранения значения
+    """
+    @staticmethod
+    def digits(value) -> int:
+        if isinstance(value, float):
+            value = repr(value)
+
+        exponent = Decimal(value).as_tuple().exponent
+        if not isinstance(exponent, int):
+            raise argument_exception("Некорректно указано значение!")
+        return max(0, -exponent)
+
+    """
+    Пересчитать целые единицы на другую точность
+    """
+    @staticmethod
+    def rescale(units: int, from_scale: int, to_scale: int) -> int:
+        if from_scale == to_scale:
+            return units
+        if to_scale > from_scale:
+            return units * 10 ** (to_scale - from_scale)
+
+        quotient, remainder = divmod(units, 10 ** (from_scale - to_scale))
+        half = 10 ** (from_scale - to_scale) // 2
+        if remainder > half or (remainder == half and quotient % 2 == 1):
+            quotient += 1
+        return quotient
+
+    """
+    Значение для вывода: без лишних нулей, но не меньше одного знака после запятой
+    """
+    @staticmethod
+    def to_decimal(units: int, scale: int) -> Decimal:
+        value = Decimal(units).scaleb(-scale).normalize()
+        if value.as_tuple().exponent > -1:
+            value = value.quantize(Decimal("0.1"))
+
+        return value
+
+    @staticmethod
+    def __validate_scale(scale: int):
+        validator.validate(scale, int)
+        if scale < 0:
+            raise argument_exception("Некорректно указана точность!")
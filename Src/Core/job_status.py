@@ -0,0 +1,10 @@
+from enum import Enum
+
+class job_status(Enum):
+    """
+    Перечисление состояний фонового задания
+    """
+    QUEUED = "queued"       # Ожидает выполнения
+    RUNNING = "running"     # Выполняется
+    DONE = "done"           # Выполнено, результат доступен
+    FAILED = "failed"       # Завершено с ошибкой
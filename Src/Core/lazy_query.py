@@ -0,0 +1,127 @@
+import heapq
+import itertools
+from Src.Core.validator import validator, argument_exception
+
+
+"""
+Ленивый запрос над коллекцией
+Операции (filter, map, sort, limit) только записываются. При чтении результата
+они выполняются за один проход генераторов, без промежуточных списков
+"""
+class lazy_query:
+    # Источник данных (любая итерируемая коллекция)
+    __source = []
+
+    # Записанные операции: (вид операции, аргумент)
+    __operations: tuple = ()
+
+    # Во сколько раз выборка должна быть меньше набора, чтобы использовать выбор через кучу
+    __heap_ratio: int = 4
+
+    def __init__(self, source, operations: tuple = ()):
+        if source is None:
+            raise argument_exception("Пустой аргумент")
+
+        self.__source = source
+        self.__operations = operations
+
+    """
+    Отфильтровать элементы по условию
+    Подряд идущие фильтры объединяются в одно условие
+    """
+    def filter(self, predicate) -> "lazy_query":
+        if not callable(predicate):
+            raise argument_exception("Некорректный аргумент!")
+
+        if len(self.__operations) > 0 and self.__operations[-1][0] == "filter":
+            previous = self.__operations[-1][1]
+            combined = lambda item: previous(item) and predicate(item)
+            return self.__next(("filter", combined), replace_last=True)
+
+        return self.__next(("filter", predicate))
+
+    """
+    Преобразовать элементы
+    """
+    def map(self, func) -> "lazy_query":
+        if not callable(func):
+            raise argument_exception("Некорректный аргумент!")
+
+        return self.__next(("map", func))
+
+    """
+    Отсортировать элементы (точка материализации потока)
+    """
+    def sort(self, key=None, reverse: bool = False) -> "lazy_query":
+        return self.__next(("sort", (key, reverse)))
+
+    """
+    Ограничить количество элементов. Просмотр источника прекращается после count элементов
+    """
+    def limit(self, count: int) -> "lazy_query":
+        validator.validate(count, int)
+        if count < 0:
+            raise argument_exception("Некорректный аргумент!")
+
+        return self.__next(("limit", count))
+
+    """
+    Выполнить запрос одним проходом
+    """
+    def __iter__(self):
+        stream = iter(self.__source)
+        operations = self.__operations
+        position = 0
+        while position < len(operations):
+            kind, argument = operations[position]
+            if kind == "filter":
+                stream = filter(argument, stream)
+            elif kind == "map":
+                stream = map(argument, stream)
+            elif kind == "sort":
+                # sort + limit = частичная выборка первых K элементов
+                count = None
+                if position + 1 < len(operations) and operations[position + 1][0] == "limit":
+                    count = operations[position + 1][1]
+                    position += 1
+
+                stream = iter(lazy_query.__sorted(stream, argument, count))
+            elif kind == "limit":
+                stream = itertools.islice(stream, argument)
+
+            position += 1
+
+        return stream
+
+    """
+    Выполнить запрос и получить список
+    """
+    def to_list(self) -> list:
+        return list(iter(self))
+
+    """
+    Сортировка с ограничением количества
+    Если count много меньше размера набора - выбор через кучу (heapq), иначе полная сортировка
+    Порядок результата совпадает с sorted(...)[:count]
+    Значения, которые нельзя сравнить между собой (разные типы), - ошибка аргумента
+    """
+    @staticmethod
+    def __sorted(stream, argument: tuple, count: int = None) -> list:
+        key, reverse = argument
+        items = list(stream)
+        try:
+            if count is None or count * lazy_query.__heap_ratio >= len(items):
+                result = sorted(items, key=key, reverse=reverse)
+                return result if count is None else result[:count]
+
+            if reverse:
+                return heapq.nlargest(count, items, key=key)
+
+            return heapq.nsmallest(count, items, key=key)
+        except TypeError:
+            raise argument_exception("Значения поля сортировки разных типов и не сравниваются между собой!")
+
+    # Новый запрос с добавленной операцией. Исходный запрос не меняется
+    def __next(self, operation: tuple, replace_last: bool = False) -> "lazy_query":
+        operations = self.__operations[:-1] if replace_last else self.__operations
+        return lazy_query(self.__source, operations + (operation,))
@@ -0,0 +1,65 @@
+import bisect
+from datetime import datetime
+from Src.Core.validator import validator
+
+
+"""
+Индекс транзакций, отсортированный по периоду
+Позволяет выбирать транзакции за период бинарным поиском, без полного перебора
+"""
+class period_index:
+    # Транзакции в порядке возрастания периода
+    __items: list = []
+
+    # Периоды транзакций (параллельно __items)
+    __periods: list = []
+
+    # Позиции транзакций в исходном списке (параллельно __items)
+    __positions: list = []
+
+    def __init__(self, data: list):
+        validator.validate(data, list)
+        # Сортировка устойчивая - порядок внутри одного дня сохраняется
+        self.__positions = sorted(range(len(data)), key=lambda position: data[position].period)
+        self.__items = [data[position] for position in self.__positions]
+        self.__periods = [item.period for item in self.__items]
+
+    # Количество элементов в индексе
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    """
+    Период первой транзакции (None - индекс пуст)
+    """
+    def first_period(self) -> datetime:
+        return self.__periods[0] if len(self.__periods) > 0 else None
+
+    """
+    Период последней транзакции (None - индекс пуст)
+    """
+    def last_period(self) -> datetime:
+        return self.__periods[-1] if len(self.__periods) > 0 else None
+
+    """
+    Границы диапазона позиций [lo, hi) для периода
+        - start_date, end_date - включительно, None - без ограничения
+    """
+    def bounds(self, start_date: datetime = None, end_date: datetime = None) -> tuple:
+        lo = 0 if start_date is None else bisect.bisect_left(self.__periods, start_date)
+        hi = len(self.__periods) if end_date is None else bisect.bisect_right(self.__periods, end_date)
+        return lo, max(lo, hi)
+
+    """
+    Выбрать транзакции за период
+    """
+    def select(self, start_date: datetime = None, end_date: datetime = None) -> list:
+        lo, hi = self.bounds(start_date, end_date)
+        return self.__items[lo:hi]
+
+    """
+    Выбрать транзакции за период в порядке исходного списка (как при переборе)
+    Сортируются только выбранные позиции
+    """
+    def select_in_source_order(self, start_date: datetime = None, end_date: datetime = None) -> list:
+        lo, hi = self.bounds(start_date, end_date)
+        return [self.__items[number] for number in sorted(range(lo, hi), key=self.__positions.__getitem__)]
@@ -0,0 +1,80 @@
+import bisect
+import itertools
+from Src.Core.validator import validator, argument_exception
+
+
+"""
+Ряды прихода / расхода по интервалам (корзинам) с накопленными суммами
+Для каждого ряда хранятся префиксные суммы, поэтому движение за любой диапазон корзин
+и остаток на начало любой корзины вычисляются за O(1) разностью
+"""
+class prefix_series:
+    # Начала корзин (по возрастанию)
+    __labels: list = []
+
+    # Ключ ряда -> (остаток на начало, приход по корзинам, расход по корзинам,
+    #               накопленный приход, накопленный расход)
+    __rows: dict = {}
+
+    def __init__(self, labels: list, rows: dict):
+        validator.validate(labels, list)
+        validator.validate(rows, dict)
+        self.__labels = labels
+        self.__rows = {}
+        for key, (opening, income, outcome) in rows.items():
+            if len(income) != len(labels) or len(outcome) != len(labels):
+                raise argument_exception("Размер ряда не совпадает с количеством интервалов!")
+
+            self.__rows[key] = (opening, income, outcome,
+                                list(itertools.accumulate(income, initial=0)),
+                                list(itertools.accumulate(outcome, initial=0)))
+
+    # Начала корзин
+    @property
+    def labels(self) -> list:
+        return self.__labels
+
+    # Ключи рядов
+    def keys(self) -> list:
+        return list(self.__rows.keys())
+
+    # Количество рядов
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    """
+    Позиция корзины, в которую попадает значение (например дата)
+    Значения до первой корзины - позиция 0
+    """
+    def position(self, value) -> int:
+        return max(0, bisect.bisect_right(self.__labels, value) - 1)
+
+    """
+    Приход и расход ряда за корзины [lo, hi)
+    """
+    def movement(self, key, lo: int, hi: int) -> tuple:
+        _, _, _, income, outcome = self.__row(key, lo, hi)
+        return income[hi] - income[lo], outcome[hi] - outcome[lo]
+
+    """
+    Остаток ряда на начало корзины position (position = количество корзин - остаток на конец)
+    """
+    def balance(self, key, position: int) -> int:
+        opening, _, _, income, outcome = self.__row(key, position, position)
+        return opening + income[position] - outcome[position]
+
+    """
+    Данные ряда: (остаток на начало, приход по корзинам, расход по корзинам)
+    """
+    def row(self, key) -> tuple:
+        opening, income, outcome, _, _ = self.__row(key, 0, 0)
+        return opening, income, outcome
+
+    def __row(self, key, lo: int, hi: int) -> tuple:
+        row = self.__rows.get(key)
+        if row is None:
+            raise argument_exception(f"Ряд не найден: {key}!")
+        if lo < 0 or hi > len(self.__labels) or lo > hi:
+            raise argument_exception("Некорректный диапазон интервалов!")
+
+        return row
@@ -1,21 +1,30 @@
 from Src.Core.validator import validator
 from Src.Dtos.filter_dto import filter_dto
-from Src.Core.common import common
+from Src.Core.lazy_query import lazy_query
+from Src.Core.field_getter import field_getter
+from Src.Dtos.sorting_dto import sorting_dto
 
 # Абстрактный класс - прототип
 class prototype:
     __data = []
 
+    # Отложенный запрос над данными. Выполняется при первом обращении к data
+    __query: lazy_query = None
+
     # Набор данных
     @property
     def data(self):
+        if self.__query is not None:
+            self.__data = self.__query.to_list()
+            self.__query = None
+
         return self.__data
 
     def __init__(self, data:list):
         validator.validate(data, list)
         self.__data = data
-        
-    # Клонирование        
+
+    # Клонирование
     def clone(self, data:list = None)-> "prototype":
         inner_data = None
         if data is None:
@@ -24,23 +33,54 @@ class prototype:
             inner_data = data
 
         instance =  prototype(inner_data)
-        return instance   
-    
+        return instance
+
+    # Запрос над данными прототипа. Если есть отложенный запрос - цепочка продолжается
+    def query(self) -> lazy_query:
+        if self.__query is not None:
+            return self.__query
+
+        return lazy_query(self.__data)
+
+    # Клонирование с отложенным запросом. Данные будут получены при первом обращении
+    def clone_query(self, query:lazy_query) -> "prototype":
+        validator.validate(query, lazy_query)
+        instance = self.clone([])
+        instance.__query = query
+        return instance
+
+    # Сортировка и ограничение количества (top-K)
+    # Выполняется вместе с остальной цепочкой при обращении к data
+    def order(self, sorting:sorting_dto) -> "prototype":
+        validator.validate(sorting, sorting_dto)
+        if sorting.is_empty():
+            return self
+
+        query = self.query()
+        if sorting.sort_by != "":
+            query = query.sort(field_getter.sort_key(sorting.sort_by, sorting.descending), sorting.descending)
+        if sorting.top is not None:
+            query = query.limit(sorting.top)
+
+        return self.clone_query(query)
+
     # Универсальный фильтр
     @staticmethod
     def filter(data:list, filter:filter_dto ) -> list:
         if len(data) == 0:
             return data
-        
-        result = []
-        first_item = data[0]
-        for field in common.get_fields(first_item):
-            for item in data:
-                if field == filter.field_name:
-                    value = str( getattr(item, field))
-                    if value == filter.value:
-                        result.append(item)
-
-        return result
-
-                
\ No newline at end of file
+
+        return [item for item in data if prototype.match(item, filter)]
+
+    # Проверить соответствие элемента фильтру (полное совпадение свойства)
+    @staticmethod
+    def match(item, filter:filter_dto) -> bool:
+        if filter.field_name.startswith("_"):
+            return False
+
+        attribute = getattr(item.__class__, filter.field_name, None)
+        if not isinstance(attribute, property):
+            return False
+
+        return str(getattr(item, filter.field_name)) == filter.value
+
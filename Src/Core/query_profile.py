@@ -0,0 +1,122 @@
+import time
+from contextlib import contextmanager, nullcontext
+from Src.Core.validator import validator
+
+
+"""
+Профиль выполнения запроса (explain)
+Содержит выбранный план (шаги с путем доступа: индекс или полный перебор),
+количество просмотренных / возвращенных строк и время по стадиям
+"""
+class query_profile:
+    # Шаги плана
+    __steps: list = []
+
+    # Время по стадиям, мс
+    __timings: dict = {}
+
+    # Дополнительные сведения
+    __details: dict = {}
+
+    # Функция, вызываемая при начале стадии: listener(name)
+    __listener = None
+
+    def __init__(self, listener=None):
+        self.__steps = []
+        self.__timings = {}
+        self.__details = {}
+        self.__listener = listener
+
+    """
+    Признак, что в запросе Api запрошен explain
+    """
+    @staticmethod
+    def is_requested(data: dict) -> bool:
+        if not isinstance(data, dict):
+            return False
+
+        value = data.get("explain", False)
+        return value is True or str(value).strip().lower() in ["true", "1"]
+
+    # Шаги плана
+    @property
+    def steps(self) -> list:
+        return self.__steps
+
+    """
+    Замер времени стадии (filtering, grouping, rendering и т.д.)
+    Повторные замеры одной стадии суммируются
+    """
+    @contextmanager
+    def stage(self, name: str):
+        validator.validate(name, str)
+        if self.__listener is not None:
+            self.__listener(name)
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.__timings[name] = self.__timings.get(name, 0.0) + elapsed
+
+    """
+    Замер стадии для необязательного профиля. Без профиля - пустой контекст
+    """
+    @staticmethod
+    def optional_stage(profile: "query_profile", name: str):
+        return profile.stage(name) if profile is not None else nullcontext()
+
+    """
+    Добавить шаг плана
+    """
+    def add_step(self, operation: str, access_path: str, rows_examined: int = 0,
+                 rows_returned: int = 0, **details) -> dict:
+        validator.validate(operation, str)
+        validator.validate(access_path, str)
+        step = {
+            "operation": operation,
+            "access_path": access_path,
+            "rows_examined": rows_examined,
+            "rows_returned": rows_returned
+        }
+        step.update(details)
+        self.__steps.append(step)
+        return step
+
+    """
+    Добавить шаг плана для условия, которое будет выполнено позже (лениво)
+    Возвращает условие, считающее просмотренные и подходящие строки
+    """
+    def counting(self, operation: str, access_path: str, predicate, **details):
+        step = self.add_step(operation, access_path, **details)
+
+        def counted(item) -> bool:
+            step["rows_examined"] += 1
+            result = predicate(item)
+            if result:
+                step["rows_returned"] += 1
+            return result
+
+        return counted
+
+    """
+    Добавить дополнительное сведение
+    """
+    def detail(self, name: str, value):
+        validator.validate(name, str)
+        self.__details[name] = value
+
+    """
+    Представление для ответа Api
+    """
+    def to_dict(self) -> dict:
+        rows_examined = sum(step["rows_examined"] for step in self.__steps)
+        rows_returned = self.__steps[-1]["rows_returned"] if len(self.__steps) > 0 else 0
+        result = {
+            "plan": self.__steps,
+            "rows_examined": rows_examined,
+            "rows_returned": rows_returned,
+            "timings_ms": {name: round(value, 3) for name, value in self.__timings.items()}
+        }
+        result.update(self.__details)
+        return result
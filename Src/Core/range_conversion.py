@@ -0,0 +1,62 @@
+from Src.Core.validator import validator, argument_exception
+from Src.Core.fixed_point import fixed_point
+
+
+"""
+Таблица пересчета единиц измерения в базовые
+Для каждой единицы один раз вычисляется корневая базовая единица и общий коэффициент
+(произведение коэффициентов по цепочке base). Отчеты не обходят цепочку для каждой проводки
+"""
+class range_conversion:
+    # Код единицы -> (базовая единица, коэффициент)
+    __entries: dict = {}
+
+    def __init__(self, data: list):
+        validator.validate(data, list)
+        self.__entries = {}
+        for item in data:
+            self.resolve(item)
+
+    # Количество единиц в таблице
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    """
+    Базовая единица и коэффициент пересчета в нее
+    Для None - (None, 1)
+    """
+    def resolve(self, unit) -> tuple:
+        if unit is None:
+            return None, 1
+
+        entry = self.__entries.get(unit.unique_code)
+        if entry is not None:
+            return entry
+
+        # Обход цепочки выполняется один раз, промежуточные единицы тоже попадают в таблицу
+        chain = []
+        current = unit
+        while current.base is not None and current.unique_code not in self.__entries:
+            if any(item is current for item in chain):
+                raise argument_exception(f"Циклическая ссылка в единицах измерения: {unit.name}!")
+            chain.append(current)
+            current = current.base
+
+        root, factor = self.__entries.get(current.unique_code, (current, 1))
+        self.__entries[current.unique_code] = (root, factor)
+        for item in reversed(chain):
+            factor *= item.value
+            self.__entries[item.unique_code] = (root, factor)
+
+        return self.__entries[unit.unique_code]
+
+    """
+    Количество транзакции в базовой единице (целые единицы точности базовой единицы)
+    Сначала количество умножается на коэффициент в целых единицах исходной единицы,
+    затем один раз пересчитывается на точность базовой единицы
+    Результат: (базовая единица, количество)
+    """
+    def base_quantity(self, transaction) -> tuple:
+        root, factor = self.resolve(transaction.range)
+        return root, fixed_point.rescale(transaction.quantity * factor, transaction.scale,
+                                         fixed_point.scale_of(root))
@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import tempfile
+import uuid
+from Src.Core.validator import validator, argument_exception
+
+
+"""
+Дисковый кэш готовых ответов отчетов
+Ключ - нормализованные параметры запроса. Вместе с ответом хранится поколение данных
+репозитория, на котором он посчитан: после новых проводок запись считается устаревшей
+и удаляется при первом обращении.
+Поколение живет только в памяти процесса, поэтому к нему добавляется идентификатор экземпляра кэша:
+записи, сохраненные до перезапуска, считаются устаревшими
+"""
+class report_disk_cache:
+    # Каталог кэша (полный путь)
+    __path: str = ""
+
+    def __init__(self, path: str):
+        validator.validate(path, str)
+        if path.strip() == "":
+            raise argument_exception("Не указан каталог кэша отчетов!")
+
+        self.__path = os.path.abspath(path.strip())
+        self.__session = uuid.uuid4().hex
+        os.makedirs(self.__path, exist_ok=True)
+
+    # Каталог кэша
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    """
+    Нормализованный ключ параметров запроса (порядок полей не важен)
+    """
+    @staticmethod
+    def key(params) -> str:
+        try:
+            return json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            raise argument_exception("Некорректные параметры запроса!")
+
+    """
+    Ответ по ключу, посчитанный на поколении данных generation. Иначе - None
+    """
+    def get(self, key: str, generation: int):
+        file_name = self.__file_name(key)
+        try:
+            with open(file_name, 'rb') as file_instance:
+                stamp = file_instance.readline()
+                body = file_instance.read()
+        except OSError:
+            return None
+
+        if stamp.strip() != self.__stamp(generation):
+            self.__remove(file_name)
+            return None
+
+        return body
+
+    """
+    Сохранить ответ. Запись атомарная: читатели видят либо прежний, либо новый ответ
+    """
+    def put(self, key: str, generation: int, body: bytes):
+        validator.validate(body, bytes)
+        handle, temp_name = tempfile.mkstemp(dir=self.__path, suffix=".tmp")
+        try:
+            with os.fdopen(handle, 'wb') as file_instance:
+                file_instance.write(self.__stamp(generation) + b"\n")
+                file_instance.write(body)
+            os.replace(temp_name, self.__file_name(key))
+        except Exception:
+            self.__remove(temp_name)
+            raise
+
+    """
+    Удалить все записи
+    """
+    def clear(self):
+        for name in os.listdir(self.__path):
+            if name.endswith(".cache"):
+                self.__remove(os.path.join(self.__path, name))
+
+    """
+    Удалить все записи, кроме записей с ключами keep
+    """
+    def prune(self, keep: list):
+        validator.validate(keep, list)
+        names = {os.path.basename(self.__file_name(key)) for key in keep}
+        for name in os.listdir(self.__path):
+            if name.endswith(".cache") and name not in names:
+                self.__remove(os.path.join(self.__path, name))
+
+    # Отметка записи: экземпляр кэша и поколение данных
+    def __stamp(self, generation: int) -> bytes:
+        return f"{self.__session}:{generation}".encode()
+
+    def __file_name(self, key: str) -> str:
+        validator.validate(key, str)
+        return os.path.join(self.__path, hashlib.sha1(key.encode()).hexdigest() + ".cache")
+
+    @staticmethod
+    def __remove(file_name: str):
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
@@ -0,0 +1,147 @@
+import os
+import pickle
+import uuid
+import atexit
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from Src.Core.validator import validator, argument_exception
+
+
+# Разобранные шарды в процессе-исполнителе: токен набора -> {(столбец, номер шарда): элементы}
+# Хранятся шарды нескольких последних наборов - наборы не вытесняют друг друга при каждом обращении
+_worker_shards = OrderedDict()
+
+# Количество наборов, шарды которых хранит процесс-исполнитель
+_worker_tokens = 8
+
+
+# Выполнить фильтр над шардом в процессе-исполнителе
+# Возвращает позиции подходящих элементов внутри шарда
+# None - шарда еще нет в этом процессе, его нужно прислать (payload)
+def _match_shard(token: str, column, number: int, payload, predicate, argument):
+    shards = _worker_shards.get(token)
+    if shards is None:
+        shards = _worker_shards[token] = {}
+        while len(_worker_shards) > _worker_tokens:
+            _worker_shards.popitem(last=False)
+    _worker_shards.move_to_end(token)
+
+    items = shards.get((column, number))
+    if items is None:
+        if payload is None:
+            return None
+        items = shards[(column, number)] = pickle.loads(payload)
+
+    return [position for position, item in enumerate(items) if predicate(item, argument)]
+
+
+"""
+Параллельное выполнение фильтра над большой коллекцией
+Коллекция заранее делится на шарды. Каждый шард проверяется в пуле процессов,
+результаты (позиции элементов) объединяются в исходном порядке.
+Шарды передаются компактными столбцами (проекциями элементов) и сериализуются один раз на столбец.
+Запрос отправляется без данных: шард пересылается только процессу, у которого его еще нет
+"""
+class sharded_executor:
+    # Минимальный размер коллекции для параллельного выполнения
+    __threshold: int = 50000
+
+    # Общий пул процессов
+    __pool: ProcessPoolExecutor = None
+    __pool_workers: int = 0
+
+    # Набор данных и сериализованные шарды его столбцов: столбец -> список шардов
+    __data: list = []
+    __columns: dict = {}
+    __offsets: list = []
+    __size: int = 1
+    __token: str = ""
+    __workers: int = 0
+
+    def __init__(self, data: list, shard_count: int = None, workers: int = None):
+        validator.validate(data, list)
+        self.__workers = workers if workers is not None else (os.cpu_count() or 1)
+        if self.__workers <= 0:
+            raise argument_exception("Некорректно указано количество процессов!")
+
+        # По умолчанию - несколько шардов на процесс для выравнивания нагрузки
+        count = shard_count if shard_count is not None else self.__workers * 4
+        count = max(1, min(count, len(data)))
+        size = -(-len(data) // count) if len(data) > 0 else 1
+
+        self.__data = data
+        self.__token = uuid.uuid4().hex
+        self.__size = size
+        self.__offsets = list(range(0, len(data), size))
+        self.__columns = {}
+
+    # Минимальный размер коллекции для параллельного выполнения
+    @staticmethod
+    def threshold() -> int:
+        return sharded_executor.__threshold
+
+    # Количество шардов
+    @property
+    def shard_count(self) -> int:
+        return len(self.__offsets)
+
+    """
+    Выполнить фильтр
+        - predicate(value, argument) - функция уровня модуля (должна сериализоваться через pickle)
+        - projection(item) - компактное значение элемента, которое проверяет predicate
+          (выполняется в текущем процессе). Без проекции проверяются сами элементы
+        - column - ключ столбца: одинаковая проекция должна иметь одинаковый ключ
+    Результат - подходящие элементы в исходном порядке
+    """
+    def filter(self, predicate, argument, projection=None, column=None) -> list:
+        pool = sharded_executor.pool(self.__workers)
+        futures = [pool.submit(_match_shard, self.__token, column, number, None, predicate, argument)
+                   for number in range(len(self.__offsets))]
+        positions = [future.result() for future in futures]
+
+        # Шарды, которых еще нет у процессов-исполнителей, пересылаются один раз
+        missing = [number for number, found in enumerate(positions) if found is None]
+        if len(missing) > 0:
+            payloads = self.__payloads(projection, column)
+            retries = [(number, pool.submit(_match_shard, self.__token, column, number, payloads[number],
+                                            predicate, argument)) for number in missing]
+            for number, future in retries:
+                positions[number] = future.result()
+
+        result = []
+        for offset, found in zip(self.__offsets, positions):
+            result.extend(self.__data[offset + position] for position in found)
+
+        return result
+
+    def __payloads(self, projection, column) -> list:
+        """
+        Сериализованные шарды столбца (готовятся при первом обращении)
+        """
+        payloads = self.__columns.get(column)
+        if payloads is None:
+            payloads = []
+            for offset in self.__offsets:
+                items = self.__data[offset:offset + self.__size]
+                if projection is not None:
+                    items = [projection(item) for item in items]
+                payloads.append(pickle.dumps(items, pickle.HIGHEST_PROTOCOL))
+            self.__columns[column] = payloads
+
+        return payloads
+
+    """
+    Общий пул процессов (создается при первом обращении)
+    Используется и другими параллельными расчетами, чтобы не держать несколько пулов
+    """
+    @staticmethod
+    def pool(workers: int = None) -> ProcessPoolExecutor:
+        workers = workers if workers is not None else (os.cpu_count() or 1)
+        if sharded_executor.__pool is None or sharded_executor.__pool_workers != workers:
+            if sharded_executor.__pool is not None:
+                sharded_executor.__pool.shutdown(wait=False)
+            sharded_executor.__pool = ProcessPoolExecutor(max_workers=workers)
+            sharded_executor.__pool_workers = workers
+            atexit.register(sharded_executor.__pool.shutdown, wait=False)
+
+        return sharded_executor.__pool
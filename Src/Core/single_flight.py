@@ -0,0 +1,73 @@
+import json
+import threading
+from Src.Core.validator import argument_exception
+
+
+"""
+Объединение одинаковых одновременных запросов (single flight)
+Первый запрос по ключу выполняет расчет, одновременные запросы с тем же ключом ждут
+и получают тот же результат (или ту же ошибку). После завершения ключ освобождается -
+это не кэш, следующий запрос считается заново
+"""
+class single_flight:
+    # Выполняющиеся расчеты: ключ -> [событие завершения, результат, ошибка, количество ожидающих]
+    __calls: dict = {}
+
+    def __init__(self):
+        self.__calls = {}
+        self.__lock = threading.Lock()
+
+    """
+    Ключ запроса: нормализованные параметры (порядок полей не важен) и поколение данных
+    """
+    @staticmethod
+    def key(params, generation) -> str:
+        try:
+            text = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            raise argument_exception("Некорректные параметры запроса!")
+
+        return f"{generation}:{text}"
+
+    """
+    Выполнить factory() один раз для всех одновременных запросов с ключом key
+    Возвращает (результат, признак что результат получен от другого запроса)
+    """
+    def do(self, key: str, factory) -> tuple:
+        if not callable(factory):
+            raise argument_exception("Некорректный аргумент!")
+
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = [threading.Event(), None, None, 0]
+            else:
+                call[3] += 1
+
+        if not leader:
+            call[0].wait()
+        else:
+            try:
+                call[1] = factory()
+            except Exception as e:
+                call[2] = e
+            finally:
+                with self.__lock:
+                    del self.__calls[key]
+                call[0].set()
+
+        if call[2] is not None:
+            raise call[2]
+        return call[1], not leader
+
+    # Количество выполняющихся расчетов
+    def pending(self) -> int:
+        with self.__lock:
+            return len(self.__calls)
+
+    # Количество запросов, ожидающих результат расчета по ключу key
+    def waiting(self, key: str) -> int:
+        with self.__lock:
+            call = self.__calls.get(key)
+            return call[3] if call is not None else 0
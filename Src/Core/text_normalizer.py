@@ -0,0 +1,21 @@
+
+"""
+Нормализация строк для поиска и сравнения
+"""
+class text_normalizer:
+
+    """
+    Привести значение к ключу поиска
+        - casefold вместо lower (корректно для всего Unicode)
+        - fold_yo = True - заменить ё на е
+    """
+    @staticmethod
+    def normalize(value, fold_yo: bool = True) -> str:
+        if value is None:
+            return ""
+
+        result = str(value).casefold()
+        if fold_yo:
+            result = result.replace("ё", "е")
+
+        return result
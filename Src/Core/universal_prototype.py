@@ -1,82 +1,273 @@
 from Src.Core.prototype import prototype
-from Src.Core.validator import validator
+from Src.Core.validator import validator, argument_exception
 from Src.Dtos.universal_filter_dto import universal_filter_dto
 from Src.Core.filter_type import FilterType
 from Src.Core.common import common
+from Src.Core.entity_model import entity_model
+from Src.Core.text_normalizer import text_normalizer
 from Src.Models.nomenclature_model import nomenclature_model
 from Src.Models.group_model import group_model
 from Src.Models.range_model import range_model
 from Src.Models.receipt_model import receipt_model
+from Src.Core.period_index import period_index
+from Src.Core.bk_tree import bk_tree
+from Src.Core.sharded_executor import sharded_executor
+from Src.Core.aggregator import aggregator
+from Src.Dtos.aggregation_dto import aggregation_dto
+from Src.Core.query_profile import query_profile
+from datetime import datetime
+from functools import lru_cache
 
 
 class universal_prototype(prototype):
     """
     Универсальный прототип для фильтрации всех DOMAIN моделей
-    Поддерживает: nomenclature, group, range, receipt
+    Поддерживает: nomenclature, group, range, receipt, transaction
     """
+    # Индекс по периоду, построенный по тем же данным (только для транзакций)
+    __index: period_index = None
 
-    def __init__(self, data: list):
+    # Индекс ключей поиска наименований для нечеткого поиска (BK-дерево по тем же данным)
+    __name_index: bk_tree = None
+
+    # Параллельный исполнитель фильтров по шардам тех же данных (для больших коллекций)
+    __executor: sharded_executor = None
+
+    def __init__(self, data: list, index: period_index = None, name_index: bk_tree = None,
+                 executor: sharded_executor = None):
         super().__init__(data)
+        self.__index = index
+        self.__name_index = name_index
+        self.__executor = executor
 
     def clone(self, data: list = None) -> "universal_prototype":
         inner_data = self.data if data is None else data
         return universal_prototype(inner_data)
 
-    def apply_filter(self, filter_dto: universal_filter_dto) -> "universal_prototype":
+    def apply_filter(self, filter_dto: universal_filter_dto, profile: query_profile = None) -> "universal_prototype":
         """
         Основной метод фильтрации для всех DOMAIN моделей
+        profile - профиль запроса (explain). Если передан, в него записывается выбранный план
         """
-        validator.validate(filter_dto, universal_filter_dto)
+        # Проверяем, что тип модели соответствует данным, и корректность границ
+        universal_prototype.validate(filter_dto)
+        filter_field = filter_dto.field_name or filter_dto.nested_field
+
+        # Диапазон по периоду отвечаем через индекс, без перебора (порядок - как при переборе)
+        if self.__can_use_index(filter_dto):
+            start_date, end_date = universal_prototype.period_bounds(filter_dto)
+            lo, hi = self.__index.bounds(start_date, end_date)
+            if profile is not None:
+                profile.add_step("filter", "period_index", hi - lo, hi - lo,
+                                 field=filter_field, index_range=[lo, hi], index_size=len(self.__index))
+            return self.clone(self.__index.select_in_source_order(start_date, end_date))
+
+        # Нечеткий поиск по наименованию возвращает результат, упорядоченный по расстоянию
+        if filter_dto.filter_type == FilterType.FUZZY and filter_dto.field_name == 'name':
+            return self.clone(self.__fuzzy_by_name(filter_dto, profile))
+
+        # Большая коллекция - проверка по шардам в пуле процессов
+        if self.__executor is not None:
+            result = self.__executor.filter(universal_prototype.matches, filter_dto,
+                                            lambda item: universal_prototype.project(item, filter_dto),
+                                            universal_prototype.column(filter_dto))
+            if profile is not None:
+                profile.add_step("filter", "parallel_scan", len(self.data), len(result),
+                                 field=filter_field, shards=self.__executor.shard_count)
+            return self.clone(result)
+
+        # Фильтр откладывается: цепочка фильтров выполнится одним проходом при обращении к data
+        predicate = lambda item: universal_prototype.__item_matches_filter(item, filter_dto)
+        if profile is not None:
+            predicate = profile.counting("filter", "full_scan", predicate, field=filter_field)
+
+        query = self.query().filter(predicate)
+        return self.clone_query(query)
+
+    def apply_filters(self, filter_dtos: list) -> list:
+        """
+        Пакетная фильтрация: все фильтры вычисляются за один проход по данным
+        Фильтры по периоду отвечаются через индекс (если он есть), нечеткий поиск по наименованию -
+        через индекс наименований (если он есть) с ранжированием по расстоянию
+        Результат - список прототипов в порядке фильтров
+        """
+        validator.validate(filter_dtos, list)
+        results = [None] * len(filter_dtos)
+        scanned = []
+
+        for filter_dto in filter_dtos:
+            universal_prototype.validate(filter_dto)
+
+        for position, filter_dto in enumerate(filter_dtos):
+            if self.__can_use_index(filter_dto):
+                start_date, end_date = universal_prototype.period_bounds(filter_dto)
+                results[position] = self.__index.select_in_source_order(start_date, end_date)
+            elif filter_dto.filter_type == FilterType.FUZZY and filter_dto.field_name == 'name':
+                # Нечеткий поиск ранжируется по расстоянию, как при фильтрации по одному фильтру
+                results[position] = self.__fuzzy_by_name(filter_dto)
+            else:
+                results[position] = []
+                scanned.append((filter_dto, results[position]))
 
-        # Проверяем, что тип модели соответствует данным
-        self.__validate_model_type(filter_dto.model_type)
+        # Один проход по данным для всех оставшихся фильтров
+        if len(scanned) > 0:
+            for item in self.data:
+                for filter_dto, matched in scanned:
+                    if universal_prototype.__item_matches_filter(item, filter_dto):
+                        matched.append(item)
 
-        filtered_data = universal_prototype.__filter_by_dto(self.data, filter_dto)
-        return self.clone(filtered_data)
+        return [self.clone(result) for result in results]
+
+    def aggregate(self, dto: aggregation_dto) -> list:
+        """
+        Агрегация данных прототипа (count / sum / min / max) с группировкой по вложенным путям
+        Отложенные фильтры выполняются в том же проходе
+        """
+        return aggregator(dto).build(self.query())
 
     @staticmethod
-    def __validate_model_type(model_type: str):
-        """Проверяет корректность типа модели"""
-        allowed_types = ["nomenclature", "group", "range", "receipt"]
-        if model_type not in allowed_types:
-            raise ValueError(f"Неподдерживаемый тип модели: {model_type}. Допустимо: {allowed_types}")
+    def validate(filter_dto: universal_filter_dto):
+        """
+        Проверяет фильтр до выполнения: тип модели, границы сравнения, формат даты для периода
+        """
+        validator.validate(filter_dto, universal_filter_dto)
+        universal_prototype.__validate_model_type(filter_dto.model_type)
+        universal_prototype.__validate_comparison(filter_dto)
+        if filter_dto.field_name == 'period' and filter_dto.filter_type in FilterType.comparisons():
+            universal_prototype.period_bounds(filter_dto)
 
     @staticmethod
-    def __filter_by_dto(data: list, filter_dto: universal_filter_dto) -> list:
+    def period_bounds(filter_dto: universal_filter_dto) -> tuple:
+        """
+        Границы периода (start_date, end_date) из фильтра сравнения. None - без ограничения
+        """
+        start_date = None
+        end_date = None
+        try:
+            if filter_dto.filter_type in [FilterType.GREATER_OR_EQUALS, FilterType.BETWEEN]:
+                start_date = universal_prototype.__parse_bound(filter_dto.value, datetime)
+            if filter_dto.filter_type == FilterType.LESS_OR_EQUALS:
+                end_date = universal_prototype.__parse_bound(filter_dto.value, datetime)
+            if filter_dto.filter_type == FilterType.BETWEEN:
+                end_date = universal_prototype.__parse_bound(filter_dto.value_to, datetime)
+        except ValueError:
+            raise argument_exception("Некорректный формат даты! Ожидается YYYY-MM-DD")
+
+        return start_date, end_date
+
+    def __fuzzy_by_name(self, filter_dto: universal_filter_dto, profile: query_profile = None) -> list:
         """
-        Универсальная фильтрация по DTO для всех моделей
+        Нечеткий поиск по наименованию. Результат ранжирован по расстоянию, затем по наименованию
+        При наличии BK-дерева расстояние считается только для части ключей
         """
-        if len(data) == 0:
-            return []
+        if self.__name_index is not None:
+            found = self.__name_index.search(filter_dto.search_value, filter_dto.max_distance)
+            if profile is not None:
+                profile.add_step("filter", "bk_tree", len(found), len(found),
+                                 field="name", index_size=len(self.__name_index))
+            return [item for _, item in found]
+
+        ranked = []
+        for position, item in enumerate(self.data):
+            key = universal_prototype.__search_key_of(item)
+            distance = bk_tree.distance(key, filter_dto.search_value, filter_dto.max_distance)
+            if distance <= filter_dto.max_distance:
+                ranked.append((distance, key, position, item))
+
+        if profile is not None:
+            profile.add_step("filter", "full_scan", len(self.data), len(ranked), field="name")
+
+        ranked.sort(key=lambda entry: entry[:3])
+        return [entry[3] for entry in ranked]
+
+    def __can_use_index(self, filter_dto: universal_filter_dto) -> bool:
+        """Проверяет, можно ли выполнить фильтр через индекс по периоду"""
+        return (self.__index is not None
+                and filter_dto.field_name == 'period'
+                and filter_dto.filter_type in FilterType.comparisons())
 
-        result = []
+    @staticmethod
+    def __validate_model_type(model_type: str):
+        """Проверяет корректность типа модели"""
+        allowed_types = universal_filter_dto.model_types()
+        if model_type not in allowed_types:
+            raise argument_exception(f"Неподдерживаемый тип модели: {model_type}. Допустимо: {allowed_types}")
 
-        for item in data:
-            if universal_prototype.__item_matches_filter(item, filter_dto):
-                result.append(item)
+    @staticmethod
+    def __validate_comparison(filter_dto: universal_filter_dto):
+        """Проверяет наличие границ для фильтров сравнения"""
+        if filter_dto.filter_type not in FilterType.comparisons():
+            return
 
-        return result
+        if filter_dto.value == "":
+            raise argument_exception("Не указано значение для сравнения!")
+        if filter_dto.filter_type == FilterType.BETWEEN and filter_dto.value_to == "":
+            raise argument_exception("Не указана верхняя граница диапазона (value_to)!")
 
     @staticmethod
-    def __item_matches_filter(item, filter_dto: universal_filter_dto) -> bool:
+    def column(filter_dto: universal_filter_dto) -> tuple:
         """
-        Проверяет соответствие элемента критериям фильтрации
+        Ключ столбца значений фильтра: проекция элемента зависит только от пути к полю
+        """
+        return filter_dto.field_name, filter_dto.nested_field
+
+    @staticmethod
+    def project(item, filter_dto: universal_filter_dto) -> tuple:
+        """
+        Компактная проекция элемента для фильтра: (режим, значения поля)
+            - режим "key"   - значения уже являются ключами поиска наименования (name, unique_code)
+            - режим "value" - значения поля: даты, числа, для остального - ключ поиска
+        Значения не содержат моделей - проекцию дешево передать в другой процесс
         Поддерживает все DOMAIN модели и их специфичные поля
         """
         # Базовые поля, общие для всех entity_model
+        if filter_dto.field_name == 'name' and isinstance(item, entity_model):
+            return "key", (item.search_key,)
+
         if filter_dto.field_name in ['name', 'unique_code']:
             field_value = getattr(item, filter_dto.field_name, "")
-            return universal_prototype.__apply_filter_logic(str(field_value), filter_dto)
+            return "key", (text_normalizer.normalize(field_value),)
 
         # Специфичные поля для разных моделей
         elif universal_prototype.__is_model_specific_field(item, filter_dto):
-            return universal_prototype.__check_model_specific_field(item, filter_dto)
+            try:
+                field_value = getattr(item, filter_dto.field_name)
+                return "value", (universal_prototype.__compact(field_value),)
+            except (AttributeError, ValueError):
+                return "value", ()
 
         # Вложенные структуры - ОСНОВНОЙ МЕТОД ДЛЯ ПУНКТА 4
         elif filter_dto.nested_field:
-            return universal_prototype.__check_nested_structure(item, filter_dto)
+            try:
+                values = universal_prototype.__nested_values(item, filter_dto.nested_field.split('.'))
+                return "value", tuple(universal_prototype.__compact(value) for value in values
+                                      if value is not None)
+            except (AttributeError, ValueError, IndexError):
+                return "value", ()
 
-        return False
+        return "value", ()
+
+    @staticmethod
+    def matches(projection: tuple, filter_dto: universal_filter_dto) -> bool:
+        """
+        Проверяет соответствие проекции элемента фильтру (используется и при параллельном выполнении)
+        """
+        mode, values = projection
+        if mode == "key":
+            return any(universal_prototype.__apply_filter_logic(value, filter_dto) for value in values)
+
+        if filter_dto.filter_type in FilterType.comparisons():
+            return any(universal_prototype.__compare(value, filter_dto) for value in values)
+
+        return any(universal_prototype.__apply_filter_logic(universal_prototype.__search_key_of(value), filter_dto)
+                   for value in values)
+
+    @staticmethod
+    def __item_matches_filter(item, filter_dto: universal_filter_dto) -> bool:
+        """
+        Проверяет соответствие элемента критериям фильтрации
+        """
+        return universal_prototype.matches(universal_prototype.project(item, filter_dto), filter_dto)
 
     @staticmethod
     def __is_model_specific_field(item, filter_dto: universal_filter_dto) -> bool:
@@ -85,32 +276,17 @@ class universal_prototype(prototype):
             'nomenclature_model': ['group', 'range'],
             'range_model': ['value', 'base'],
             'receipt_model': ['portions', 'cooking_time', 'steps', 'composition'],
-            'group_model': []  # Группа имеет только базовые поля
+            'group_model': [],  # Группа имеет только базовые поля
+            'transaction_model': ['period', 'value', 'nomenclature', 'storage', 'range']
         }
 
         model_class = item.__class__.__name__
         return (filter_dto.field_name in specific_fields.get(model_class, []))
 
     @staticmethod
-    def __check_model_specific_field(item, filter_dto: universal_filter_dto) -> bool:
-        """Обрабатывает специфичные поля разных моделей"""
-        try:
-            field_value = getattr(item, filter_dto.field_name)
-
-            # Для объектных полей (group, range, base) берем name
-            if hasattr(field_value, 'name'):
-                return universal_prototype.__apply_filter_logic(field_value.name, filter_dto)
-            # Для примитивных полей
-            else:
-                return universal_prototype.__apply_filter_logic(str(field_value), filter_dto)
-
-        except (AttributeError, ValueError):
-            return False
-
-    @staticmethod
-    def __check_nested_structure(item, filter_dto: universal_filter_dto) -> bool:
+    def __nested_values(item, nested_parts: list) -> list:
         """
-        Рекурсивный поиск по вложенным структурам - РЕАЛИЗАЦИЯ ПУНКТА 4
+        Конечные значения по цепочке вложенных объектов - РЕАЛИЗАЦИЯ ПУНКТА 4
         Поддерживает многоуровневые вложенности через точку (.)
 
         Примеры использования:
@@ -119,43 +295,35 @@ class universal_prototype(prototype):
         - "nomenclature.group.name" - группа номенклатуры номенклатуры
         - "composition.nomenclature.name" - номенклатура в составе рецепта
         """
-        try:
-            nested_parts = filter_dto.nested_field.split('.')
-            current_obj = item
-
-            # Рекурсивно проходим по цепочке вложенных объектов
-            for part in nested_parts:
-                if current_obj is None:
-                    return False
-
-                # Обработка списков/массивов (например, composition в рецепте)
-                if isinstance(current_obj, list):
-                    return universal_prototype.__check_nested_list(current_obj, part, filter_dto, nested_parts)
-
-                # Обработка обычных объектов
-                if hasattr(current_obj, part):
-                    current_obj = getattr(current_obj, part)
-                else:
-                    return False
-
-            # Применяем фильтр к конечному значению
-            return universal_prototype.__apply_filter_to_nested_value(current_obj, filter_dto)
+        current_obj = item
+        for part in nested_parts:
+            if current_obj is None:
+                return []
+
+            # Обработка списков/массивов (например, composition в рецепте)
+            if isinstance(current_obj, list):
+                return universal_prototype.__nested_list_values(current_obj, part, nested_parts)
+
+            # Обработка обычных объектов
+            if hasattr(current_obj, part):
+                current_obj = getattr(current_obj, part)
+            else:
+                return []
 
-        except (AttributeError, ValueError, IndexError):
-            return False
+        return [current_obj]
 
     @staticmethod
-    def __check_nested_list(obj_list: list, current_part: str, filter_dto: universal_filter_dto,
-                            remaining_parts: list) -> bool:
+    def __nested_list_values(obj_list: list, current_part: str, remaining_parts: list) -> list:
         """
-        Обрабатывает вложенные структуры, когда встречается список
+        Значения вложенной структуры, когда встречается список
         Например: composition в receipt_model - это список receipt_item_model
         """
+        result = []
         for list_item in obj_list:
             if hasattr(list_item, current_part):
                 nested_value = getattr(list_item, current_part)
 
-                # Если остались еще уровни вложенности, продолжаем рекурсию
+                # Если остались еще уровни вложенности, продолжаем по цепочке
                 if len(remaining_parts) > 1:
                     temp_obj = nested_value
                     for next_part in remaining_parts[1:]:
@@ -164,44 +332,106 @@ class universal_prototype(prototype):
                         else:
                             break
                     else:
-                        if universal_prototype.__apply_filter_to_nested_value(temp_obj, filter_dto):
-                            return True
+                        result.append(temp_obj)
                 # Если это последний уровень
                 else:
-                    if universal_prototype.__apply_filter_to_nested_value(nested_value, filter_dto):
-                        return True
-        return False
+                    result.append(nested_value)
+        return result
 
     @staticmethod
-    def __apply_filter_to_nested_value(value, filter_dto: universal_filter_dto) -> bool:
+    def __compact(value):
         """
-        Применяет фильтр к значению из вложенной структуры
+        Компактное значение поля: даты и числа без изменений, остальное - ключ поиска
+        Ключ поиска нормализован повторно без изменений, поэтому проверка дает тот же результат
         """
-        if value is None:
-            return False
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+
+        return universal_prototype.__search_key_of(value)
+
+    @staticmethod
+    def __search_key_of(value) -> str:
+        """
+        Возвращает ключ поиска для значения поля
+        Для моделей берется заранее рассчитанный ключ наименования
+        """
+        if isinstance(value, entity_model):
+            return value.search_key
 
-        # Если значение - объект с именем, используем name
+        # Объект с именем, но не entity_model
         if hasattr(value, 'name'):
-            return universal_prototype.__apply_filter_logic(value.name, filter_dto)
-        # Если значение - строка или число, конвертируем в строку
-        else:
-            return universal_prototype.__apply_filter_logic(str(value), filter_dto)
+            return text_normalizer.normalize(value.name)
+
+        return text_normalizer.normalize(value)
 
     @staticmethod
-    def __apply_filter_logic(field_value: str, filter_dto: universal_filter_dto) -> bool:
+    def __apply_filter_logic(search_key: str, filter_dto: universal_filter_dto) -> bool:
         """
         Применяет логику фильтрации в зависимости от типа
+        Сравниваются нормализованные ключи (см. text_normalizer)
         """
-        field_value_str = str(field_value).lower()
-        filter_value = filter_dto.value.lower()
-
         if filter_dto.filter_type == FilterType.EQUALS:
-            return field_value_str == filter_value
+            return search_key == filter_dto.search_value
         elif filter_dto.filter_type == FilterType.LIKE:
-            return filter_value in field_value_str
+            return filter_dto.search_value in search_key
+        elif filter_dto.filter_type == FilterType.FUZZY:
+            return bk_tree.distance(search_key, filter_dto.search_value,
+                                    filter_dto.max_distance) <= filter_dto.max_distance
+
+        return False
+
+    @staticmethod
+    def __compare(value, filter_dto: universal_filter_dto) -> bool:
+        """
+        Типизированное сравнение (>=, <=, between)
+        Тип границ определяется по значению поля: дата, число или строка (по ключу поиска)
+        Граница, которую нельзя привести к типу поля, - ошибка фильтра, как и при поиске по индексу
+        """
+        if isinstance(value, datetime):
+            kind = datetime
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            kind = float
+        else:
+            kind = str
+            value = universal_prototype.__search_key_of(value)
+
+        try:
+            low = universal_prototype.__parse_bound(filter_dto.value, kind)
+            high = universal_prototype.__parse_bound(filter_dto.value_to, kind) \
+                if filter_dto.filter_type == FilterType.BETWEEN else None
+        except ValueError:
+            if kind == datetime:
+                raise argument_exception("Некорректный формат даты! Ожидается YYYY-MM-DD")
+            raise argument_exception(f"Некорректное значение для сравнения: {filter_dto.value} / {filter_dto.value_to}")
+
+        try:
+            if filter_dto.filter_type == FilterType.GREATER_OR_EQUALS:
+                return value >= low
+            elif filter_dto.filter_type == FilterType.LESS_OR_EQUALS:
+                return value <= low
+            elif filter_dto.filter_type == FilterType.BETWEEN:
+                return low <= value <= high
+        except TypeError:
+            return False
 
         return False
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def __parse_bound(raw: str, kind: type):
+        """
+        Преобразует строковую границу фильтра к типу поля
+        Результат кешируется, чтобы не разбирать границу для каждого элемента
+        """
+        if kind == datetime:
+            return datetime.strptime(raw, "%Y-%m-%d")
+        if kind == float:
+            return float(raw)
+
+        return text_normalizer.normalize(raw)
+
     # СПЕЦИАЛЬНЫЕ МЕТОДЫ ДЛЯ ВЛОЖЕННЫХ СТРУКТУР (ПУНКТ 4)
 
     def filter_by_base_unit_name(self, base_unit_name: str,
@@ -273,7 +503,8 @@ class universal_prototype(prototype):
             'nomenclature_model': 'nomenclature',
             'group_model': 'group',
             'range_model': 'range',
-            'receipt_model': 'receipt'
+            'receipt_model': 'receipt',
+            'transaction_model': 'transaction'
         }
 
         return type_mapping.get(class_name, 'unknown')
\ No newline at end of file
@@ -0,0 +1,58 @@
+from Src.Core.validator import validator, argument_exception
+
+
+# Параметры агрегации
+# Пример
+#                "group_by":["nomenclature.group.name", "storage.name"],
+#                "aggregates":[
+#                    {"function":"count"},
+#                    {"function":"sum", "field":"value"}
+#                ]
+class aggregation_dto:
+    __group_by:list = []
+    __aggregates:list = []
+
+    # Поддерживаемые агрегатные функции
+    @staticmethod
+    def functions() -> list:
+        return ["count", "sum", "min", "max"]
+
+    # Пути к полям группировки
+    @property
+    def group_by(self) -> list:
+        return self.__group_by
+
+    @group_by.setter
+    def group_by(self, value:list):
+        validator.validate(value, list)
+        for path in value:
+            validator.validate(path, str)
+        self.__group_by = [path.strip() for path in value]
+
+    # Агрегаты: список пар (функция, поле). Для count поле может быть пустым
+    @property
+    def aggregates(self) -> list:
+        return self.__aggregates
+
+    @aggregates.setter
+    def aggregates(self, value:list):
+        validator.validate(value, list)
+        result = []
+        for item in value:
+            validator.validate(item, dict)
+            function = str(item.get("function", "")).strip().lower()
+            field = str(item.get("field") or "").strip()
+            if function not in aggregation_dto.functions():
+                raise argument_exception(f"Неподдерживаемая функция агрегации: {function}. Допустимо: {aggregation_dto.functions()}")
+            if function != "count" and field == "":
+                raise argument_exception(f"Для функции {function} не указано поле!")
+            result.append((function, field))
+
+        self.__aggregates = result
+
+    # Загрузить параметры из словаря запроса
+    def create(self, data:dict) -> "aggregation_dto":
+        validator.validate(data, dict)
+        self.group_by = data.get("group_by") or []
+        self.aggregates = data.get("aggregates") or [ {"function": "count"} ]
+        return self
@@ -1,14 +1,17 @@
 from Src.Core.abstract_dto import abstract_dto
+from Src.Core.fixed_point import fixed_point
 
 # Модель единицы измерения (dto)
 # Пример
 #                "name":"Грамм",
 #                "id":"adb7510f-687d-428f-a697-26e53d3f65b7",
 #                "base_id":null,
-#                "value":1
+#                "value":1,
+#                "scale":3 (точность количества, необязательно)
 class range_dto(abstract_dto):
     __base_id:str = None
     __value:int = 1
+    __scale:int = fixed_point.default_scale()
 
     @property
     def base_id(self) -> str:
@@ -24,4 +27,12 @@ class range_dto(abstract_dto):
     
     @value.setter
     def value(self, value):
-        self.__value = value
\ No newline at end of file
+        self.__value = value
+
+    @property
+    def scale(self) -> int:
+        return self.__scale    
+    
+    @scale.setter
+    def scale(self, value):
+        self.__scale = value
@@ -0,0 +1,64 @@
+from Src.Core.validator import validator, argument_exception
+
+
+# Параметры сортировки и ограничения результата
+# Пример
+#                "sort_by":"nomenclature.name",
+#                "descending":true,
+#                "top":20
+class sorting_dto:
+    __sort_by:str = ""
+    __descending:bool = False
+    __top:int = None
+
+    # Путь к полю сортировки. Пусто - без сортировки
+    @property
+    def sort_by(self) -> str:
+        return self.__sort_by
+
+    @sort_by.setter
+    def sort_by(self, value:str):
+        validator.validate(value, str)
+        self.__sort_by = value.strip()
+
+    # Сортировка по убыванию
+    @property
+    def descending(self) -> bool:
+        return self.__descending
+
+    @descending.setter
+    def descending(self, value:bool):
+        if not isinstance(value, bool):
+            raise argument_exception("Некорректный тип! Ожидается bool")
+        self.__descending = value
+
+    # Количество первых элементов результата. None - без ограничения
+    @property
+    def top(self) -> int:
+        return self.__top
+
+    @top.setter
+    def top(self, value:int):
+        if value is None:
+            self.__top = None
+            return
+
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise argument_exception("Некорректно указано количество (top)!")
+        self.__top = value
+
+    # Признак, что параметры заданы
+    def is_empty(self) -> bool:
+        return self.__sort_by == "" and self.__top is None
+
+    # Загрузить параметры из словаря запроса
+    def create(self, data:dict) -> "sorting_dto":
+        validator.validate(data, dict)
+        if data.get("sort_by"):
+            self.sort_by = data["sort_by"]
+        if "descending" in data:
+            self.descending = data["descending"]
+        if data.get("top") is not None:
+            self.top = data["top"]
+
+        return self
@@ -1,6 +1,7 @@
 from Src.Core.abstract_dto import abstract_dto
 from Src.Core.filter_type import FilterType
-from Src.Core.validator import validator
+from Src.Core.validator import validator, argument_exception
+from Src.Core.text_normalizer import text_normalizer
 
 
 class universal_filter_dto(abstract_dto):
@@ -9,8 +10,11 @@ class universal_filter_dto(abstract_dto):
     """
     __field_name: str = ""
     __value: str = ""
+    __search_value: str = ""  # Нормализованное значение для строковых фильтров
+    __value_to: str = ""  # Верхняя граница для FilterType.BETWEEN
+    __max_distance: int = 2  # Допустимое количество правок для FilterType.FUZZY
     __filter_type: FilterType = FilterType.EQUALS
-    __model_type: str = ""  # Тип модели: nomenclature, group, range, receipt
+    __model_type: str = ""  # Тип модели: nomenclature, group, range, receipt, transaction
     __nested_field: str = ""  # Для поиска во вложенных структурах
 
     @property
@@ -30,6 +34,33 @@ class universal_filter_dto(abstract_dto):
     def value(self, value: str):
         validator.validate(value, str)
         self.__value = value.strip()
+        self.__search_value = text_normalizer.normalize(self.__value)
+
+    @property
+    def search_value(self) -> str:
+        """
+        Значение фильтра, приведенное к ключу поиска (считается один раз на запрос)
+        """
+        return self.__search_value
+
+    @property
+    def value_to(self) -> str:
+        return self.__value_to
+
+    @value_to.setter
+    def value_to(self, value: str):
+        validator.validate(value, str)
+        self.__value_to = value.strip()
+
+    @property
+    def max_distance(self) -> int:
+        return self.__max_distance
+
+    @max_distance.setter
+    def max_distance(self, value: int):
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise argument_exception("Некорректно указано расстояние (max_distance)")
+        self.__max_distance = value
 
     @property
     def filter_type(self) -> FilterType:
@@ -47,7 +78,7 @@ class universal_filter_dto(abstract_dto):
     @model_type.setter
     def model_type(self, value: str):
         validator.validate(value, str)
-        allowed_types = ["nomenclature", "group", "range", "receipt"]
+        allowed_types = universal_filter_dto.model_types()
         if value not in allowed_types:
             raise ValueError(f"Некорректный тип модели. Допустимые значения: {allowed_types}")
         self.__model_type = value.strip()
@@ -61,6 +92,13 @@ class universal_filter_dto(abstract_dto):
         validator.validate(value, str)
         self.__nested_field = value.strip()
 
+    @staticmethod
+    def model_types() -> list:
+        """
+        Допустимые типы моделей для фильтрации
+        """
+        return ["nomenclature", "group", "range", "receipt", "transaction"]
+
     def create(self, data) -> "universal_filter_dto":
         """
         Фабричный метод для создания из словаря
@@ -71,6 +109,10 @@ class universal_filter_dto(abstract_dto):
             self.field_name = data["field_name"]
         if "value" in data:
             self.value = data["value"]
+        if "value_to" in data:
+            self.value_to = data["value_to"]
+        if "max_distance" in data:
+            self.max_distance = data["max_distance"]
         if "filter_type" in data:
             self.filter_type = FilterType(data["filter_type"])
         if "model_type" in data:
@@ -0,0 +1,138 @@
+from Src.reposity import reposity
+from Src.Core.event_type import event_type
+from Src.Core.validator import validator
+from Src.Core.fixed_point import fixed_point
+from Src.Models.balance_snapshot_model import balance_snapshot_model
+from datetime import datetime, timedelta
+import bisect
+import threading
+
+"""
+Сервис снимков остатков на закрытые периоды (помесячно)
+Остаток на дату = ближайший снимок до даты + движение от снимка до даты
+Стоимость расчета зависит от окна отчета, а не от всей истории
+Сервис используется из потоков запросов и фоновых расчетов - снимки строятся под блокировкой
+Снимки - производные данные репозитория: их построение при чтении не меняет поколение данных (reposity.generation)
+"""
+
+
+class balance_snapshot_service:
+
+    def __init__(self):
+        self.__repo = reposity()
+        self.__lock = threading.RLock()
+        self.__repo.subscribe(self.__on_change)
+
+    def opening_balances(self, start_date: datetime) -> dict:
+        """
+        Остатки на начало дня start_date (все транзакции с периодом < start_date)
+        Результат: (код номенклатуры, код склада) -> (номенклатура, склад, единица измерения, остаток)
+        Остаток - целые единицы точности единицы измерения (fixed_point)
+        """
+        validator.validate(start_date, datetime)
+        with self.__lock:
+            self.close(start_date)
+
+            snapshots = self.__repo.data[reposity.snapshot_key()]
+            periods = [snapshot.period for snapshot in snapshots]
+            position = bisect.bisect_right(periods, start_date) - 1
+
+            balances = {}
+            from_date = None
+            if position >= 0:
+                balances = dict(snapshots[position].balances)
+                from_date = snapshots[position].period
+
+        transactions = self.__repo.transaction_index().select(from_date, start_date - timedelta(microseconds=1))
+        return balance_snapshot_service.__apply(balances, transactions)
+
+    def close(self, until: datetime):
+        """
+        Закрыть все месяцы, начало которых не позже until: построить недостающие снимки
+        Каждый новый снимок считается от предыдущего, история не пересчитывается
+        Снимки строятся не дальше месяца после последней проводки и не дальше текущей даты:
+        более поздние снимки не отличаются от последнего
+        """
+        validator.validate(until, datetime)
+        with self.__lock:
+            index = self.__repo.transaction_index()
+            if len(index) == 0:
+                return
+
+            last = balance_snapshot_service.month_start(index.last_period())
+            until = min(until, balance_snapshot_service.__next_month(last), datetime.now())
+
+            snapshots = self.__repo.data[reposity.snapshot_key()]
+            if len(snapshots) > 0:
+                balances = snapshots[-1].balances
+                period = snapshots[-1].period
+            else:
+                balances = {}
+                period = balance_snapshot_service.month_start(index.first_period())
+
+            next_period = balance_snapshot_service.__next_month(period)
+            while next_period <= until:
+                transactions = index.select(period, next_period - timedelta(microseconds=1))
+                balances = balance_snapshot_service.__apply(dict(balances), transactions)
+                self.__repo.append(reposity.snapshot_key(), balance_snapshot_model.create(next_period, balances))
+                period = next_period
+                next_period = balance_snapshot_service.__next_month(period)
+
+    @staticmethod
+    def month_start(value: datetime) -> datetime:
+        """
+        Начало месяца
+        """
+        return datetime(value.year, value.month, 1)
+
+    def __on_change(self, event: event_type, key: str, item):
+        """
+        Транзакция задним числом делает недействительными снимки после ее периода,
+        изменение единиц измерения - все снимки (меняются коэффициенты пересчета)
+        """
+        if event == event_type.RESET:
+            return
+
+        if key not in [reposity.range_key(), reposity.transaction_key()]:
+            return
+
+        with self.__lock:
+            snapshots = list(self.__repo.data[reposity.snapshot_key()])
+            if key == reposity.transaction_key():
+                snapshots = [snapshot for snapshot in snapshots if snapshot.period > item.period]
+
+            for snapshot in reversed(snapshots):
+                self.__repo.remove(reposity.snapshot_key(), snapshot)
+
+    @staticmethod
+    def __next_month(value: datetime) -> datetime:
+        if value.month == 12:
+            return datetime(value.year + 1, 1, 1)
+        return datetime(value.year, value.month + 1, 1)
+
+    @staticmethod
+    def __apply(balances: dict, transactions: list) -> dict:
+        """
+        Добавить движение по транзакциям к остаткам
+        """
+        conversion = reposity().range_conversion()
+        for transaction in transactions:
+            if not transaction.nomenclature or not transaction.storage:
+                continue
+
+            # Остатки хранятся в базовой единице измерения
+            base, quantity = conversion.base_quantity(transaction)
+            key = (transaction.nomenclature.unique_code, transaction.storage.unique_code)
+            entry = balances.get(key)
+            balance = entry[3] if entry is not None else 0
+            unit = entry[2] if entry is not None else base
+
+            # Остаток хранится с наибольшей точностью из встреченных единиц - пересчет без округления
+            if fixed_point.scale_of(base) > fixed_point.scale_of(unit):
+                balance = fixed_point.rescale(balance, fixed_point.scale_of(unit), fixed_point.scale_of(base))
+                unit = base
+            balances[key] = (transaction.nomenclature, transaction.storage, unit,
+                             balance + fixed_point.rescale(quantity, fixed_point.scale_of(base),
+                                                           fixed_point.scale_of(unit)))
+
+        return balances
@@ -1,7 +1,12 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from Src.Dtos.universal_filter_dto import universal_filter_dto
+from Src.Dtos.sorting_dto import sorting_dto
+from Src.Dtos.aggregation_dto import aggregation_dto
+from Src.Core.query_profile import query_profile
+from Src.Core.sharded_executor import sharded_executor
+from Src.Core.single_flight import single_flight
 from Src.Core.universal_prototype import universal_prototype
-from Src.Core.validator import validator, operation_exception
+from Src.Core.validator import validator, operation_exception, argument_exception
 from Src.Models.nomenclature_model import nomenclature_model
 from Src.Models.group_model import group_model
 from Src.Models.range_model import range_model
@@ -19,6 +24,7 @@ class filter_service:
 
     def __init__(self):
         self.__repo = reposity()
+        self.__flights = single_flight()
 
     def setup_routes(self, app):
         """Настройка маршрутов API для Flask"""
@@ -29,11 +35,15 @@ class filter_service:
             POST запрос для фильтрации данных по DOMAIN модели
 
             Args:
-                model_type: Тип DOMAIN модели (nomenclature, group, range, receipt)
+                model_type: Тип DOMAIN модели (nomenclature, group, range, receipt, transaction)
 
             Body:
                 filter_dto: DTO модель фильтрации
                 format: Формат ответа (csv, markdown) - опционально
+                sort_by: Путь к полю сортировки, например nomenclature.name - опционально
+                descending: Сортировка по убыванию - опционально
+                top: Вернуть только первые N элементов - опционально
+                explain: Вернуть план выполнения и время по стадиям - опционально
             """
             try:
                 # Получаем данные из запроса
@@ -41,45 +51,90 @@ class filter_service:
                 if not data:
                     return jsonify({"error": "No JSON data provided"}), 400
 
+                # Одинаковые одновременные запросы (при тех же данных) считаются один раз
+                key = single_flight.key(["filter", model_type, data], self.__repo.generation())
+
+            except (operation_exception, argument_exception) as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+            body, status = self.__flights.do(key, lambda: self._filter_body(model_type, data))[0]
+            return Response(body, status=status, mimetype="application/json")
+
+        @app.route("/api/filter/batch", methods=['POST'])
+        def filter_batch():
+            """
+            POST запрос для пакетной фильтрации. Все фильтры по одной модели
+            вычисляются за один проход по коллекции
+
+            Body:
+                requests: Список фильтров. Каждый элемент - DTO фильтрации c полями
+                    id - ключ результата (опционально, по умолчанию - порядковый номер)
+                    model_type - тип DOMAIN модели
+                    count_only - вернуть только количество (опционально)
+                    sort_by, descending, top - сортировка и ограничение (опционально)
+                format: Формат ответа (csv, markdown) - опционально
+            """
+            try:
+                data = request.get_json()
+                if not data or not isinstance(data.get('requests'), list):
+                    return jsonify({"error": "No filter requests provided"}), 400
+
                 format = data.get('format', response_formats.csv())
+                results = self._filter_batch(data['requests'], format)
 
-                # Создаем DTO фильтрации
-                filter_dto = universal_filter_dto()
-                filter_dto.create(data)
+                return jsonify({
+                    "success": True,
+                    "requests_count": len(results),
+                    "results": results
+                })
 
-                # Валидация типа модели
-                validator.validate(model_type, str)
-                allowed_types = ["nomenclature", "group", "range", "receipt"]
-                if model_type not in allowed_types:
-                    return jsonify({"error": f"Неподдерживаемый тип модели. Допустимо: {allowed_types}"}), 400
+            except (operation_exception, argument_exception) as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+        @app.route("/api/aggregate/<model_type>", methods=['POST'])
+        def aggregate_data(model_type):
+            """
+            POST запрос для агрегации отфильтрованных данных DOMAIN модели
 
-                # Устанавливаем тип модели в DTO
-                filter_dto.model_type = model_type
+            Body:
+                group_by: Список путей группировки, например ["nomenclature.group.name", "storage.name"]
+                aggregates: Список агрегатов, например [{"function": "sum", "field": "value"}]
+                    Функции: count, sum, min, max. По умолчанию - count
+                filter_dto: DTO модель фильтрации (опционально)
+            """
+            try:
+                data = request.get_json()
+                if not data:
+                    return jsonify({"error": "No JSON data provided"}), 400
 
-                # Получаем данные в зависимости от типа модели
-                data_list = self._get_data_by_model_type(model_type)
+                validator.validate(model_type, str)
+                if model_type not in universal_filter_dto.model_types():
+                    return jsonify({"error": f"Неподдерживаемый тип модели. Допустимо: {universal_filter_dto.model_types()}"}), 400
 
-                if not data_list:
-                    return jsonify({"error": f"Данные для модели {model_type} не найдены"}), 404
+                dto = aggregation_dto().create(data)
+                prototype = self._create_prototype(model_type, self._get_data_by_model_type(model_type))
 
-                # Создаем прототип и применяем фильтр
-                prototype = universal_prototype(data_list)
-                filtered_prototype = prototype.apply_filter(filter_dto)
+                # Фильтр применяется, если передан
+                if any(key in data for key in ['field_name', 'nested_field']):
+                    filter_dto = universal_filter_dto().create(data)
+                    filter_dto.model_type = model_type
+                    prototype = prototype.apply_filter(filter_dto)
 
-                # Формируем ответ в нужном формате
-                response_data = self._build_response(filtered_prototype.data, format)
+                rows = prototype.aggregate(dto)
 
                 return jsonify({
                     "success": True,
                     "model_type": model_type,
-                    "filter_applied": filter_dto.field_name or filter_dto.nested_field,
-                    "filter_value": filter_dto.value,
-                    "filter_type": filter_dto.filter_type.value,
-                    "items_count": len(filtered_prototype.data),
-                    "data": response_data
+                    "group_by": dto.group_by,
+                    "groups_count": len(rows),
+                    "data": rows
                 })
 
-            except operation_exception as e:
+            except (operation_exception, argument_exception) as e:
                 return jsonify({"error": str(e)}), 400
             except Exception as e:
                 return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
@@ -122,6 +177,16 @@ class filter_service:
                             "composition.nomenclature.name",
                             "composition.range.name"
                         ]
+                    },
+                    "transaction": {
+                        "basic_fields": ["unique_code"],
+                        "specific_fields": ["period", "value", "nomenclature", "storage", "range"],
+                        "comparison_fields": ["period", "value"],
+                        "nested_examples": [
+                            "nomenclature.name",
+                            "nomenclature.group.name",
+                            "storage.name"
+                        ]
                     }
                 }
 
@@ -136,25 +201,174 @@ class filter_service:
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
 
+    def _filter_body(self, model_type: str, data: dict) -> tuple:
+        """
+        Тело ответа /api/filter/<model_type> (JSON, байты) и код ответа
+        """
+        try:
+            result, status = self._filter_result(model_type, data)
+            return jsonify(result).get_data(), status
+        except (operation_exception, argument_exception) as e:
+            return jsonify({"error": str(e)}).get_data(), 400
+        except Exception as e:
+            return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}).get_data(), 500
+
+    def _filter_result(self, model_type: str, data: dict) -> tuple:
+        """
+        Фильтрация данных по DOMAIN модели (см. /api/filter/<model_type>)
+        Возвращает (результат, код ответа)
+        """
+        format = data.get('format', response_formats.csv())
+        profile = query_profile() if query_profile.is_requested(data) else None
+
+        # Создаем DTO фильтрации
+        filter_dto = universal_filter_dto()
+        filter_dto.create(data)
+
+        # Валидация типа модели
+        validator.validate(model_type, str)
+        allowed_types = universal_filter_dto.model_types()
+        if model_type not in allowed_types:
+            return {"error": f"Неподдерживаемый тип модели. Допустимо: {allowed_types}"}, 400
+
+        # Устанавливаем тип модели в DTO
+        filter_dto.model_type = model_type
+
+        # Получаем данные в зависимости от типа модели
+        data_list = self._get_data_by_model_type(model_type)
+
+        if not data_list:
+            return {"error": f"Данные для модели {model_type} не найдены"}, 404
+
+        # Создаем прототип и применяем фильтр
+        sorting = sorting_dto().create(data)
+        with query_profile.optional_stage(profile, "filtering"):
+            prototype = self._create_prototype(model_type, data_list)
+            filtered_prototype = prototype.apply_filter(filter_dto, profile)
+            filtered_prototype = filtered_prototype.order(sorting)
+            filtered_data = filtered_prototype.data
+
+        # Формируем ответ в нужном формате
+        with query_profile.optional_stage(profile, "rendering"):
+            response_data = self._build_response(filtered_data, format)
+
+        result = {
+            "success": True,
+            "model_type": model_type,
+            "filter_applied": filter_dto.field_name or filter_dto.nested_field,
+            "filter_value": filter_dto.value,
+            "filter_type": filter_dto.filter_type.value,
+            "items_count": len(filtered_data),
+            "data": response_data
+        }
+        if profile is not None:
+            if not sorting.is_empty():
+                profile.detail("sorting", {"sort_by": sorting.sort_by, "descending": sorting.descending,
+                                           "top": sorting.top})
+            result["explain"] = profile.to_dict()
+
+        return result, 200
+
+    def _get_key_by_model_type(self, model_type: str) -> str:
+        """
+        Ключ репозитория по типу модели
+        """
+        keys = {
+            "nomenclature": reposity.nomenclature_key(),
+            "group": reposity.group_key(),
+            "range": reposity.range_key(),
+            "receipt": reposity.receipt_key(),
+            "transaction": reposity.transaction_key()
+        }
+        return keys.get(model_type, "")
+
     def _get_data_by_model_type(self, model_type: str) -> list:
         """
         Получает данные по типу модели из репозитория
         """
         try:
-            if model_type == "nomenclature":
-                return self.__repo.data.get(reposity.nomenclature_key(), [])
-            elif model_type == "group":
-                return self.__repo.data.get(reposity.group_key(), [])
-            elif model_type == "range":
-                return self.__repo.data.get(reposity.range_key(), [])
-            elif model_type == "receipt":
-                return self.__repo.data.get(reposity.receipt_key(), [])
-            else:
-                return []
+            return self.__repo.data.get(self._get_key_by_model_type(model_type), [])
 
         except Exception as e:
             raise operation_exception(f"Ошибка получения данных для модели {model_type}: {str(e)}")
 
+    def _filter_batch(self, requests: list, format: str) -> dict:
+        """
+        Выполняет пакет фильтров. Фильтры группируются по типу модели,
+        каждая коллекция просматривается один раз
+        Каждый фильтр проверяется отдельно: ошибка одного фильтра возвращается по его ключу
+        Результат - словарь: ключ запроса -> результат или описание ошибки
+        """
+        results = {}
+        groups = {}
+
+        request_ids = [str(item.get('id', position)) if isinstance(item, dict) else str(position)
+                       for position, item in enumerate(requests)]
+        duplicates = sorted({request_id for request_id in request_ids if request_ids.count(request_id) > 1})
+        if len(duplicates) > 0:
+            raise argument_exception(f"Повторяющиеся ключи запросов: {', '.join(duplicates)}!")
+
+        for request_id, item in zip(request_ids, requests):
+            try:
+                validator.validate(item, dict)
+                filter_dto = universal_filter_dto().create(item)
+                if not filter_dto.model_type:
+                    raise argument_exception("Не указан тип модели (model_type)!")
+
+                universal_prototype.validate(filter_dto)
+                sorting = sorting_dto().create(item)
+                groups.setdefault(filter_dto.model_type, []).append(
+                    (request_id, filter_dto, sorting, bool(item.get('count_only', False))))
+            except Exception as e:
+                results[request_id] = {"error": str(e)}
+
+        for model_type, group in groups.items():
+            data_list = self._get_data_by_model_type(model_type)
+            prototype = self._create_prototype(model_type, data_list)
+            try:
+                filtered = prototype.apply_filters([filter_dto for _, filter_dto, _, _ in group])
+            except (operation_exception, argument_exception):
+                # Ошибка при выполнении - фильтры группы выполняются по одному, чтобы найти ошибочный
+                filtered = [None] * len(group)
+
+            for (request_id, filter_dto, sorting, count_only), filtered_prototype in zip(group, filtered):
+                try:
+                    if filtered_prototype is None:
+                        filtered_prototype = prototype.apply_filter(filter_dto)
+                    filtered_prototype = filtered_prototype.order(sorting)
+                    result = {
+                        "model_type": model_type,
+                        "filter_applied": filter_dto.field_name or filter_dto.nested_field,
+                        "filter_value": filter_dto.value,
+                        "filter_type": filter_dto.filter_type.value,
+                        "items_count": len(filtered_prototype.data)
+                    }
+                    if not count_only:
+                        result["data"] = self._build_response(filtered_prototype.data, format)
+                except (operation_exception, argument_exception) as e:
+                    result = {"error": str(e)}
+
+                results[request_id] = result
+
+        return {request_id: results[request_id] for request_id in request_ids}
+
+    def _create_prototype(self, model_type: str, data: list) -> universal_prototype:
+        """
+        Создает прототип по данным модели
+        Для транзакций подключается индекс по периоду, для номенклатуры - индекс наименований
+        Большие коллекции дополнительно фильтруются параллельно по шардам
+        """
+        executor = None
+        if len(data) >= sharded_executor.threshold():
+            executor = self.__repo.sharded(self._get_key_by_model_type(model_type))
+
+        if model_type == "transaction":
+            return universal_prototype(data, self.__repo.transaction_index(), executor=executor)
+        if model_type == "nomenclature":
+            return universal_prototype(data, name_index=self.__repo.nomenclature_name_index(), executor=executor)
+
+        return universal_prototype(data, executor=executor)
+
     def _build_response(self, data: list, format: str) -> str:
         try:
             if not data:
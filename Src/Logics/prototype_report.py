@@ -14,19 +14,16 @@ class prototype_report(prototype):
         validator.validate(source, prototype)
         validator.validate(nomenclature, nomenclature_model)
 
-        result = []
-        for item in source.data:
-            if item.nomenclature == nomenclature:
-                result.append(item)
-
-        return source.clone(result)    
+        query = source.query().filter(lambda item: item.nomenclature == nomenclature)
+        return source.clone_query(query)
 
     # Универасльный фильтр
+    # Фильтр откладывается и выполняется вместе с остальной цепочкой
     @staticmethod
     def filter(source:prototype,  filter:filter_dto  ) -> prototype:
         validator.validate(source, prototype)
-        result = prototype.filter( source.data, filter )
-        return source.clone(result)   
+        query = source.query().filter(lambda item: prototype.match(item, filter))
+        return source.clone_query(query)
 
 
 
@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from Src.Core.job_status import job_status
+from Src.Core.validator import validator, argument_exception, operation_exception
+from Src.Models.report_job_model import report_job_model
+
+"""
+Сервис фоновых заданий формирования отчетов
+Задания выполняются в ограниченном пуле потоков, состояние и текущая стадия доступны для опроса,
+результат хранится ограниченное время (ttl) после завершения.
+Общее количество хранимых заданий ограничено (max_jobs): при превышении удаляются самые старые завершенные
+"""
+
+
+class report_job_service:
+
+    def __init__(self, workers: int = 2, ttl: int = 600, max_pending: int = 32, max_jobs: int = 256, clock=None):
+        """
+        clock() - текущее время (по умолчанию datetime.now), подменяется в тестах
+        """
+        validator.validate(workers, int)
+        validator.validate(ttl, int)
+        validator.validate(max_pending, int)
+        validator.validate(max_jobs, int)
+        if workers <= 0 or ttl <= 0 or max_pending <= 0 or max_jobs < max_pending:
+            raise argument_exception("Некорректные параметры пула заданий!")
+        if clock is not None and not callable(clock):
+            raise argument_exception("Некорректный аргумент!")
+
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report_job")
+        self.__ttl = timedelta(seconds=ttl)
+        self.__max_pending = max_pending
+        self.__max_jobs = max_jobs
+        self.__jobs = {}
+        self.__clock = clock or datetime.now
+        self.__lock = threading.Lock()
+
+    def submit(self, name: str, task) -> report_job_model:
+        """
+        Поставить задание в очередь
+        task(listener) - функция расчета; listener(stage) сообщает текущую стадию
+        """
+        validator.validate(name, str)
+        if not callable(task):
+            raise argument_exception("Некорректный аргумент!")
+
+        with self.__lock:
+            self.__purge()
+            pending = sum(1 for job in self.__jobs.values()
+                          if job.status in [job_status.QUEUED, job_status.RUNNING])
+            if pending >= self.__max_pending:
+                raise operation_exception("Превышено количество ожидающих заданий, повторите запрос позже!")
+
+            # Место под новое задание освобождают самые старые завершенные задания
+            finished = sorted((job for job in self.__jobs.values() if job.finished is not None),
+                              key=lambda job: job.finished)
+            for job in finished[:max(0, len(self.__jobs) - self.__max_jobs + 1)]:
+                del self.__jobs[job.unique_code]
+
+            job = report_job_model.create(name)
+            job.created = self.__clock()
+            self.__jobs[job.unique_code] = job
+
+        self.__executor.submit(self.__run, job, task)
+        return job
+
+    def get(self, job_id: str):
+        """
+        Задание по коду. Неизвестные и устаревшие задания - None
+        """
+        with self.__lock:
+            self.__purge()
+            return self.__jobs.get(job_id)
+
+    def to_dict(self, job: report_job_model) -> dict:
+        """
+        Состояние задания для ответа Api
+        """
+        validator.validate(job, report_job_model)
+        result = {
+            "job_id": job.unique_code,
+            "report_type": job.name,
+            "status": job.status.value,
+            "stage": job.stage,
+            "created": job.created.isoformat()
+        }
+        if job.finished is not None:
+            result["finished"] = job.finished.isoformat()
+            result["expires"] = (job.finished + self.__ttl).isoformat()
+        if job.status == job_status.FAILED:
+            result["error"] = job.error
+        return result
+
+    def __run(self, job: report_job_model, task):
+        """
+        Выполнить задание в потоке пула
+        Время завершения записывается до итогового статуса: завершенное задание всегда имеет finished
+        Итоговый статус выставляется в любом случае - задание не остается выполняющимся
+        """
+        status = job_status.FAILED
+        try:
+            job.status = job_status.RUNNING
+            job.result = task(lambda stage: setattr(job, "stage", stage))
+            status = job_status.DONE
+        except Exception as e:
+            # Текст ошибки может быть пустым - тогда сохраняется тип ошибки
+            job.error = str(e) or type(e).__name__
+        finally:
+            job.finished = self.__clock()
+            job.status = status
+
+    def __purge(self):
+        """
+        Удалить завершенные задания с истекшим сроком хранения
+        """
+        expired = self.__clock() - self.__ttl
+        for job_id in [job_id for job_id, job in self.__jobs.items()
+                       if job.finished is not None and job.finished < expired]:
+            del self.__jobs[job_id]
@@ -0,0 +1,147 @@
+import threading
+from datetime import datetime, timedelta
+from Src.reposity import reposity
+from Src.Core.report_disk_cache import report_disk_cache
+from Src.Core.validator import validator, argument_exception
+from Src.Models.settings_model import settings_model
+from Src.Logics.turnover_report_service import turnover_report_service
+
+"""
+Планировщик предварительного расчета стандартных отчетов
+Раз в сутки, в час вне пиковой нагрузки (settings_model.precompute_hour), считает отчеты
+из настроек через turnover_report_service и сохраняет готовые ответы в дисковый кэш.
+Запросы с теми же параметрами отдаются из кэша, пока новые проводки его не сделают устаревшим
+"""
+
+
+class report_scheduler_service:
+
+    def __init__(self, app, turnover_service: turnover_report_service, settings: settings_model):
+        """
+        app - приложение Flask: ответы формируются в его контексте, как в маршруте /api/report/turnover
+        """
+        validator.validate(turnover_service, turnover_report_service)
+        validator.validate(settings, settings_model)
+        self.__repo = reposity()
+        self.__app = app
+        self.__turnover_service = turnover_service
+        self.__settings = settings
+        self.__cache = report_disk_cache(settings.report_cache_path)
+        self.__stopped = threading.Event()
+        self.__thread = None
+        self.__last_run = None
+
+        # Маршрут ОСВ читает готовые ответы из того же кэша
+        turnover_service.report_cache = self.__cache
+
+    # Дисковый кэш готовых отчетов
+    @property
+    def cache(self) -> report_disk_cache:
+        return self.__cache
+
+    # Время последнего расчета
+    @property
+    def last_run(self) -> datetime:
+        return self.__last_run
+
+    @staticmethod
+    def periods() -> list:
+        """
+        Поддерживаемые периоды: yesterday (вчерашний день), month_to_date (с начала месяца по сегодня)
+        """
+        return ["yesterday", "month_to_date"]
+
+    def requests(self, now: datetime = None) -> list:
+        """
+        Параметры запросов /api/report/turnover для отчетов из настроек на дату now
+        Период подставляется конкретными датами - такие же параметры передает клиент
+        """
+        now = now or datetime.now()
+        storages = self.__repo.data.get(reposity.storage_key(), [])
+        result = []
+        for report in self.__settings.precomputed_reports:
+            if not isinstance(report, dict):
+                raise argument_exception("Некорректно описан отчет для предварительного расчета!")
+
+            period = report.get("period", "yesterday")
+            if period not in report_scheduler_service.periods():
+                raise argument_exception(f"Некорректно указан период отчета: {period}!")
+
+            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            if period == "yesterday":
+                start_date = end_date = today - timedelta(days=1)
+            else:
+                start_date, end_date = today.replace(day=1), today
+
+            body = {
+                "format": report.get("format", self.__settings.default_response_format),
+                "start_date": start_date.strftime("%Y-%m-%d"),
+                "end_date": end_date.strftime("%Y-%m-%d")
+            }
+            if not report.get("per_storage", False):
+                result.append(body)
+                continue
+
+            for storage in storages:
+                result.append(dict(body, nested_field="storage.unique_code", value=storage.unique_code,
+                                   filter_type="equals"))
+
+        return result
+
+    def run(self, now: datetime = None) -> int:
+        """
+        Посчитать отчеты из настроек и сохранить ответы в кэш
+        Возвращает количество сохраненных ответов (ответы с ошибкой не сохраняются)
+        Записи прежних расчетов (отчеты за прошедшие даты) удаляются
+        """
+        stored = []
+        with self.__app.app_context():
+            for body in self.requests(now):
+                key = report_disk_cache.key(["turnover", body])
+                generation = self.__repo.generation()
+                response, status = self.__turnover_service._turnover_body(body)
+                if status == 200:
+                    self.__cache.put(key, generation, response)
+                    stored.append(key)
+
+        self.__cache.prune(stored)
+        self.__last_run = datetime.now()
+        return len(stored)
+
+    def next_run(self, now: datetime = None) -> datetime:
+        """
+        Ближайшее время расчета после now
+        """
+        now = now or datetime.now()
+        result = now.replace(hour=self.__settings.precompute_hour, minute=0, second=0, microsecond=0)
+        if result <= now:
+            result += timedelta(days=1)
+        return result
+
+    def start(self):
+        """
+        Запустить расчет по расписанию в фоновом потоке
+        """
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__loop, name="report_scheduler", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Остановить расчет по расписанию
+        """
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __loop(self):
+        while not self.__stopped.wait((self.next_run() - datetime.now()).total_seconds()):
+            try:
+                self.run()
+            except Exception:
+                # Ошибка расчета не должна останавливать расписание
+                pass
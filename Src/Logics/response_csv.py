@@ -1,30 +1,52 @@
+import io
+import csv
+import itertools
 from Src.Core.abstract_response import abstract_response
 from Src.Core.common import common
+from Src.Core.field_getter import field_getter
+from Src.Core.validator import operation_exception
 
 
 """
 Класс для формирования данных в формате Csv
+Разделитель - ";", значения с разделителем, кавычками или переводом строки экранируются по правилам csv.
+Поля определяются по первому элементу один раз, значения читаются заранее подготовленной функцией
 """
 class response_scv(abstract_response):
 
+    # Разделитель значений
+    __delimiter: str = ";"
+
     # Сформировать
     def build(self, data: list) -> str:
-        text = super().build( data)
+        super().build( data)
+        return "".join(self.iter_build(data)).strip()
+
+    # Сформировать по частям: шапка, затем по одной строке на элемент
+    # Строки пишутся через общий буфер, он очищается после каждой части - память не растет с объемом данных
+    def iter_build(self, data):
+        items = iter(data)
+        first = next(items, None)
+        if first is None:
+            raise operation_exception("Нет данных!")
 
         # Шапка
-        item = data [ 0 ]
-        fields = common.get_fields( item )
-        for field in fields:
-            text += f"{field};"
+        fields = common.get_fields( first )
+        getter = field_getter.values(fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=response_scv.__delimiter, lineterminator="\n")
+        writer.writerow(fields)
+        yield response_scv.__flush(buffer)
 
-        text = text[:-1] + '\n'
-        
         # Данные
-        for obj in data:
-            for field in fields:
-                value = getattr(obj, field)
-                text += f"{value};"
-            text = text[:-1] + '\n'
-
-        return text.strip() 
+        for item in itertools.chain([first], items):
+            writer.writerow([str(value) for value in getter(item)])
+            yield response_scv.__flush(buffer)
 
+    # Забрать накопленный текст и очистить буфер
+    @staticmethod
+    def __flush(buffer: io.StringIO) -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
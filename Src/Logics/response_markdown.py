@@ -1,33 +1,49 @@
+import itertools
 from Src.Core.abstract_response import abstract_response
 from Src.Core.common import common
+from Src.Core.field_getter import field_getter
+from Src.Core.validator import operation_exception
 
 
 """
 Сформировать ответ в виде Markdown формата
+Поля определяются по первому элементу один раз, значения читаются заранее подготовленной функцией.
+Строки таблицы выдаются частями по __chunk_size строк - время линейно от объема данных
 """
 class response_markdown(abstract_response):
 
+    # Количество строк таблицы в одной части ответа
+    __chunk_size: int = 64
+
     # Сформировать 
     def build(self, data: list) -> str:
-        text = super().build( data)
+        super().build( data)
+        return "".join(self.iter_build(data))
 
-        # Получаем первое значение для составления заголовков
-        first_item = data[0]
-        type_name = first_item.__class__.__name__
-        text += f"#{type_name}\n"        
-        fields = common.get_fields(first_item)
+    # Сформировать по частям: заголовок и шапка таблицы, затем строки таблицы
+    def iter_build(self, data):
+        items = iter(data)
+        first = next(items, None)
+        if first is None:
+            raise operation_exception("Нет данных!")
 
-        # Формирование шапки таблицы
-        text += "| "
-        text += " | ".join(fields)
-        text += " |\n"
+        # Получаем первое значение для составления заголовков
+        type_name = first.__class__.__name__
+        fields = common.get_fields(first)
+        getter = field_getter.values(fields)
 
-        # Разделительная линия под шапкой
-        text += "|-" * len(fields) + "|\n"
+        # Формирование шапки таблицы и разделительная линия под шапкой
+        yield f"#{type_name}\n" + "| " + " | ".join(fields) + " |\n" + "|-" * len(fields) + "|\n"
 
         # Перебор данных и построение тела таблицы
-        for item in data:
-            row_values = [str(getattr(item, field)) for field in fields]
-            text += "| " + " | ".join(row_values) + " |\n"
-
-        return text
\ No newline at end of file
+        rows = (response_markdown.__row(getter(item)) for item in itertools.chain([first], items))
+        while True:
+            chunk = "".join(itertools.islice(rows, response_markdown.__chunk_size))
+            if chunk == "":
+                break
+            yield chunk
+
+    # Строка таблицы по значениям полей
+    @staticmethod
+    def __row(values: tuple) -> str:
+        return "| " + " | ".join(map(str, values)) + " |\n"
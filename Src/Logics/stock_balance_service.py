@@ -0,0 +1,220 @@
+from flask import request, jsonify
+from Src.reposity import reposity
+from Src.Core.event_type import event_type
+from Src.Core.fenwick_tree import fenwick_tree
+from Src.Core.fixed_point import fixed_point
+from Src.Core.validator import validator, argument_exception, operation_exception
+from datetime import datetime
+import threading
+
+"""
+Сервис остатков на дату
+Для каждой пары (номенклатура, склад) поддерживаются деревья Фенвика прихода и расхода по номерам дней.
+Проводка (в том числе задним числом) добавляется за O(log n), остаток на дату и движение
+за период считаются за O(log n) без перебора проводок
+Сервис используется из потоков запросов - деревья меняются и читаются под блокировкой
+"""
+
+
+class stock_balance_service:
+
+    # Начало отсчета номеров дней
+    __epoch: datetime = datetime.min
+
+    # Количество дней в диапазоне деревьев (весь диапазон datetime: 0001-01-01 - 9999-12-31)
+    __days: int = 1 << 22
+
+    def __init__(self):
+        self.__repo = reposity()
+        self.__trees = {}
+        self.__postings = {}
+        self.__generation = -1
+        self.__ranges_generation = -1
+        self.__lock = threading.RLock()
+        self.__repo.subscribe(self.__on_change)
+
+    def setup_routes(self, app):
+        """Настройка маршрутов API для остатков"""
+
+        @app.route("/api/stock/balance", methods=['GET', 'POST'])
+        def stock_balance():
+            """
+            Остатки на дату
+
+            Параметры (JSON или строка запроса):
+                date: Дата остатка (включительно), по умолчанию - текущая
+                start_date: Начало периода для движения (опционально)
+                nomenclature_id: Код номенклатуры (опционально)
+                storage_id: Код склада (опционально)
+            """
+            try:
+                data = request.get_json(silent=True) or request.args.to_dict()
+                date = datetime.strptime(data["date"], "%Y-%m-%d") if data.get("date") else datetime.now()
+                start_date = datetime.strptime(data["start_date"], "%Y-%m-%d") if data.get("start_date") else None
+                items = self.balances(date, data.get("nomenclature_id"), data.get("storage_id"), start_date)
+
+                return jsonify({
+                    "success": True,
+                    "date": date.strftime("%Y-%m-%d"),
+                    "start_date": start_date.strftime("%Y-%m-%d") if start_date else None,
+                    "items_count": len(items),
+                    "items": items
+                })
+
+            except (operation_exception, argument_exception, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+    @staticmethod
+    def day_index(value: datetime) -> int:
+        """
+        Номер дня от начала отсчета
+        """
+        validator.validate(value, datetime)
+        index = (value - stock_balance_service.__epoch).days
+        if index < 0 or index >= stock_balance_service.__days:
+            raise argument_exception(f"Дата вне допустимого диапазона: {value}!")
+        return index
+
+    def balance(self, nomenclature_code: str, storage_code: str, date: datetime) -> int:
+        """
+        Остаток на конец дня date в целых единицах базовой единицы измерения
+        """
+        day = stock_balance_service.day_index(date)
+        with self.__lock:
+            self.__refresh()
+            entry = self.__trees.get((nomenclature_code, storage_code))
+            if entry is None:
+                return 0
+
+            return entry[3].prefix(day) - entry[4].prefix(day)
+
+    def movement(self, nomenclature_code: str, storage_code: str, start_date: datetime, end_date: datetime) -> tuple:
+        """
+        Приход и расход за дни [start_date, end_date] в целых единицах базовой единицы измерения
+        """
+        lo = stock_balance_service.day_index(start_date)
+        hi = stock_balance_service.day_index(end_date)
+        with self.__lock:
+            self.__refresh()
+            entry = self.__trees.get((nomenclature_code, storage_code))
+            if entry is None:
+                return 0, 0
+
+            return entry[3].range_sum(lo, hi), entry[4].range_sum(lo, hi)
+
+    def balances(self, date: datetime, nomenclature_code: str = None, storage_code: str = None,
+                 start_date: datetime = None) -> list:
+        """
+        Остатки на конец дня date по номенклатуре / складу (без условия - по всем)
+        Если указан start_date - дополнительно сальдо на начало и движение за период
+        """
+        day = stock_balance_service.day_index(date)
+        start_day = stock_balance_service.day_index(start_date) if start_date is not None else None
+        with self.__lock:
+            self.__refresh()
+            if nomenclature_code is not None and storage_code is not None:
+                keys = [(nomenclature_code, storage_code)] if (nomenclature_code, storage_code) in self.__trees else []
+            else:
+                keys = [key for key in self.__trees
+                        if (nomenclature_code is None or key[0] == nomenclature_code)
+                        and (storage_code is None or key[1] == storage_code)]
+
+            result = []
+            for key in keys:
+                nomenclature, storage, unit, income, outcome = self.__trees[key]
+                scale = fixed_point.scale_of(unit)
+                row = {
+                    "nomenclature_code": nomenclature.unique_code,
+                    "nomenclature_name": nomenclature.name,
+                    "storage_code": storage.unique_code,
+                    "storage_name": storage.name,
+                    "unit_name": unit.name if unit is not None else "",
+                    "balance": fixed_point.to_decimal(income.prefix(day) - outcome.prefix(day), scale)
+                }
+                if start_day is not None:
+                    row["start_balance"] = fixed_point.to_decimal(
+                        income.prefix(start_day - 1) - outcome.prefix(start_day - 1), scale)
+                    row["income"] = fixed_point.to_decimal(income.range_sum(start_day, day), scale)
+                    row["outcome"] = fixed_point.to_decimal(outcome.range_sum(start_day, day), scale)
+                result.append(row)
+
+        return result
+
+    def __on_change(self, event: event_type, key: str, item):
+        """
+        Обновление деревьев по событию репозитория
+        """
+        if key != reposity.transaction_key():
+            return
+
+        with self.__lock:
+            try:
+                if event == event_type.RESET:
+                    self.__clear()
+                elif self.__generation == self.__repo.generation(key) - 1:
+                    self.__apply(item, 1 if event == event_type.APPEND else -1)
+                else:
+                    # Пропущены изменения - деревья будут перестроены при следующем обращении
+                    return
+            except Exception:
+                # Подписчик не должен прерывать изменение репозитория и оповещение остальных подписчиков
+                # Деревья будут перестроены при следующем обращении
+                self.__generation = -1
+                return
+
+            self.__generation = self.__repo.generation(key)
+
+    def __refresh(self):
+        """
+        Полное построение, если данные изменялись в обход событий репозитория
+        или изменились единицы измерения
+        """
+        if self.__generation == self.__repo.generation(reposity.transaction_key()) \
+                and self.__ranges_generation == self.__repo.generation(reposity.range_key()):
+            return
+
+        self.__clear()
+        for transaction in self.__repo.data.get(reposity.transaction_key(), []):
+            self.__apply(transaction, 1)
+        self.__generation = self.__repo.generation(reposity.transaction_key())
+        self.__ranges_generation = self.__repo.generation(reposity.range_key())
+
+    def __clear(self):
+        self.__trees = {}
+        self.__postings = {}
+
+    def __apply(self, transaction, sign: int):
+        """
+        Добавить (sign = 1) или вычесть (sign = -1) проводку
+        Вычитается то, что было добавлено: количество и период проводки могли измениться после добавления
+        Проводки различаются по объекту, как в reposity.remove: коды транзакций могут повторяться
+        """
+        if sign < 0:
+            posting = self.__postings.pop(id(transaction), None)
+            if posting is not None:
+                _, key, day, quantity = posting
+                tree = self.__trees[key][3] if quantity > 0 else self.__trees[key][4]
+                tree.add(day, -abs(quantity))
+            return
+
+        if not transaction.nomenclature or not transaction.storage:
+            return
+
+        unit, quantity = self.__repo.range_conversion().base_quantity(transaction)
+        key = (transaction.nomenclature.unique_code, transaction.storage.unique_code)
+        entry = self.__trees.get(key)
+        if entry is None:
+            entry = self.__trees[key] = [transaction.nomenclature, transaction.storage, unit,
+                                         fenwick_tree(stock_balance_service.__days),
+                                         fenwick_tree(stock_balance_service.__days)]
+
+        quantity = fixed_point.rescale(quantity, fixed_point.scale_of(unit), fixed_point.scale_of(entry[2]))
+        day = stock_balance_service.day_index(transaction.period)
+        if quantity > 0:
+            entry[3].add(day, quantity)
+        else:
+            entry[4].add(day, -quantity)
+        # Ссылка на транзакцию хранится вместе с проводкой, чтобы id объекта не был занят другим
+        self.__postings[id(transaction)] = (transaction, key, day, quantity)
@@ -0,0 +1,218 @@
+from Src.reposity import reposity
+from Src.Core.event_type import event_type
+from Src.Core.validator import validator
+from Src.Core.fixed_point import fixed_point
+from datetime import datetime
+import bisect
+import threading
+
+"""
+Сервис материализованных оборотов по (номенклатура, склад, день)
+Агрегаты обновляются за O(1) при добавлении / удалении транзакции (подписка на репозиторий)
+Отчет за период собирается из дневных агрегатов, без перебора проводок
+Сервис используется из потоков запросов и фоновых расчетов - агрегаты меняются под блокировкой
+"""
+
+
+class turnover_aggregate_service:
+
+    def __init__(self):
+        self.__repo = reposity()
+        self.__days = []
+        self.__buckets = {}
+        self.__postings = {}
+        self.__timed = 0
+        self.__generation = -1
+        self.__ranges_generation = -1
+        self.__lock = threading.RLock()
+        self.__repo.subscribe(self.__on_change)
+
+    def covers(self, start_date: datetime = None, end_date: datetime = None) -> bool:
+        """
+        Признак, что период можно посчитать по дневным агрегатам:
+        границы и все проводки приходятся на начало дня
+        """
+        with self.__lock:
+            self.__refresh()
+            if self.__timed > 0:
+                return False
+
+        return all(value is None or value == turnover_aggregate_service.day_of(value)
+                   for value in [start_date, end_date])
+
+    def totals(self, start_date: datetime = None, end_date: datetime = None) -> tuple:
+        """
+        Обороты за период [start_date, end_date] по (номенклатура, склад)
+        Результат: (группы в формате _group_transactions с полями income / outcome в целых единицах
+        точности единицы измерения группы, количество просмотренных дней)
+        """
+        with self.__lock:
+            days, buckets = self.__select(start_date, end_date)
+
+        grouped = {}
+        for day, bucket in zip(days, buckets):
+            for (nomenclature_code, storage_code), entry in bucket:
+                key = f"{nomenclature_code}_{storage_code}"
+                group = grouped.get(key)
+                if group is None:
+                    group = grouped[key] = {
+                        'nomenclature': entry[0],
+                        'storage': entry[1],
+                        'unit': entry[2],
+                        'transactions': [],
+                        'income': 0,
+                        'outcome': 0
+                    }
+
+                # Единица измерения дня может отличаться от единицы группы - пересчет к большей точности
+                from_scale = fixed_point.scale_of(entry[2])
+                to_scale = fixed_point.scale_of(group['unit'])
+                if from_scale > to_scale:
+                    group['income'] *= 10 ** (from_scale - to_scale)
+                    group['outcome'] *= 10 ** (from_scale - to_scale)
+                    group['unit'] = entry[2]
+                    to_scale = from_scale
+                group['income'] += fixed_point.rescale(entry[3], from_scale, to_scale)
+                group['outcome'] += fixed_point.rescale(entry[4], from_scale, to_scale)
+
+        return grouped, len(days)
+
+    def daily(self, start_date: datetime = None, end_date: datetime = None):
+        """
+        Дневные обороты за период [start_date, end_date]
+        Результат: (день, номенклатура, склад, единица измерения, приход, расход) по возрастанию дня
+        """
+        with self.__lock:
+            days, buckets = self.__select(start_date, end_date)
+
+        for day, bucket in zip(days, buckets):
+            for _, entry in bucket:
+                yield day, entry[0], entry[1], entry[2], entry[3], entry[4]
+
+    def __select(self, start_date: datetime, end_date: datetime) -> tuple:
+        """
+        Копия дневных агрегатов за период (вызывается под блокировкой)
+        Результат: (дни, агрегаты дней в виде списков (ключ, значения))
+        """
+        self.__refresh()
+        low = bisect.bisect_left(self.__days, start_date) if start_date else 0
+        high = bisect.bisect_right(self.__days, end_date) if end_date else len(self.__days)
+        days = self.__days[low:high]
+        return days, [[(key, tuple(entry)) for key, entry in self.__buckets[day].items()] for day in days]
+
+    @staticmethod
+    def day_of(value: datetime) -> datetime:
+        """
+        Начало дня
+        """
+        return datetime(value.year, value.month, value.day)
+
+    def __on_change(self, event: event_type, key: str, item):
+        """
+        Обновление агрегатов по событию репозитория
+        """
+        if key != reposity.transaction_key():
+            return
+
+        with self.__lock:
+            try:
+                if event == event_type.RESET:
+                    self.__clear()
+                elif self.__generation == self.__repo.generation(key) - 1:
+                    self.__apply(item, 1 if event == event_type.APPEND else -1)
+                else:
+                    # Пропущены изменения - агрегаты будут перестроены при следующем обращении
+                    return
+            except Exception:
+                # Подписчик не должен прерывать изменение репозитория и оповещение остальных подписчиков
+                # Агрегаты будут перестроены при следующем обращении
+                self.__generation = -1
+                return
+
+            self.__generation = self.__repo.generation(key)
+
+    def __refresh(self):
+        """
+        Полное построение, если данные изменялись в обход событий репозитория
+        или изменились единицы измерения (коэффициенты пересчета)
+        """
+        if self.__generation == self.__repo.generation(reposity.transaction_key()) \
+                and self.__ranges_generation == self.__repo.generation(reposity.range_key()):
+            return
+
+        self.__clear()
+        for transaction in self.__repo.data.get(reposity.transaction_key(), []):
+            self.__apply(transaction, 1)
+        self.__generation = self.__repo.generation(reposity.transaction_key())
+        self.__ranges_generation = self.__repo.generation(reposity.range_key())
+
+    def __clear(self):
+        self.__days = []
+        self.__buckets = {}
+        self.__postings = {}
+        self.__timed = 0
+
+    def __apply(self, transaction, sign: int):
+        """
+        Добавить (sign = 1) или вычесть (sign = -1) проводку из дневного агрегата
+        Вычитается то, что было добавлено: количество и период проводки могли измениться после добавления
+        Проводки различаются по объекту, как в reposity.remove: коды транзакций могут повторяться
+        """
+        if sign < 0:
+            entry = self.__postings.pop(id(transaction), None)
+            if entry is not None:
+                self.__change(*entry[1], -1)
+            return
+
+        validator.validate(transaction.period, datetime)
+        if not transaction.nomenclature or not transaction.storage:
+            return
+
+        day = turnover_aggregate_service.day_of(transaction.period)
+        timed = transaction.period != day
+
+        # Агрегат хранится в базовой единице измерения
+        unit, quantity = self.__repo.range_conversion().base_quantity(transaction)
+        posting = (day, timed, transaction.nomenclature, transaction.storage, unit, quantity)
+        self.__change(*posting, 1)
+        # Ссылка на транзакцию хранится вместе с проводкой, чтобы id объекта не был занят другим
+        self.__postings[id(transaction)] = (transaction, posting)
+
+    def __change(self, day: datetime, timed: bool, nomenclature, storage, unit, quantity: int, sign: int):
+        """
+        Изменить дневной агрегат на количество quantity (в единице unit) со знаком sign
+        """
+        if timed:
+            self.__timed += sign
+
+        bucket = self.__buckets.get(day)
+        if bucket is None:
+            bucket = self.__buckets[day] = {}
+            bisect.insort(self.__days, day)
+
+        key = (nomenclature.unique_code, storage.unique_code)
+        entry = bucket.get(key)
+        if entry is None:
+            entry = bucket[key] = [nomenclature, storage, unit, 0, 0, 0]
+
+        # Агрегат хранится с наибольшей точностью из встреченных единиц - пересчет без округления
+        from_scale = fixed_point.scale_of(unit)
+        to_scale = fixed_point.scale_of(entry[2])
+        if from_scale > to_scale:
+            entry[3] *= 10 ** (from_scale - to_scale)
+            entry[4] *= 10 ** (from_scale - to_scale)
+            entry[2] = unit
+            to_scale = from_scale
+        quantity = fixed_point.rescale(quantity, from_scale, to_scale)
+        if quantity > 0:
+            entry[3] += sign * quantity
+        else:
+            entry[4] -= sign * quantity
+        entry[5] += sign
+
+        # Пустые агрегаты удаляются, чтобы отчет совпадал с расчетом по проводкам
+        if entry[5] == 0:
+            del bucket[key]
+            if len(bucket) == 0:
+                del self.__buckets[day]
+                self.__days.remove(day)
@@ -0,0 +1,133 @@
+from Src.reposity import reposity
+from Src.Core.validator import validator, operation_exception
+from Src.Core.fixed_point import fixed_point
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Векторизованный расчет оборотов (NumPy)
+Проводки раскладываются в колонки: код группы (номенклатура, склад) и количество в целых единицах
+точности базовой единицы измерения группы (fixed_point). Если суммы могут выйти за пределы int64,
+колонки хранятся целыми числами Python (dtype=object) - результат остается точным. Приход и расход считаются через np.add.at по маскам знака.
+Результат - группы в формате turnover_report_service._group_transactions с посчитанными income / outcome,
+строки ОСВ формируются тем же кодом, что и для обычного расчета
+"""
+
+
+class turnover_numpy_engine:
+
+    def __init__(self):
+        self.__repo = reposity()
+
+    @staticmethod
+    def available() -> bool:
+        """
+        Признак, что NumPy установлен
+        """
+        return np is not None
+
+    def group_period(self, start_date: datetime = None, end_date: datetime = None) -> dict:
+        """
+        Обороты за период по всем транзакциям репозитория
+        Колонки строятся один раз на поколение данных, период выбирается срезом по индексу
+        """
+        turnover_numpy_engine.__require()
+        columns = self.__repo.cached(reposity.transaction_key(), "numpy_columns",
+                                     lambda _: self.__columns(self.__repo.transaction_index().select()),
+                                     depends=(reposity.range_key(),))
+        lo, hi = self.__repo.transaction_index().bounds(start_date, end_date)
+        return turnover_numpy_engine.__aggregate(columns["codes"][lo:hi], columns["quantities"][lo:hi],
+                                                 columns["groups"])
+
+    def group_transactions(self, transactions: list) -> dict:
+        """
+        Обороты по произвольному списку транзакций (например, после дополнительного фильтра)
+        """
+        turnover_numpy_engine.__require()
+        validator.validate(transactions, list)
+        columns = self.__columns(transactions)
+        return turnover_numpy_engine.__aggregate(columns["codes"], columns["quantities"], columns["groups"])
+
+    @staticmethod
+    def __require():
+        if np is None:
+            raise operation_exception("Для расчета необходим пакет numpy!")
+
+    def __columns(self, transactions: list) -> dict:
+        """
+        Колоночное представление транзакций
+            - codes - код группы (-1 для транзакций без номенклатуры / склада)
+            - quantities - количество в целых единицах точности базовой единицы измерения
+            - groups - (номенклатура, склад, базовая единица измерения) по коду группы
+        Пересчет в базовую единицу выполняется в целых числах Python (см. range_conversion.base_quantity)
+        """
+        conversion = self.__repo.range_conversion()
+        keys = {}
+        groups = []
+        codes = []
+        quantities = []
+        bound = 0
+        for transaction in transactions:
+            nomenclature = transaction.nomenclature
+            storage = transaction.storage
+            if not nomenclature or not storage:
+                codes.append(-1)
+                quantities.append(0)
+                continue
+
+            base, quantity = conversion.base_quantity(transaction)
+            key = (nomenclature.unique_code, storage.unique_code)
+            code = keys.get(key)
+            if code is None:
+                code = keys[key] = len(groups)
+                groups.append((nomenclature, storage, base))
+            quantity = fixed_point.rescale(quantity, fixed_point.scale_of(base), fixed_point.scale_of(groups[code][2]))
+            codes.append(code)
+            quantities.append(quantity)
+            bound += abs(quantity)
+
+        # Любая сумма по модулю не больше суммы модулей - при ней в int64 переполнения не будет
+        dtype = np.int64 if bound <= np.iinfo(np.int64).max else object
+        return {
+            "codes": np.array(codes, dtype=np.int64),
+            "quantities": np.array(quantities, dtype=dtype),
+            "groups": groups
+        }
+
+    @staticmethod
+    def __aggregate(codes, quantities, groups: list) -> dict:
+        """
+        Приход / расход по группам в целых единицах
+        """
+        known = codes >= 0
+        codes, quantities = codes[known], quantities[known]
+        if len(codes) == 0:
+            return {}
+
+        income_mask = quantities > 0
+        outcome_mask = ~income_mask
+
+        income = np.zeros(len(groups), dtype=quantities.dtype)
+        outcome = np.zeros(len(groups), dtype=quantities.dtype)
+        np.add.at(income, codes[income_mask], quantities[income_mask])
+        np.add.at(outcome, codes[outcome_mask], -quantities[outcome_mask])
+
+        # Порядок групп - по первой проводке, как при обычной группировке
+        present, first = np.unique(codes, return_index=True)
+        grouped = {}
+        for code in present[np.argsort(first)].tolist():
+            nomenclature, storage, unit = groups[code]
+            grouped[f"{nomenclature.unique_code}_{storage.unique_code}"] = {
+                'nomenclature': nomenclature,
+                'storage': storage,
+                'unit': unit,
+                'transactions': [],
+                'income': int(income[code]),
+                'outcome': int(outcome[code])
+            }
+
+        return grouped
@@ -0,0 +1,207 @@
+import bisect
+import pickle
+import hashlib
+from collections import OrderedDict
+from array import array
+from Src.reposity import reposity
+from Src.Core.fixed_point import fixed_point
+from Src.Core.sharded_executor import sharded_executor
+from Src.Core.validator import validator
+from datetime import datetime
+
+
+# Разобранные разделы в процессе-исполнителе: токен набора -> {номер раздела: колонки}
+# Хранятся разделы нескольких последних наборов - отфильтрованные наборы не вытесняют разделы репозитория
+_worker_partitions = OrderedDict()
+
+# Количество наборов, разделы которых хранит процесс-исполнитель
+_worker_tokens = 8
+
+
+# Посчитать обороты раздела (одного склада) в процессе-исполнителе
+# Результат: [(код группы, позиция первой проводки, приход, расход)]
+# None - раздела еще нет в этом процессе, его нужно прислать (payload)
+def _turnover_partition(token: str, number: int, payload, start_date, end_date):
+    partitions = _worker_partitions.get(token)
+    if partitions is None:
+        partitions = _worker_partitions[token] = {}
+        while len(_worker_partitions) > _worker_tokens:
+            _worker_partitions.popitem(last=False)
+    _worker_partitions.move_to_end(token)
+
+    partition = partitions.get(number)
+    if partition is None:
+        if payload is None:
+            return None
+        partition = partitions[number] = pickle.loads(payload)
+
+    periods, positions, codes, quantities = partition
+    lo = 0 if start_date is None else bisect.bisect_left(periods, start_date)
+    hi = len(periods) if end_date is None else bisect.bisect_right(periods, end_date)
+
+    totals = {}
+    for position in range(lo, hi):
+        code = codes[position]
+        entry = totals.get(code)
+        if entry is None:
+            entry = totals[code] = [positions[position], 0, 0]
+
+        quantity = quantities[position]
+        if quantity > 0:
+            entry[1] += quantity
+        else:
+            entry[2] -= quantity
+
+    return [(code, first, income, outcome) for code, (first, income, outcome) in totals.items()]
+
+
+"""
+Параллельный расчет оборотов по складам
+Проводки делятся на разделы по складу. Каждый раздел - компактные колонки (период, код группы,
+количество в базовой единице), сериализуется один раз на поколение данных и считается в общем пуле
+процессов. Запрос отправляется без данных: раздел пересылается только процессу, у которого его еще нет.
+Результаты разделов объединяются в группы формата _group_transactions
+"""
+
+
+class turnover_parallel_engine:
+
+    def __init__(self):
+        self.__repo = reposity()
+
+    def group_period(self, start_date: datetime = None, end_date: datetime = None, workers: int = None) -> dict:
+        """
+        Обороты за период по всем транзакциям репозитория
+        Разделы строятся один раз на поколение данных, период выбирается в разделе бинарным поиском
+        """
+        return turnover_parallel_engine.__run(self.__repository_partitions(), start_date, end_date, workers)
+
+    def group_transactions(self, transactions: list, workers: int = None) -> dict:
+        """
+        Обороты по произвольному списку транзакций (например, после дополнительного фильтра)
+        """
+        validator.validate(transactions, list)
+        return turnover_parallel_engine.__run(self.__filtered_partitions(transactions), None, None, workers)
+
+    def partition_count(self) -> int:
+        """
+        Количество разделов (складов) по транзакциям репозитория
+        """
+        return len(self.__repository_partitions()["payloads"])
+
+    def __repository_partitions(self) -> dict:
+        """
+        Разделы по транзакциям репозитория (перестраиваются при изменении транзакций или единиц измерения)
+        """
+        return self.__repo.cached(reposity.transaction_key(), "storage_partitions",
+                                  lambda _: self.__partitions(self.__repo.transaction_index().select(),
+                                                             "repository:{}:{}".format(
+                                                                 self.__repo.generation(reposity.transaction_key()),
+                                                                 self.__repo.generation(reposity.range_key()))),
+                                  depends=(reposity.range_key(),))
+
+    def __filtered_partitions(self, transactions: list) -> dict:
+        """
+        Разделы по произвольному списку транзакций
+        Токен - хэш содержимого разделов: результат процесса-исполнителя зависит только от колонок раздела,
+        поэтому повторный запрос с тем же набором использует разделы, уже загруженные в процессы-исполнители.
+        Коды транзакций для токена не подходят - они могут повторяться
+        """
+        ordered = sorted(transactions, key=lambda item: item.period)
+        partitions = self.__partitions(ordered, None)
+        digest = hashlib.sha1()
+        for payload in partitions["payloads"]:
+            digest.update(hashlib.sha1(payload).digest())
+        partitions["token"] = "filtered:" + digest.hexdigest()
+        return partitions
+
+    def __partitions(self, transactions: list, token: str) -> dict:
+        """
+        Разделы по складам для транзакций, отсортированных по периоду
+            - token - ключ набора в процессах-исполнителях
+            - payloads - сериализованные колонки разделов
+            - groups - (номенклатура, склад, базовая единица измерения) по коду группы
+        """
+        conversion = self.__repo.range_conversion()
+        keys = {}
+        groups = []
+        storages = {}
+        for position, transaction in enumerate(transactions):
+            nomenclature = transaction.nomenclature
+            storage = transaction.storage
+            if not nomenclature or not storage:
+                continue
+
+            unit, quantity = conversion.base_quantity(transaction)
+            key = (nomenclature.unique_code, storage.unique_code)
+            code = keys.get(key)
+            if code is None:
+                code = keys[key] = len(groups)
+                groups.append((nomenclature, storage, unit))
+            quantity = fixed_point.rescale(quantity, fixed_point.scale_of(unit), fixed_point.scale_of(groups[code][2]))
+
+            partition = storages.get(storage.unique_code)
+            if partition is None:
+                partition = storages[storage.unique_code] = ([], array("q"), array("q"), [])
+            partition[0].append(transaction.period)
+            partition[1].append(position)
+            partition[2].append(code)
+            partition[3].append(quantity)
+
+        return {
+            "token": token,
+            "payloads": [pickle.dumps(turnover_parallel_engine.__compact(partition), pickle.HIGHEST_PROTOCOL)
+                         for partition in storages.values()],
+            "groups": groups
+        }
+
+    @staticmethod
+    def __compact(partition: tuple) -> tuple:
+        """
+        Колонка количеств хранится как array("q"), если все значения помещаются в int64,
+        иначе - списком целых чисел Python: результат остается точным, как в turnover_numpy_engine
+        """
+        periods, positions, codes, quantities = partition
+        try:
+            quantities = array("q", quantities)
+        except OverflowError:
+            pass
+        return periods, positions, codes, quantities
+
+    @staticmethod
+    def __run(partitions: dict, start_date: datetime, end_date: datetime, workers: int = None) -> dict:
+        """
+        Посчитать разделы в пуле процессов и объединить результат
+        Порядок групп - по первой проводке, как при обычной группировке
+        """
+        pool = sharded_executor.pool(workers)
+        token = partitions["token"]
+        futures = [pool.submit(_turnover_partition, token, number, None, start_date, end_date)
+                   for number in range(len(partitions["payloads"]))]
+        results = [future.result() for future in futures]
+
+        # Разделы, которых еще нет у процессов-исполнителей, пересылаются один раз
+        retries = [(number, pool.submit(_turnover_partition, token, number, partitions["payloads"][number],
+                                        start_date, end_date))
+                   for number, result in enumerate(results) if result is None]
+        for number, future in retries:
+            results[number] = future.result()
+
+        totals = []
+        for result in results:
+            totals.extend(result)
+        totals.sort(key=lambda entry: entry[1])
+
+        grouped = {}
+        for code, _, income, outcome in totals:
+            nomenclature, storage, unit = partitions["groups"][code]
+            grouped[f"{nomenclature.unique_code}_{storage.unique_code}"] = {
+                'nomenclature': nomenclature,
+                'storage': storage,
+                'unit': unit,
+                'transactions': [],
+                'income': income,
+                'outcome': outcome
+            }
+
+        return grouped
@@ -0,0 +1,103 @@
+import heapq
+from decimal import Decimal
+from Src.Core.validator import validator, argument_exception
+from Src.Core.fixed_point import fixed_point
+
+"""
+Рейтинг позиций ОСВ по движению (например, топ-50 по расходу на каждом складе)
+Строки отчета просматриваются один раз. Для каждого склада хранится куча из не более чем top
+лучших позиций - полные группы не сортируются, сортируются только top строк результата
+"""
+
+
+class turnover_ranking:
+
+    # Количество позиций по умолчанию
+    __default_top: int = 10
+
+    def __init__(self, metric: str, top: int):
+        if metric not in turnover_ranking.metrics():
+            raise argument_exception(f"Некорректный показатель рейтинга: {metric}. Допустимо: {turnover_ranking.metrics()}")
+        if isinstance(top, bool) or not isinstance(top, int) or top <= 0:
+            raise argument_exception("Некорректно указано количество (top)!")
+
+        self.__metric = metric
+        self.__top = top
+
+    @staticmethod
+    def metrics() -> list:
+        """
+        Показатели рейтинга: outcome (расход), income (приход), turnover (приход + расход)
+        """
+        return ["outcome", "income", "turnover"]
+
+    @staticmethod
+    def create(data: dict) -> "turnover_ranking":
+        """
+        Рейтинг из запроса Api: metric (по умолчанию outcome), top (по умолчанию 10)
+        """
+        validator.validate(data, dict)
+        top = data.get("top")
+        return turnover_ranking(data.get("metric", "outcome"),
+                                turnover_ranking.__default_top if top is None else top)
+
+    @property
+    def metric(self) -> str:
+        return self.__metric
+
+    @property
+    def top(self) -> int:
+        return self.__top
+
+    def build(self, items) -> list:
+        """
+        Лучшие позиции по каждому складу
+            - items - строки ОСВ (turnover_item), список или генератор
+        Позиции без движения по показателю в рейтинг не попадают
+        Количества в разных единицах сравниваются по значению в базовой единице
+        """
+        heaps = {}
+        storages = {}
+        for number, item in enumerate(items):
+            scale, _, income, outcome = item.quantities()
+            units = {"outcome": outcome, "income": income, "turnover": income + outcome}[self.__metric]
+            if units == 0:
+                continue
+
+            # При равенстве значений выше в рейтинге позиция, встреченная раньше
+            entry = (Decimal(units).scaleb(-scale), -number, item)
+            heap = heaps.get(item.storage_code)
+            if heap is None:
+                heap = heaps[item.storage_code] = []
+                storages[item.storage_code] = item.storage_name
+
+            if len(heap) < self.__top:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        result = []
+        for code, heap in heaps.items():
+            ranked = sorted(heap, reverse=True)
+            result.append({
+                "storage_code": code,
+                "storage_name": storages[code],
+                "items": [turnover_ranking.__render(rank, entry[2]) for rank, entry in enumerate(ranked, 1)]
+            })
+
+        return result
+
+    @staticmethod
+    def __render(rank: int, item) -> dict:
+        """
+        Представление позиции рейтинга для ответа Api
+        """
+        scale, _, income, outcome = item.quantities()
+        return {
+            "rank": rank,
+            "nomenclature_code": item.nomenclature_code,
+            "nomenclature_name": item.nomenclature_name,
+            "unit_name": item.unit_name,
+            "income": fixed_point.to_decimal(income, scale),
+            "outcome": fixed_point.to_decimal(outcome, scale)
+        }
@@ -1,12 +1,29 @@
-from flask import request, jsonify
+import itertools
+from flask import request, jsonify, Response, stream_with_context
 from Src.Dtos.universal_filter_dto import universal_filter_dto
+from Src.Dtos.sorting_dto import sorting_dto
+from Src.Core.prototype import prototype
+from Src.Core.query_profile import query_profile
+from Src.Core.fixed_point import fixed_point
+from Src.Logics.balance_snapshot_service import balance_snapshot_service
+from Src.Logics.turnover_aggregate_service import turnover_aggregate_service
+from Src.Logics.turnover_numpy_engine import turnover_numpy_engine
+from Src.Logics.turnover_parallel_engine import turnover_parallel_engine
+from Src.Logics.turnover_rollup import turnover_rollup
+from Src.Logics.turnover_ranking import turnover_ranking
+from Src.Logics.turnover_series_service import turnover_series_service
+from Src.Logics.report_job_service import report_job_service
+from Src.Core.job_status import job_status
+from Src.Core.single_flight import single_flight
+from Src.Core.report_disk_cache import report_disk_cache
 from Src.Core.universal_prototype import universal_prototype
-from Src.Core.validator import validator, operation_exception
+from Src.Core.validator import validator, operation_exception, argument_exception
 from Src.Models.nomenclature_model import nomenclature_model
 from Src.Models.transaction_model import transaction_model
 from Src.Models.storage_model import storage_model
 from Src.Core.response_formats import response_formats
 from Src.Logics.factory_entities import factory_entities
+from Src.Core.abstract_response import abstract_response
 from Src.reposity import reposity
 from datetime import datetime
 from decimal import Decimal
@@ -17,16 +34,114 @@ from decimal import Decimal
 
 
 class turnover_item:
-    def __init__(self):
-        self.nomenclature_name = ""
-        self.nomenclature_code = ""
-        self.storage_name = ""
-        self.storage_code = ""
-        self.unit_name = ""
-        self.start_balance = Decimal('0.0')
-        self.income = Decimal('0.0')
-        self.outcome = Decimal('0.0')
-        self.end_balance = Decimal('0.0')
+    __nomenclature_name: str = ""
+    __nomenclature_code: str = ""
+    __storage_name: str = ""
+    __storage_code: str = ""
+    __unit_name: str = ""
+    # Количества - целые единицы 10^-scale, в Decimal переводятся только при выводе
+    __scale: int = fixed_point.default_scale()
+    __start_units: int = 0
+    __income_units: int = 0
+    __outcome_units: int = 0
+
+    # Наименование номенклатуры
+    @property
+    def nomenclature_name(self) -> str:
+        return self.__nomenclature_name
+
+    @nomenclature_name.setter
+    def nomenclature_name(self, value: str):
+        self.__nomenclature_name = value
+
+    # Код номенклатуры
+    @property
+    def nomenclature_code(self) -> str:
+        return self.__nomenclature_code
+
+    @nomenclature_code.setter
+    def nomenclature_code(self, value: str):
+        self.__nomenclature_code = value
+
+    # Наименование склада
+    @property
+    def storage_name(self) -> str:
+        return self.__storage_name
+
+    @storage_name.setter
+    def storage_name(self, value: str):
+        self.__storage_name = value
+
+    # Код склада
+    @property
+    def storage_code(self) -> str:
+        return self.__storage_code
+
+    @storage_code.setter
+    def storage_code(self, value: str):
+        self.__storage_code = value
+
+    # Единица измерения
+    @property
+    def unit_name(self) -> str:
+        return self.__unit_name
+
+    @unit_name.setter
+    def unit_name(self, value: str):
+        self.__unit_name = value
+
+    # Сальдо на начало
+    @property
+    def start_balance(self) -> Decimal:
+        return fixed_point.to_decimal(self.__start_units, self.__scale)
+
+    @start_balance.setter
+    def start_balance(self, value: Decimal):
+        self.__start_units = fixed_point.from_value(value, self.__scale)
+
+    # Приход
+    @property
+    def income(self) -> Decimal:
+        return fixed_point.to_decimal(self.__income_units, self.__scale)
+
+    @income.setter
+    def income(self, value: Decimal):
+        self.__income_units = fixed_point.from_value(value, self.__scale)
+
+    # Расход
+    @property
+    def outcome(self) -> Decimal:
+        return fixed_point.to_decimal(self.__outcome_units, self.__scale)
+
+    @outcome.setter
+    def outcome(self, value: Decimal):
+        self.__outcome_units = fixed_point.from_value(value, self.__scale)
+
+    # Сальдо на конец. Вычисляется по сальдо на начало и оборотам
+    @property
+    def end_balance(self) -> Decimal:
+        return fixed_point.to_decimal(self.__start_units + self.__income_units - self.__outcome_units, self.__scale)
+
+    # Установка сальдо на конец пересчитывает сальдо на начало (обороты не меняются)
+    @end_balance.setter
+    def end_balance(self, value: Decimal):
+        end_units = fixed_point.from_value(value, self.__scale)
+        self.__start_units = end_units - self.__income_units + self.__outcome_units
+
+    """
+    Установить количества в целых единицах 10^-scale
+    """
+    def set_quantities(self, scale: int, start_units: int, income_units: int, outcome_units: int):
+        self.__scale = scale
+        self.__start_units = start_units
+        self.__income_units = income_units
+        self.__outcome_units = outcome_units
+
+    """
+    Количества в целых единицах: (scale, сальдо на начало, приход, расход)
+    """
+    def quantities(self) -> tuple:
+        return self.__scale, self.__start_units, self.__income_units, self.__outcome_units
 
 
 """
@@ -36,8 +151,48 @@ class turnover_item:
 
 class turnover_report_service:
 
+    # Тип содержимого потокового ответа по формату
+    __mimetypes = {
+        response_formats.csv(): "text/csv",
+        response_formats.markdown(): "text/markdown"
+    }
+
     def __init__(self):
         self.__repo = reposity()
+        self.__snapshots = balance_snapshot_service()
+        self.__aggregates = turnover_aggregate_service()
+        self.__engines = {"numpy": turnover_numpy_engine(), "parallel": turnover_parallel_engine()}
+        self.__series = turnover_series_service(self.__aggregates, self.__snapshots)
+        self.__jobs = report_job_service()
+        self.__flights = single_flight()
+        self.__report_cache = None
+
+    @property
+    def report_cache(self) -> report_disk_cache:
+        """
+        Дисковый кэш готовых ответов (заполняется планировщиком предварительного расчета)
+        """
+        return self.__report_cache
+
+    @report_cache.setter
+    def report_cache(self, value: report_disk_cache):
+        validator.validate(value, report_disk_cache)
+        self.__report_cache = value
+
+    @property
+    def flights(self) -> single_flight:
+        """
+        Объединение одинаковых одновременных запросов ОСВ
+        """
+        return self.__flights
+
+    @staticmethod
+    def engines() -> list:
+        """
+        Доступные способы расчета оборотов: python (по умолчанию), numpy (векторизованный),
+        parallel (по складам в пуле процессов)
+        """
+        return ["python", "numpy", "parallel"]
 
     def setup_routes(self, app):
         """Настройка маршрутов API для ОСВ"""
@@ -52,6 +207,13 @@ class turnover_report_service:
                 format: Формат ответа (csv, markdown) - опционально
                 start_date: Дата начала периода (опционально)
                 end_date: Дата окончания периода (опционально)
+                sort_by: Поле строки ОСВ для сортировки, например outcome (опционально)
+                descending: Сортировка по убыванию (опционально)
+                top: Вернуть только первые N строк (опционально)
+                explain: Вернуть план выполнения и время по стадиям (опционально)
+                engine: Способ расчета оборотов: python, numpy, parallel (опционально)
+                rollup: Итоги по уровням за один проход: true (группа, склад) или список уровней
+                        из group, storage, nomenclature (опционально)
             """
             try:
                 # Получаем данные из запроса
@@ -59,80 +221,424 @@ class turnover_report_service:
                 if not data:
                     return jsonify({"error": "No JSON data provided"}), 400
 
-                format = data.get('format', response_formats.csv())
-                start_date_str = data.get('start_date')
-                end_date_str = data.get('end_date')
-
-                # Парсим даты если указаны
-                start_date = None
-                end_date = None
-
-                if start_date_str:
-                    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-                if end_date_str:
-                    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-
-                # Создаем DTO фильтрации если передан
-                filter_dto = None
-                if any(key in data for key in ['field_name', 'nested_field', 'value', 'filter_type']):
-                    filter_dto = universal_filter_dto()
-                    filter_dto.create(data)
-                    if not filter_dto.model_type:
-                        filter_dto.model_type = "nomenclature"  # по умолчанию для ОСВ
-
-                # Генерируем отчет
-                report_data = self._generate_turnover_report(filter_dto, start_date, end_date)
-
-                # Формируем ответ в нужном формате
-                response_data = self._build_response(report_data, format)
-
-                return jsonify({
-                    "success": True,
-                    "report_type": "turnover",
-                    "items_count": len(report_data),
-                    "period": {
-                        "start_date": start_date_str,
-                        "end_date": end_date_str
-                    },
-                    "data": response_data
-                })
+                # Готовый ответ из кэша предварительного расчета, если данные не менялись
+                generation = self.__repo.generation()
+                if self.__report_cache is not None:
+                    body = self.__report_cache.get(report_disk_cache.key(["turnover", data]), generation)
+                    if body is not None:
+                        return Response(body, mimetype="application/json", headers={"X-Report-Cache": "hit"})
+
+                # Одинаковые одновременные запросы (при тех же данных) считаются один раз
+                key = single_flight.key(["turnover", data], generation)
 
+            except (operation_exception, argument_exception) as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+            body, status = self.__flights.do(key, lambda: self._turnover_body(data))[0]
+            return Response(body, status=status, mimetype="application/json")
+
+        @app.route("/api/report/turnover/stream", methods=['POST'])
+        def stream_turnover_report():
+            """
+            POST запрос для потоковой выдачи ОСВ: шапка отправляется сразу, строки - по мере построения
+            Ответ - текст в запрошенном формате без JSON-обертки
+
+            Body: как у /api/report/turnover, кроме explain и rollup
+            """
+            try:
+                data = request.get_json()
+                if not data:
+                    return jsonify({"error": "No JSON data provided"}), 400
+
+                chunks, mimetype = self._stream_turnover(data)
+                return Response(stream_with_context(chunks), mimetype=mimetype)
+
+            except (operation_exception, argument_exception, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+        @app.route("/api/report/turnover/jobs", methods=['POST'])
+        def submit_turnover_job():
+            """
+            POST запрос для формирования ОСВ в фоне. Параметры - как у /api/report/turnover
+            Возвращает код задания (202)
+            """
+            try:
+                data = request.get_json()
+                if not data:
+                    return jsonify({"error": "No JSON data provided"}), 400
+
+                # Некорректные параметры отклоняются сразу, а не заданием с ошибкой
+                self._validate_turnover_parameters(data)
+                job = self.__jobs.submit("turnover", lambda listener: self._turnover_result(data, listener))
+                return jsonify(self.__jobs.to_dict(job)), 202
+
+            except (argument_exception, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
             except operation_exception as e:
+                return jsonify({"error": str(e)}), 429
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+        @app.route("/api/report/turnover/jobs/<job_id>", methods=['GET'])
+        def get_turnover_job(job_id: str):
+            """
+            Состояние задания: queued, running (со стадией расчета), done, failed
+            """
+            job = self.__jobs.get(job_id)
+            if job is None:
+                return jsonify({"error": "Задание не найдено или срок хранения результата истек"}), 404
+
+            return jsonify(self.__jobs.to_dict(job))
+
+        @app.route("/api/report/turnover/jobs/<job_id>/result", methods=['GET'])
+        def get_turnover_job_result(job_id: str):
+            """
+            Результат выполненного задания. Пока задание выполняется - 202 с состоянием
+            """
+            job = self.__jobs.get(job_id)
+            if job is None:
+                return jsonify({"error": "Задание не найдено или срок хранения результата истек"}), 404
+            if job.status == job_status.FAILED:
+                return jsonify(self.__jobs.to_dict(job)), 400
+            if job.status != job_status.DONE:
+                return jsonify(self.__jobs.to_dict(job)), 202
+
+            return jsonify(job.result)
+
+        @app.route("/api/report/turnover/ranking", methods=['POST'])
+        def generate_turnover_ranking():
+            """
+            POST запрос для рейтинга позиций по движению на каждом складе
+            (например, топ-50 по расходу за неделю по каждому ресторану)
+
+            Body:
+                metric: Показатель: outcome, income, turnover (по умолчанию outcome)
+                top: Количество позиций на склад (по умолчанию 10)
+                start_date: Дата начала периода (опционально)
+                end_date: Дата окончания периода (опционально)
+                filter_dto: DTO модель фильтрации транзакций (опционально)
+                engine: Способ расчета оборотов: python, numpy, parallel (опционально)
+            """
+            try:
+                data = request.get_json()
+                if not data:
+                    return jsonify({"error": "No JSON data provided"}), 400
+
+                return jsonify(self._turnover_ranking(data))
+
+            except (operation_exception, argument_exception, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+        @app.route("/api/report/turnover/series", methods=['POST'])
+        def generate_turnover_series():
+            """
+            POST запрос для получения рядов оборотов по интервалам
+
+            Body:
+                bucket: Интервал: day, week, month (по умолчанию month)
+                start_date: Дата начала периода (опционально)
+                end_date: Дата окончания периода (опционально)
+                window_start: Начало поддиапазона для итогов (опционально)
+                window_end: Окончание поддиапазона для итогов (опционально)
+            """
+            try:
+                data = request.get_json()
+                if not data:
+                    return jsonify({"error": "No JSON data provided"}), 400
+
+                dates = {}
+                for name in ['start_date', 'end_date', 'window_start', 'window_end']:
+                    dates[name] = datetime.strptime(data[name], "%Y-%m-%d") if data.get(name) else None
+
+                bucket = data.get('bucket', "month")
+                series, groups = self.__series.build(bucket, dates['start_date'], dates['end_date'])
+                result = self.__series.to_dict(series, groups, bucket, dates['window_start'], dates['window_end'])
+                result["success"] = True
+                result["report_type"] = "turnover_series"
+                return jsonify(result)
+
+            except (operation_exception, argument_exception, ValueError) as e:
                 return jsonify({"error": str(e)}), 400
             except Exception as e:
                 return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
 
+    def _turnover_ranking(self, data: dict) -> dict:
+        """
+        Рейтинг позиций по движению на каждом складе (см. /api/report/turnover/ranking)
+        Строки ОСВ строятся по одной и сразу попадают в рейтинг
+        """
+        ranking = turnover_ranking.create(data)
+        filter_dto, start_date, end_date = self._turnover_parameters(data)
+        items = self._generate_turnover_report(filter_dto, start_date, end_date,
+                                               engine=data.get('engine', "python"), lazy=True)
+        storages = ranking.build(items)
+
+        return {
+            "success": True,
+            "report_type": "turnover_ranking",
+            "metric": ranking.metric,
+            "top": ranking.top,
+            "period": {
+                "start_date": data.get('start_date'),
+                "end_date": data.get('end_date')
+            },
+            "storages": storages
+        }
+
+    def _turnover_body(self, data: dict) -> tuple:
+        """
+        Тело ответа /api/report/turnover (JSON, байты) и код ответа
+        """
+        try:
+            return jsonify(self._turnover_result(data)).get_data(), 200
+        except (operation_exception, argument_exception) as e:
+            return jsonify({"error": str(e)}).get_data(), 400
+        except Exception as e:
+            return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}).get_data(), 500
+
+    def _turnover_result(self, data: dict, listener=None) -> dict:
+        """
+        Формирует ответ ОСВ по параметрам запроса (см. /api/report/turnover)
+        listener(stage) - уведомление о начале стадии расчета, необязательно
+        """
+        format = data.get('format', response_formats.csv())
+        explain = query_profile.is_requested(data)
+        profile = query_profile(listener) if explain or listener is not None else None
+        start_date_str = data.get('start_date')
+        end_date_str = data.get('end_date')
+        filter_dto, start_date, end_date = self._turnover_parameters(data)
+
+        # Генерируем отчет
+        engine = data.get('engine', "python")
+        rollup = turnover_rollup.create(data)
+        report_data = self._generate_turnover_report(filter_dto, start_date, end_date, profile, engine)
+
+        # Итоги считаются по всем строкам, до ограничения top
+        rollup_data = None
+        if rollup is not None:
+            with query_profile.optional_stage(profile, "rollup"):
+                rollup_data = rollup.build(report_data, self._nomenclatures_by_code())
+        with query_profile.optional_stage(profile, "sorting"):
+            report_data = prototype(report_data).order(sorting_dto().create(data)).data
+
+        # Формируем ответ в нужном формате
+        with query_profile.optional_stage(profile, "rendering"):
+            response_data = self._build_response(report_data, format)
+
+        result = {
+            "success": True,
+            "report_type": "turnover",
+            "items_count": len(report_data),
+            "period": {
+                "start_date": start_date_str,
+                "end_date": end_date_str
+            },
+            "data": response_data
+        }
+        if rollup_data is not None:
+            result["rollup"] = rollup_data
+        if explain:
+            result["explain"] = profile.to_dict()
+
+        return result
+
+    def _stream_turnover(self, data: dict) -> tuple:
+        """
+        Потоковый ответ ОСВ (см. /api/report/turnover/stream)
+        Параметры проверяются и обороты группируются сразу, строки отчета строятся
+        и выдаются по мере чтения ответа. Возвращает (генератор частей ответа, тип содержимого)
+        """
+        format = data.get('format', response_formats.csv())
+        response_builder = factory_entities().create(format)()
+        filter_dto, start_date, end_date = self._turnover_parameters(data)
+        sorting = sorting_dto().create(data)
+        engine = data.get('engine', "python")
+
+        report_data = self._generate_turnover_report(filter_dto, start_date, end_date, engine=engine, lazy=True)
+        if not sorting.is_empty():
+            # Сортировка требует всех строк
+            report_data = prototype(list(report_data)).order(sorting).data
+
+        return self._stream_response(report_data, response_builder), turnover_report_service.__mimetypes[format]
+
+    def _stream_response(self, items, response_builder: abstract_response):
+        """
+        Части ответа: шапка, затем строки по мере построения
+        """
+        items = iter(items)
+        first = next(items, None)
+        if first is None:
+            yield "Нет данных, соответствующих критериям фильтрации"
+            return
+
+        yield from response_builder.iter_build(itertools.chain([first], items))
+
+    def _turnover_parameters(self, data: dict) -> tuple:
+        """
+        Фильтр и период ОСВ из параметров запроса: (filter_dto, start_date, end_date)
+        """
+        start_date_str = data.get('start_date')
+        end_date_str = data.get('end_date')
+
+        # Парсим даты если указаны
+        start_date = None
+        end_date = None
+
+        if start_date_str:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
+        if end_date_str:
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+
+        # Создаем DTO фильтрации если передан
+        filter_dto = None
+        if any(key in data for key in ['field_name', 'nested_field', 'value', 'filter_type']):
+            filter_dto = universal_filter_dto()
+            filter_dto.create(data)
+            if not filter_dto.model_type:
+                filter_dto.model_type = "transaction"  # ОСВ фильтрует транзакции
+
+        return filter_dto, start_date, end_date
+
+    def _validate_turnover_parameters(self, data: dict):
+        """
+        Проверка параметров ОСВ до расчета: период, фильтр, способ расчета, итоги, сортировка
+        """
+        filter_dto, _, _ = self._turnover_parameters(data)
+        if filter_dto is not None:
+            universal_prototype.validate(filter_dto)
+        engine = data.get('engine', "python")
+        if engine not in turnover_report_service.engines():
+            raise argument_exception(f"Некорректный способ расчета: {engine}!")
+        turnover_rollup.create(data)
+        sorting_dto().create(data)
+
     def _generate_turnover_report(self, filter_dto: universal_filter_dto = None,
-                                  start_date: datetime = None, end_date: datetime = None) -> list:
+                                  start_date: datetime = None, end_date: datetime = None,
+                                  profile: query_profile = None, engine: str = "python", lazy: bool = False):
         """
         Генерирует оборотно-сальдовую ведомость с учетом фильтрации
+        profile - профиль запроса (explain), необязательно
+        engine - способ расчета оборотов (см. engines)
+        lazy - вернуть генератор строк (строки строятся по мере чтения), иначе список
         """
+        if engine not in turnover_report_service.engines():
+            raise operation_exception(f"Некорректный способ расчета: {engine}!")
+
         try:
-            # Получаем все транзакции
-            all_transactions = self.__repo.data.get(reposity.transaction_key(), [])
+            if engine != "python":
+                return self._generate_engine_report(engine, filter_dto, start_date, end_date, profile, lazy)
+
+            # Без дополнительного фильтра отчет собирается из материализованных дневных оборотов
+            if not filter_dto and self.__aggregates.covers(start_date, end_date):
+                with query_profile.optional_stage(profile, "filtering"):
+                    grouped_data, days = self.__aggregates.totals(start_date, end_date)
+                    if profile is not None:
+                        profile.add_step("period", "daily_aggregates", days, len(grouped_data),
+                                         total_rows=len(self.__repo.data.get(reposity.transaction_key(), [])))
+
+                return self._build_from_groups(grouped_data, None, start_date, profile, lazy)
+
+            with query_profile.optional_stage(profile, "filtering"):
+                # Транзакции за период (все, если период не указан)
+                filtered_transactions = self._transactions_by_date(start_date, end_date)
+                if profile is not None:
+                    access_path = "period_index" if start_date or end_date else "full_scan"
+                    profile.add_step("period", access_path, len(filtered_transactions), len(filtered_transactions),
+                                     total_rows=len(self.__repo.data.get(reposity.transaction_key(), [])))
+
+                # Применяем дополнительную фильтрацию если указана
+                if filter_dto:
+                    filtered_prototype = universal_prototype(filtered_transactions)
+                    filtered_transactions = filtered_prototype.apply_filter(filter_dto, profile).data
+
+            with query_profile.optional_stage(profile, "grouping"):
+                # Группируем транзакции по номенклатуре и складу
+                grouped_data = self._group_transactions(filtered_transactions)
+
+            return self._build_from_groups(grouped_data, filter_dto, start_date, profile, lazy)
 
-            # Фильтруем транзакции по дате если указаны периоды
-            filtered_transactions = self._filter_transactions_by_date(all_transactions, start_date, end_date)
+        except Exception as e:
+            raise operation_exception(f"Ошибка генерации ОСВ: {str(e)}")
 
-            # Применяем дополнительную фильтрацию если указана
+    def _generate_engine_report(self, engine: str, filter_dto: universal_filter_dto, start_date: datetime,
+                                end_date: datetime, profile: query_profile = None, lazy: bool = False):
+        """
+        Генерирует ОСВ расчетом по колонкам: векторизованным (numpy) или по складам в пуле процессов (parallel)
+        """
+        calculator = self.__engines[engine]
+        with query_profile.optional_stage(profile, "filtering"):
+            if filter_dto:
+                transactions = self._transactions_by_date(start_date, end_date)
+                transactions = universal_prototype(transactions).apply_filter(filter_dto, profile).data
+                rows_examined = len(transactions)
+            else:
+                lo, hi = self.__repo.transaction_index().bounds(start_date, end_date)
+                rows_examined = hi - lo
+
+        with query_profile.optional_stage(profile, "grouping"):
             if filter_dto:
-                prototype = universal_prototype(filtered_transactions)
-                filtered_transactions = prototype.apply_filter(filter_dto).data
+                grouped_data = calculator.group_transactions(transactions)
+            else:
+                grouped_data = calculator.group_period(start_date, end_date)
 
-            # Группируем транзакции по номенклатуре и складу
-            grouped_data = self._group_transactions(filtered_transactions)
+            if profile is not None:
+                profile.add_step("turnover", engine, rows_examined, len(grouped_data))
+
+        return self._build_from_groups(grouped_data, filter_dto, start_date, profile, lazy)
+
+    def _build_from_groups(self, grouped_data: dict, filter_dto: universal_filter_dto,
+                           start_date: datetime, profile: query_profile = None, lazy: bool = False):
+        """
+        Формирует строки отчета по сгруппированным оборотам с учетом сальдо на начало
+        lazy - вернуть генератор строк вместо списка
+        """
+        with query_profile.optional_stage(profile, "opening"):
+            # Сальдо на начало: ближайший снимок + движение от снимка до начала периода
+            opening_balances = self.__snapshots.opening_balances(start_date) if start_date else {}
+
+        with query_profile.optional_stage(profile, "grouping"):
+            # Позиции без движения в периоде, но с остатком (только без дополнительного фильтра)
+            if not filter_dto:
+                self._append_balance_groups(grouped_data, opening_balances)
+
+            if lazy:
+                return self._iter_report_items(grouped_data, opening_balances)
 
             # Формируем строки отчета
-            report_items = self._build_report_items(grouped_data)
+            report_items = self._build_report_items(grouped_data, opening_balances)
 
-            return report_items
+        if profile is not None:
+            profile.detail("groups", len(grouped_data))
+            profile.detail("partitions_touched", len({item.storage_code for item in report_items}))
 
-        except Exception as e:
-            raise operation_exception(f"Ошибка генерации ОСВ: {str(e)}")
+        return report_items
+
+    def _nomenclatures_by_code(self) -> dict:
+        """
+        Номенклатура по уникальному коду (перестраивается при изменении номенклатуры)
+        """
+        return self.__repo.cached(reposity.nomenclature_key(), "by_code",
+                                  lambda data: {item.unique_code: item for item in data})
+
+    def _transactions_by_date(self, start_date: datetime, end_date: datetime) -> list:
+        """
+        Транзакции репозитория за период. Выбираются по индексу по периоду (бинарный поиск)
+        """
+        if not start_date and not end_date:
+            return self.__repo.data.get(reposity.transaction_key(), [])
+
+        return self.__repo.transaction_index().select(start_date, end_date)
 
     def _filter_transactions_by_date(self, transactions: list, start_date: datetime, end_date: datetime) -> list:
         """
-        Фильтрует транзакции по периоду
+        Фильтрует произвольный список транзакций по периоду (перебором)
+        Для транзакций репозитория - _transactions_by_date
         """
         if not start_date and not end_date:
             return transactions
@@ -156,8 +662,10 @@ class turnover_report_service:
     def _group_transactions(self, transactions: list) -> dict:
         """
         Группирует транзакции по номенклатуре и складу
+        Единица измерения группы - базовая единица (см. reposity.range_conversion)
         """
         grouped = {}
+        conversion = self.__repo.range_conversion()
 
         for transaction in transactions:
             if not transaction.nomenclature or not transaction.storage:
@@ -169,7 +677,7 @@ class turnover_report_service:
                 grouped[key] = {
                     'nomenclature': transaction.nomenclature,
                     'storage': transaction.storage,
-                    'unit': transaction.range,
+                    'unit': conversion.resolve(transaction.range)[0],
                     'transactions': []
                 }
 
@@ -177,11 +685,35 @@ class turnover_report_service:
 
         return grouped
 
-    def _build_report_items(self, grouped_data: dict) -> list:
+    def _append_balance_groups(self, grouped_data: dict, opening_balances: dict):
+        """
+        Добавляет группы без транзакций для позиций с ненулевым сальдо на начало
+        """
+        for (nomenclature_code, storage_code), entry in opening_balances.items():
+            key = f"{nomenclature_code}_{storage_code}"
+            if key in grouped_data or entry[3] == 0:
+                continue
+
+            grouped_data[key] = {
+                'nomenclature': entry[0],
+                'storage': entry[1],
+                'unit': entry[2],
+                'transactions': []
+            }
+
+    def _build_report_items(self, grouped_data: dict, opening_balances: dict = None) -> list:
         """
         Строит строки отчета из сгруппированных данных
+        opening_balances - сальдо на начало по ключу (код номенклатуры, код склада)
+        """
+        return list(self._iter_report_items(grouped_data, opening_balances))
+
+    def _iter_report_items(self, grouped_data: dict, opening_balances: dict = None):
+        """
+        Строки отчета по одной на группу (генератор, см. _build_report_items)
         """
-        report_items = []
+        opening_balances = opening_balances or {}
+        conversion = self.__repo.range_conversion()
 
         for key, group_data in grouped_data.items():
             item = turnover_item()
@@ -193,22 +725,28 @@ class turnover_report_service:
             item.storage_code = group_data['storage'].unique_code
             item.unit_name = group_data['unit'].name if group_data['unit'] else ""
 
-            # Рассчитываем обороты
+            # Рассчитываем обороты в целых единицах точности базовой единицы измерения
+            # (группа может содержать уже посчитанные агрегаты)
+            scale = fixed_point.scale_of(group_data['unit'])
+            income = group_data.get('income', 0)
+            outcome = group_data.get('outcome', 0)
             for transaction in group_data['transactions']:
-                if transaction.value > 0:
-                    item.income += Decimal(str(transaction.value))
+                _, quantity = conversion.base_quantity(transaction)
+                if quantity > 0:
+                    income += quantity
                 else:
-                    item.outcome += Decimal(str(abs(transaction.value)))
+                    outcome -= quantity
 
-            # Сальдо на начало (в реальной системе нужно получать из БД)
-            item.start_balance = Decimal('0.0')
+            # Сальдо на начало
+            opening = opening_balances.get((item.nomenclature_code, item.storage_code))
+            start = 0
+            if opening is not None:
+                start = fixed_point.rescale(opening[3], fixed_point.scale_of(opening[2]), scale)
 
-            # Сальдо на конец
-            item.end_balance = item.start_balance + item.income - item.outcome
+            # Сальдо на конец считается при выводе
+            item.set_quantities(scale, start, income, outcome)
 
-            report_items.append(item)
-
-        return report_items
+            yield item
 
     def _build_response(self, data: list, format: str) -> str:
         try:
@@ -230,12 +768,12 @@ class turnover_report_service:
         Создает прототип из транзакций с учетом фильтрации
         """
         transactions = self.__repo.data.get(reposity.transaction_key(), [])
+        prototype = universal_prototype(transactions, self.__repo.transaction_index())
 
         if filter_dto:
-            prototype = universal_prototype(transactions)
             return prototype.apply_filter(filter_dto)
         else:
-            return universal_prototype(transactions)
+            return prototype
 
     def generate_turnover_from_prototype(self, prototype: universal_prototype) -> list:
         """
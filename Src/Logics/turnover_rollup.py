@@ -0,0 +1,137 @@
+from Src.Core.validator import validator, argument_exception
+from Src.Core.fixed_point import fixed_point
+
+"""
+Многоуровневые итоги ОСВ (ROLLUP): общий итог -> уровни в заданном порядке
+Все уровни считаются за один проход по строкам отчета. Итоги каждого узла
+разделены по единицам измерения - количества в разных единицах не складываются
+"""
+
+
+class turnover_rollup:
+
+    # Уровни по умолчанию (rollup: true)
+    __default_levels: list = ["group", "storage"]
+
+    def __init__(self, levels: list):
+        validator.validate(levels, list)
+        for level in levels:
+            if level not in turnover_rollup.dimensions():
+                raise argument_exception(f"Некорректный уровень итогов: {level}. Допустимо: {turnover_rollup.dimensions()}")
+        if len(set(levels)) != len(levels):
+            raise argument_exception("Уровни итогов повторяются!")
+
+        self.__levels = list(levels)
+
+    @staticmethod
+    def dimensions() -> list:
+        """
+        Допустимые уровни итогов
+        """
+        return ["group", "storage", "nomenclature"]
+
+    @staticmethod
+    def create(data: dict):
+        """
+        Итоги из запроса Api: rollup = true (группа, склад) или список уровней
+        Без rollup - None
+        """
+        value = data.get("rollup") if isinstance(data, dict) else None
+        if value is None or value is False:
+            return None
+        if value is True:
+            return turnover_rollup(list(turnover_rollup.__default_levels))
+        if isinstance(value, str):
+            value = [value]
+
+        return turnover_rollup(value)
+
+    @property
+    def levels(self) -> list:
+        return self.__levels
+
+    def build(self, items: list, nomenclatures: dict) -> dict:
+        """
+        Построить дерево итогов
+            - items - строки ОСВ (turnover_item)
+            - nomenclatures - номенклатура по коду (для уровня group)
+        """
+        validator.validate(items, list)
+        validator.validate(nomenclatures, dict)
+        root = turnover_rollup.__node("total", "", "")
+        for item in items:
+            scale, start, income, outcome = item.quantities()
+            values = (scale, start, income, outcome)
+
+            node = root
+            turnover_rollup.__accumulate(node, item.unit_name, values)
+            for level in self.__levels:
+                code, name = turnover_rollup.__dimension(level, item, nomenclatures)
+                child = node["children"].get(code)
+                if child is None:
+                    child = node["children"][code] = turnover_rollup.__node(level, code, name)
+                node = child
+                turnover_rollup.__accumulate(node, item.unit_name, values)
+
+        return turnover_rollup.__render(root)
+
+    @staticmethod
+    def __node(level: str, code: str, name: str) -> dict:
+        return {"level": level, "code": code, "name": name, "totals": {}, "children": {}}
+
+    @staticmethod
+    def __dimension(level: str, item, nomenclatures: dict) -> tuple:
+        """
+        Код и наименование значения уровня для строки ОСВ
+        """
+        if level == "storage":
+            return item.storage_code, item.storage_name
+        if level == "nomenclature":
+            return item.nomenclature_code, item.nomenclature_name
+
+        nomenclature = nomenclatures.get(item.nomenclature_code)
+        group = nomenclature.group if nomenclature is not None else None
+        if group is None:
+            return "", ""
+        return group.unique_code, group.name
+
+    @staticmethod
+    def __accumulate(node: dict, unit_name: str, values: tuple):
+        """
+        Добавить количества строки к итогу узла (в целых единицах)
+        Итог хранится с наибольшей точностью из встреченных строк - пересчет без округления
+        """
+        scale, start, income, outcome = values
+        total = node["totals"].get(unit_name)
+        if total is None:
+            node["totals"][unit_name] = [scale, start, income, outcome]
+            return
+
+        if scale > total[0]:
+            total[1:] = [fixed_point.rescale(value, total[0], scale) for value in total[1:]]
+            total[0] = scale
+
+        total[1] += fixed_point.rescale(start, scale, total[0])
+        total[2] += fixed_point.rescale(income, scale, total[0])
+        total[3] += fixed_point.rescale(outcome, scale, total[0])
+
+    @staticmethod
+    def __render(node: dict) -> dict:
+        """
+        Представление узла для ответа Api. Количества переводятся в десятичные значения
+        """
+        totals = []
+        for unit_name, (scale, start, income, outcome) in node["totals"].items():
+            totals.append({
+                "unit_name": unit_name,
+                "start_balance": fixed_point.to_decimal(start, scale),
+                "income": fixed_point.to_decimal(income, scale),
+                "outcome": fixed_point.to_decimal(outcome, scale),
+                "end_balance": fixed_point.to_decimal(start + income - outcome, scale)
+            })
+
+        result = {"level": node["level"], "code": node["code"], "name": node["name"], "totals": totals}
+        if len(node["children"]) > 0:
+            result["children"] = [turnover_rollup.__render(child) for child in node["children"].values()]
+
+        return result
@@ -0,0 +1,240 @@
+from Src.reposity import reposity
+from Src.Core.validator import validator, argument_exception
+from Src.Core.fixed_point import fixed_point
+from Src.Core.prefix_series import prefix_series
+from Src.Logics.turnover_aggregate_service import turnover_aggregate_service
+from Src.Logics.balance_snapshot_service import balance_snapshot_service
+from datetime import datetime, timedelta
+
+"""
+Сервис рядов оборотов по интервалам (день / неделя / месяц) для номенклатуры и склада
+Ряды строятся из дневных агрегатов и хранят накопленные суммы (prefix_series):
+движение и остаток за любой поддиапазон считаются без повторного расчета
+"""
+
+
+class turnover_series_service:
+
+    # Количество хранимых построенных рядов
+    __cache_size: int = 16
+
+    # Наибольшее количество интервалов в ряду (около 10 лет по дням)
+    __max_buckets: int = 3660
+
+    def __init__(self, aggregates: turnover_aggregate_service, snapshots: balance_snapshot_service):
+        validator.validate(aggregates, turnover_aggregate_service)
+        validator.validate(snapshots, balance_snapshot_service)
+        self.__repo = reposity()
+        self.__aggregates = aggregates
+        self.__snapshots = snapshots
+        self.__cache = {}
+
+    @staticmethod
+    def buckets() -> list:
+        """
+        Допустимые интервалы
+        """
+        return ["day", "week", "month"]
+
+    @staticmethod
+    def max_buckets() -> int:
+        """
+        Наибольшее количество интервалов в ряду
+        """
+        return turnover_series_service.__max_buckets
+
+    @staticmethod
+    def bucket_start(value: datetime, bucket: str) -> datetime:
+        """
+        Начало интервала, в который попадает дата
+        """
+        day = datetime(value.year, value.month, value.day)
+        if bucket == "week":
+            return day - timedelta(days=day.weekday())
+        if bucket == "month":
+            return datetime(value.year, value.month, 1)
+        return day
+
+    def build(self, bucket: str, start_date: datetime = None, end_date: datetime = None) -> tuple:
+        """
+        Построить ряды за период. Границы расширяются до целых интервалов
+        Результат: (prefix_series, группы: ключ -> (номенклатура, склад, базовая единица измерения))
+        Построенные ряды хранятся до изменения транзакций или единиц измерения
+        """
+        if bucket not in turnover_series_service.buckets():
+            raise argument_exception(f"Некорректный интервал: {bucket}. Допустимо: {turnover_series_service.buckets()}")
+
+        generation = (self.__repo.generation(reposity.transaction_key()), self.__repo.generation(reposity.range_key()))
+        cache_key = (bucket, start_date, end_date)
+        entry = self.__cache.get(cache_key)
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+
+        result = self.__build(bucket, start_date, end_date)
+        self.__cache.pop(cache_key, None)
+        if len(self.__cache) >= turnover_series_service.__cache_size:
+            del self.__cache[next(iter(self.__cache))]
+        self.__cache[cache_key] = (generation, result)
+        return result
+
+    def to_dict(self, series: prefix_series, groups: dict, bucket: str,
+                window_start: datetime = None, window_end: datetime = None) -> dict:
+        """
+        Представление рядов для ответа Api
+        window_start / window_end - поддиапазон, итоги которого считаются по накопленным суммам
+        """
+        labels = series.labels
+        window = None
+        if len(labels) > 0 and (window_start is not None or window_end is not None):
+            lo = series.position(window_start) if window_start is not None else 0
+            hi = series.position(window_end) + 1 if window_end is not None else len(labels)
+            window = (lo, max(lo, hi))
+
+        rows = []
+        for key in series.keys():
+            nomenclature, storage, unit = groups[key]
+            scale = fixed_point.scale_of(unit)
+            opening, income, outcome = series.row(key)
+            row = {
+                "nomenclature_code": nomenclature.unique_code,
+                "nomenclature_name": nomenclature.name,
+                "storage_code": storage.unique_code,
+                "storage_name": storage.name,
+                "unit_name": unit.name if unit is not None else "",
+                "start_balance": fixed_point.to_decimal(opening, scale),
+                "income": [fixed_point.to_decimal(value, scale) for value in income],
+                "outcome": [fixed_point.to_decimal(value, scale) for value in outcome],
+                "end_balance": [fixed_point.to_decimal(series.balance(key, position + 1), scale)
+                                for position in range(len(labels))]
+            }
+            if window is not None:
+                window_income, window_outcome = series.movement(key, window[0], window[1])
+                row["window"] = {
+                    "start_balance": fixed_point.to_decimal(series.balance(key, window[0]), scale),
+                    "income": fixed_point.to_decimal(window_income, scale),
+                    "outcome": fixed_point.to_decimal(window_outcome, scale),
+                    "end_balance": fixed_point.to_decimal(series.balance(key, window[1]), scale)
+                }
+            rows.append(row)
+
+        result = {
+            "bucket": bucket,
+            "labels": [label.strftime("%Y-%m-%d") for label in labels],
+            "series": rows
+        }
+        if window is not None:
+            result["window"] = {
+                "start": labels[window[0]].strftime("%Y-%m-%d") if window[0] < len(labels) else None,
+                "buckets": window[1] - window[0]
+            }
+        return result
+
+    def __build(self, bucket: str, start_date: datetime, end_date: datetime) -> tuple:
+        index = self.__repo.transaction_index()
+        if len(index) == 0:
+            return prefix_series([], {}), {}
+
+        transactions = index.select()
+        first = turnover_series_service.bucket_start(start_date or transactions[0].period, bucket)
+        last = turnover_series_service.bucket_start(end_date or transactions[-1].period, bucket)
+        count = turnover_series_service.__count(first, last, bucket)
+        if count > turnover_series_service.__max_buckets:
+            raise argument_exception(f"Слишком много интервалов: {count}. "
+                                     f"Допустимо не более {turnover_series_service.__max_buckets}, "
+                                     f"уменьшите период или укрупните интервал!")
+
+        labels = []
+        label = first
+        try:
+            while label <= last:
+                labels.append(label)
+                label = turnover_series_service.__next(label, bucket)
+        except OverflowError:
+            raise argument_exception("Дата вне допустимого диапазона!")
+        finish = label
+
+        # Остатки на начало первого интервала (в базовых единицах)
+        groups = {}
+        rows = {}
+        for key, (nomenclature, storage, unit, balance) in self.__snapshots.opening_balances(first).items():
+            if balance == 0:
+                continue
+            groups[key] = (nomenclature, storage, unit)
+            rows[key] = [balance, [0] * len(labels), [0] * len(labels)]
+
+        # Строка хранится с наибольшей точностью из встреченных единиц - пересчет без округления
+
+        # Движение по дням: из дневных агрегатов, если возможно, иначе по проводкам
+        last_day = finish - timedelta(days=1)
+        if self.__aggregates.covers(first, last_day):
+            movements = self.__aggregates.daily(first, last_day)
+        else:
+            movements = turnover_series_service.__postings(index.select(first, finish - timedelta(microseconds=1)),
+                                                            self.__repo.range_conversion())
+
+        position = 0
+        for day, nomenclature, storage, unit, income, outcome in movements:
+            while position + 1 < len(labels) and labels[position + 1] <= day:
+                position += 1
+
+            key = (nomenclature.unique_code, storage.unique_code)
+            row = rows.get(key)
+            if row is None:
+                groups[key] = (nomenclature, storage, unit)
+                row = rows[key] = [0, [0] * len(labels), [0] * len(labels)]
+
+            from_scale = fixed_point.scale_of(unit)
+            to_scale = fixed_point.scale_of(groups[key][2])
+            if from_scale > to_scale:
+                turnover_series_service.__widen(row, 10 ** (from_scale - to_scale))
+                groups[key] = (groups[key][0], groups[key][1], unit)
+                to_scale = from_scale
+            row[1][position] += fixed_point.rescale(income, from_scale, to_scale)
+            row[2][position] += fixed_point.rescale(outcome, from_scale, to_scale)
+
+        return prefix_series(labels, {key: tuple(row) for key, row in rows.items()}), groups
+
+    @staticmethod
+    def __widen(row: list, factor: int):
+        """
+        Перевести строку (остаток, приходы, расходы) к более точной единице: умножить на factor
+        """
+        row[0] *= factor
+        row[1][:] = [value * factor for value in row[1]]
+        row[2][:] = [value * factor for value in row[2]]
+
+    @staticmethod
+    def __count(first: datetime, last: datetime, bucket: str) -> int:
+        """
+        Количество интервалов от first до last (начала интервалов) включительно
+        """
+        if last < first:
+            return 0
+        if bucket == "day":
+            return (last - first).days + 1
+        if bucket == "week":
+            return (last - first).days // 7 + 1
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+
+    @staticmethod
+    def __postings(transactions: list, conversion):
+        """
+        Движение по проводкам в формате дневных агрегатов
+        """
+        for transaction in transactions:
+            if not transaction.nomenclature or not transaction.storage:
+                continue
+
+            unit, quantity = conversion.base_quantity(transaction)
+            yield (transaction.period, transaction.nomenclature, transaction.storage, unit,
+                   max(quantity, 0), max(-quantity, 0))
+
+    @staticmethod
+    def __next(value: datetime, bucket: str) -> datetime:
+        if bucket == "day":
+            return value + timedelta(days=1)
+        if bucket == "week":
+            return value + timedelta(days=7)
+        if value.month == 12:
+            return datetime(value.year + 1, 1, 1)
+        return datetime(value.year, value.month + 1, 1)
@@ -0,0 +1,42 @@
+from Src.Core.entity_model import entity_model
+from Src.Core.validator import validator
+from datetime import datetime
+
+"""
+Модель снимка остатков на начало закрытого периода
+Остатки хранятся по ключу (код номенклатуры, код склада) и включают все транзакции до period
+"""
+class balance_snapshot_model(entity_model):
+    __period:datetime = None
+    __balances:dict = {}
+
+    # Дата снимка (остаток на начало дня)
+    @property
+    def period(self) -> datetime:
+        return self.__period
+
+    @period.setter
+    def period(self, value:datetime):
+        validator.validate(value, datetime)
+        self.__period = value
+
+    # Остатки: (код номенклатуры, код склада) -> (номенклатура, склад, единица измерения, остаток в целых единицах точности единицы)
+    @property
+    def balances(self) -> dict:
+        return self.__balances
+
+    @balances.setter
+    def balances(self, value:dict):
+        validator.validate(value, dict)
+        self.__balances = value
+
+    """
+    Универсальный фабричный метод
+    """
+    @staticmethod
+    def create(period:datetime, balances:dict) -> "balance_snapshot_model":
+        item = balance_snapshot_model()
+        item.period = period
+        item.balances = balances
+        item.name = period.strftime("%Y-%m-%d")
+        return item
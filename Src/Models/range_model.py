@@ -1,5 +1,6 @@
 from Src.Core.entity_model import entity_model
 from Src.Core.validator import validator, argument_exception
+from Src.Core.fixed_point import fixed_point
 from Src.Dtos.range_dto import range_dto
 
 """
@@ -8,6 +9,7 @@ from Src.Dtos.range_dto import range_dto
 class range_model(entity_model):
     __value:int = 1
     __base:'range_model' = None
+    __scale:int = fixed_point.default_scale()
 
     """
     Значение коэффициента пересчета
@@ -35,6 +37,21 @@ class range_model(entity_model):
     def base(self, value):
         self.__base = value
 
+    """
+    Точность хранения количества (знаков после запятой)
+    Количества в этой единице хранятся целыми числами единиц 10^-scale
+    """
+    @property
+    def scale(self) -> int:
+        return self.__scale
+
+    @scale.setter
+    def scale(self, value: int):
+        validator.validate(value, int)
+        if value < 0:
+             raise argument_exception("Некорректный аргумент!")
+        self.__scale = value
+
     """
     Киллограмм
     """
@@ -77,6 +94,7 @@ class range_model(entity_model):
         validator.validate(cache, dict)
         base  = cache[ dto.base_id ] if dto.base_id in cache else None
         item = range_model.create(dto.name, dto.value, base)
+        item.scale = dto.scale
         return item
     
 
@@ -87,6 +105,7 @@ class range_model(entity_model):
         dto = range_dto()
         dto.name = self.name
         dto.value = self.value
+        dto.scale = self.scale
         dto.id = self.unique_code
         if self.base is not None:
             dto.base_id = self.base.unique_code
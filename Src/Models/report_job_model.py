@@ -0,0 +1,85 @@
+from Src.Core.entity_model import entity_model
+from Src.Core.job_status import job_status
+from Src.Core.validator import validator
+from datetime import datetime
+
+"""
+Модель фонового задания формирования отчета
+Код задания - unique_code, наименование - тип отчета
+"""
+class report_job_model(entity_model):
+    __status:job_status = job_status.QUEUED
+    __stage:str = ""
+    __created:datetime = None
+    __finished:datetime = None
+    __result = None
+    __error:str = ""
+
+    # Состояние
+    @property
+    def status(self) -> job_status:
+        return self.__status
+
+    @status.setter
+    def status(self, value:job_status):
+        validator.validate(value, job_status)
+        self.__status = value
+
+    # Текущая стадия расчета (filtering, grouping, rendering и т.д.)
+    @property
+    def stage(self) -> str:
+        return self.__stage
+
+    @stage.setter
+    def stage(self, value:str):
+        validator.validate(value, str)
+        self.__stage = value
+
+    # Время постановки в очередь
+    @property
+    def created(self) -> datetime:
+        return self.__created
+
+    @created.setter
+    def created(self, value:datetime):
+        validator.validate(value, datetime)
+        self.__created = value
+
+    # Время завершения
+    @property
+    def finished(self) -> datetime:
+        return self.__finished
+
+    @finished.setter
+    def finished(self, value:datetime):
+        validator.validate(value, datetime)
+        self.__finished = value
+
+    # Результат (для выполненного задания)
+    @property
+    def result(self):
+        return self.__result
+
+    @result.setter
+    def result(self, value):
+        self.__result = value
+
+    # Описание ошибки (для задания с ошибкой)
+    @property
+    def error(self) -> str:
+        return self.__error
+
+    @error.setter
+    def error(self, value:str):
+        validator.validate(value, str)
+        self.__error = value
+
+    """
+    Универсальный фабричный метод
+    """
+    @staticmethod
+    def create(name:str) -> "report_job_model":
+        item = report_job_model()
+        item.name = name
+        item.created = datetime.now()
+        return item
@@ -7,6 +7,9 @@ from Src.Core.response_formats import response_formats
 class settings_model:
     __company: company_model = None
     __default_response_format:str =  response_formats.csv()
+    __report_cache_path:str = "report_cache"
+    __precompute_hour:int = 5
+    __precomputed_reports:list = []
 
     # Текущая организация
     @property
@@ -32,4 +35,40 @@ class settings_model:
         
         self.__default_response_format = value
 
+    # Каталог дискового кэша готовых отчетов
+    @property
+    def report_cache_path(self) -> str:
+        return self.__report_cache_path
+
+    @report_cache_path.setter
+    def report_cache_path(self, value:str):
+        validator.validate(value, str)
+        if value.strip() == "":
+            raise argument_exception("Не указан каталог кэша отчетов!")
+
+        self.__report_cache_path = value.strip()
+
+    # Час суток (вне пиковой нагрузки) для предварительного расчета отчетов
+    @property
+    def precompute_hour(self) -> int:
+        return self.__precompute_hour
+
+    @precompute_hour.setter
+    def precompute_hour(self, value:int):
+        validator.validate(value, int)
+        if value < 0 or value > 23:
+            raise argument_exception("Некорректно указан час расчета!")
+
+        self.__precompute_hour = value
+
+    # Отчеты для предварительного расчета. Элемент - словарь:
+    #   name - наименование, period - yesterday / month_to_date,
+    #   per_storage - отдельный отчет по каждому складу, format - формат ответа
+    @property
+    def precomputed_reports(self) -> list:
+        return self.__precomputed_reports
 
+    @precomputed_reports.setter
+    def precomputed_reports(self, value:list):
+        validator.validate(value, list)
+        self.__precomputed_reports = value
@@ -1,9 +1,11 @@
+import math
 from Src.Core.entity_model import entity_model
 from datetime import datetime
 from Src.Models.nomenclature_model import nomenclature_model
 from Src.Models.storage_model import storage_model
 from Src.Models.range_model import range_model
 from Src.Core.validator import validator, argument_exception
+from Src.Core.fixed_point import fixed_point
 from Src.Dtos.transaction_dto import transaction_dto
 
 """
@@ -12,8 +14,9 @@ from Src.Dtos.transaction_dto import transaction_dto
 class transaction_model(entity_model):
     
     __period:datetime = datetime.now
-    __value:float = 0.0
-    __range:range_model
+    __quantity:int = 0
+    __scale:int = fixed_point.default_scale()
+    __range:range_model = None
     __nomenclature:nomenclature_model
     __storage:storage_model
 
@@ -30,15 +33,35 @@ class transaction_model(entity_model):
     # Значение транзакции
     @property
     def value(self) -> float:
-        return self.__value
+        return self.__quantity / 10 ** self.__scale
     
     @value.setter
     def value(self, value):
         validator.validate(value, float)
-        if value == 0:
+        if value == 0 or not math.isfinite(value):
             raise argument_exception("Некорректно указано значение!")
-        
-        self.__value = value
+
+        # Значение хранится точно: точность не меньше точности единицы измерения
+        # и не меньше количества знаков самого значения
+        scale = max(fixed_point.scale_of(self.__range), fixed_point.digits(value))
+        self.__quantity = fixed_point.from_value(value, scale)
+        self.__scale = scale
+
+    # Количество в целых единицах 10^-scale (см. scale)
+    @property
+    def quantity(self) -> int:
+        return self.__quantity
+
+    # Точность хранения количества. Не меньше точности единицы измерения (range.scale)
+    @property
+    def scale(self) -> int:
+        return self.__scale
+
+    """
+    Количество в целых единицах с указанной точностью
+    """
+    def quantity_at(self, scale: int) -> int:
+        return fixed_point.rescale(self.__quantity, self.__scale, scale)
 
     # Единица измерения
     @property
@@ -48,6 +71,10 @@ class transaction_model(entity_model):
     @range.setter
     def range(self, value:range_model):
         validator.validate(value, range_model)
+        # Количество не округляется: точность только увеличивается до точности новой единицы
+        scale = max(self.__scale, fixed_point.scale_of(value))
+        self.__quantity = fixed_point.rescale(self.__quantity, self.__scale, scale)
+        self.__scale = scale
         self.__range = value
 
     # Номенклатура
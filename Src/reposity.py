@@ -1,4 +1,12 @@
+import weakref
 from Src.Core.common import common
+from Src.Core.validator import argument_exception
+from Src.Core.event_type import event_type
+from Src.Core.period_index import period_index
+from Src.Core.range_conversion import range_conversion
+from Src.Core.bk_tree import bk_tree
+from Src.Core.sharded_executor import sharded_executor
+from Src.Core.entity_model import entity_model
 
 """
 Репозиторий данных
@@ -6,9 +14,138 @@ from Src.Core.common import common
 class reposity:
     __data = {}
 
+    # Поколение данных по каждому ключу. Увеличивается при любом изменении
+    __generations = {}
+
+    # Производные структуры (индексы), построенные по данным
+    # Ключ - (ключ данных, наименование), значение - (поколение, структура)
+    __cache = {}
+
+    # Подписчики на изменения данных (слабые ссылки на методы)
+    __observers = []
+
     @property
     def data(self):
         return self.__data
+
+    """
+    Подписаться на изменения данных
+    handler(event: event_type, key: str, item) - метод объекта. Хранится слабая ссылка,
+    подписка снимается автоматически вместе с объектом
+    """
+    def subscribe(self, handler):
+        if not callable(handler):
+            raise argument_exception("Некорректный аргумент!")
+
+        reference = weakref.WeakMethod(handler) if hasattr(handler, "__self__") else (lambda: handler)
+        self.__observers.append(reference)
+
+    """
+    Поколение данных. Без ключа - суммарно по исходным данным репозитория
+    Производные данные (см. derived_keys) в сумму не входят: они дописываются при чтении
+    и не должны делать устаревшими ответы, посчитанные на тех же исходных данных
+    """
+    def generation(self, key: str = None) -> int:
+        if key is None:
+            derived = reposity.derived_keys()
+            return sum(value for item, value in self.__generations.items() if item not in derived)
+
+        return self.__generations.get(key, 0)
+
+    """
+    Добавить элемент в репозиторий
+    """
+    def append(self, key: str, item):
+        self.__data[ key ].append(item)
+        self.__touch(key)
+        self.__notify(event_type.APPEND, key, item)
+
+    """
+    Удалить элемент из репозитория (по ссылке на объект)
+    """
+    def remove(self, key: str, item):
+        items = self.__data[ key ]
+        for position, value in enumerate(items):
+            if value is item:
+                del items[ position ]
+                break
+        else:
+            raise argument_exception("Элемент не найден в репозитории!")
+
+        self.__touch(key)
+        self.__notify(event_type.REMOVE, key, item)
+
+    """
+    Получить производную структуру по данным ключа
+    Структура строится через factory(list) и перестраивается только при смене поколения данных
+        - depends - ключи, от данных которых структура тоже зависит
+    """
+    def cached(self, key: str, name: str, factory, depends: tuple = ()):
+        generation = (self.generation(key),) + tuple(self.generation(item) for item in depends)
+        entry = self.__cache.get((key, name))
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+
+        value = factory(self.__data.get(key, []))
+        self.__cache[(key, name)] = (generation, value)
+        return value
+
+    """
+    Индекс транзакций по периоду
+    """
+    def transaction_index(self) -> period_index:
+        return self.cached(reposity.transaction_key(), "period_index", period_index)
+
+    """
+    Таблица пересчета единиц измерения в базовые
+    """
+    def range_conversion(self) -> range_conversion:
+        return self.cached(reposity.range_key(), "conversion", range_conversion)
+
+    """
+    Индекс наименований номенклатуры для нечеткого поиска
+    Переименование через свойство модели не меняет поколение данных, поэтому вместе с индексом
+    хранятся ключи поиска, по которым он построен: при их изменении индекс перестраивается
+    """
+    def nomenclature_name_index(self) -> bk_tree:
+        key = reposity.nomenclature_key()
+        names = tuple(item.search_key for item in self.__data.get(key, []))
+        factory = lambda data: (names, bk_tree(data, lambda item: item.search_key))
+        entry = self.cached(key, "name_index", factory)
+        if entry[0] != names:
+            del self.__cache[(key, "name_index")]
+            entry = self.cached(key, "name_index", factory)
+
+        return entry[1]
+
+    """
+    Шарды данных ключа для параллельной фильтрации
+    Процессы-исполнители хранят проекции элементов (в том числе наименования вложенных моделей).
+    Переименование через свойство модели не меняет поколение данных, поэтому вместе с шардами
+    хранится номер смены наименований: после переименования шарды строятся заново
+    """
+    def sharded(self, key: str) -> sharded_executor:
+        version = entity_model.rename_version()
+        factory = lambda data: (version, sharded_executor(data))
+        entry = self.cached(key, "shards", factory)
+        if entry[0] != version:
+            del self.__cache[(key, "shards")]
+            entry = self.cached(key, "shards", factory)
+
+        return entry[1]
+
+    # Отметить изменение данных по ключу
+    def __touch(self, key: str):
+        self.__generations[ key ] = self.__generations.get(key, 0) + 1
+
+    # Оповестить подписчиков
+    def __notify(self, event: event_type, key: str, item):
+        for reference in list(self.__observers):
+            handler = reference()
+            if handler is not None:
+                handler(event, key, item)
+
+        self.__observers[:] = [reference for reference in self.__observers if reference() is not None]
     
     """
     Ключ для единц измерений
@@ -39,6 +176,20 @@ class reposity:
         return "transaction_key"    
     
 
+    """
+    Ключ для снимков остатков на закрытые периоды
+    """
+    @staticmethod
+    def snapshot_key():
+        return "snapshot_key"
+
+    """
+    Ключи производных данных: строятся по исходным данным (снимки остатков)
+    """
+    @staticmethod
+    def derived_keys() -> list:
+        return [reposity.snapshot_key()]
+
     """
     Ключ для номенклатуры
     """
@@ -77,5 +228,7 @@ class reposity:
         keys = reposity.keys()
         for key in keys:
             self.__data[ key ] = []
+            self.__touch(key)
+            self.__notify(event_type.RESET, key, None)
     
     
@@ -65,6 +65,9 @@ class settings_manager:
                     if data in response_formats.list_all_formats():
                         self.settings.default_response_format = data
 
+                if "precomputed_reports" in settings.keys() and result == True:
+                    result = self.convert_precompute(settings["precomputed_reports"])
+
                 return result
             return False
         except:
@@ -86,6 +89,22 @@ class settings_manager:
         return True
 
 
+    # Обработать настройки предварительного расчета отчетов
+    def convert_precompute(self, data: dict) -> bool:
+        validator.validate(data, dict)
+
+        try:
+            if "cache_path" in data.keys():
+                self.__settings.report_cache_path = data["cache_path"]
+            if "hour" in data.keys():
+                self.__settings.precompute_hour = data["hour"]
+            if "reports" in data.keys():
+                self.__settings.precomputed_reports = data["reports"]
+        except:
+            return False
+
+        return True
+
     # Параметры настроек по умолчанию
     def set_default(self):
         company = company_model()
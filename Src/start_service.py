@@ -15,6 +15,7 @@ from Src.Models.storage_model import storage_model
 from Src.Models.transaction_model import transaction_model
 from Src.Dtos.transaction_dto import transaction_dto
 from Src.Logics.turnover_report_service import turnover_report_service
+from Src.Logics.stock_balance_service import stock_balance_service
 
 
 # Добавляем импорт filter_service
@@ -44,12 +45,17 @@ class start_service:
     # Сервис ОСВ
     __turnover_service: turnover_report_service = None
 
+    # Сервис остатков на дату
+    __stock_service: stock_balance_service = None
+
     def __init__(self):
         self.__repo.initalize()
         # Инициализируем сервис фильтрации
         self.__filter_service = filter_service()
         # Инициализируем сервис ОСВ
         self.__turnover_service = turnover_report_service()
+        # Инициализируем сервис остатков
+        self.__stock_service = stock_balance_service()
     @property
     def filter_service(self):
         return self.__filter_service
@@ -106,7 +112,7 @@ class start_service:
         validator.validate(key, str)
         item.unique_code = dto.id
         self.__cache.setdefault(dto.id, item)
-        self.__repo.data[key].append(item)
+        self.__repo.append(key, item)
 
     # Загрузить единицы измерений
     def __convert_ranges(self, data: dict) -> bool:
@@ -224,7 +230,7 @@ class start_service:
                 self.__default_receipt.composition.append(item)
 
             # Сохраняем рецепт
-            self.__repo.data[reposity.receipt_key()].append(self.__default_receipt)
+            self.__repo.append(reposity.receipt_key(), self.__default_receipt)
             return True
         except Exception as e:
             self.__error_message = str(e)
@@ -274,4 +280,8 @@ class start_service:
                 f"Невозможно сформировать стартовый набор данных!\nОписание: {self.error_message}")
     @property
     def turnover_service(self):
-        return self.__turnover_service
\ No newline at end of file
+        return self.__turnover_service
+
+    @property
+    def stock_service(self):
+        return self.__stock_service
@@ -4,8 +4,52 @@ from Src.Models.group_model import group_model
 from Src.Logics.factory_entities import factory_entities
 from Src.Core.response_formats import response_formats
 from Src.Models.range_model import range_model
+from Src.start_service import start_service
+from Src.reposity import reposity
+from Src.Logics.balance_snapshot_service import balance_snapshot_service
+from Src.Logics.turnover_aggregate_service import turnover_aggregate_service
+from Src.Logics.turnover_numpy_engine import turnover_numpy_engine
+from Src.Models.transaction_model import transaction_model
+from Src.Core.range_conversion import range_conversion
+from Src.Logics.turnover_rollup import turnover_rollup
+from Src.Logics.turnover_report_service import turnover_item
+from Src.Logics.turnover_ranking import turnover_ranking
+from Src.Core.prefix_series import prefix_series
+from Src.Core.fenwick_tree import fenwick_tree
+from Src.Core.fixed_point import fixed_point
+from Src.Logics.stock_balance_service import stock_balance_service
+from Src.Logics.turnover_parallel_engine import turnover_parallel_engine
+import Src.Logics.turnover_parallel_engine as parallel_module
+from Src.Models.storage_model import storage_model
+from Src.Logics.report_job_service import report_job_service
+from Src.Core.job_status import job_status
+from Src.Core.single_flight import single_flight
+from Src.Logics.report_scheduler_service import report_scheduler_service
+from Src.Models.settings_model import settings_model
+from Src.Core.report_disk_cache import report_disk_cache
+from datetime import datetime, timedelta
+from flask import Flask
+import random
+import csv
+import io
+import time
+import threading
+import tempfile
+import os
+import pickle
+from array import array
+from decimal import Decimal
 
 # Тесты для проверки логики 
+# Дождаться выполнения условия (ожидание ограничено по времени)
+def wait_until(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Условие не выполнено!")
+        time.sleep(0.001)
+
+
 class test_logics(unittest.TestCase):
 
     # Проверим формирование CSV
@@ -55,9 +99,893 @@ class test_logics(unittest.TestCase):
         assert instance is not None
         text = instance().build(data)
         assert len(text) > 0
-        print(text)    
+        print(text)
+
+
+    # Проверить, что сальдо на начало по снимкам совпадает с суммой всех предшествующих проводок
+    # (в том числе после добавления транзакции задним числом)
+    def test_equals_balance_snapshot_service_opening_balances(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = balance_snapshot_service()
+        start_date = datetime(2025, 3, 5)
+
+        def expected() -> dict:
+            result = {}
+            for item in start.data[reposity.transaction_key()]:
+                if item.period < start_date:
+                    key = (item.nomenclature.unique_code, item.storage.unique_code)
+                    result[key] = result.get(key, 0) + reposity().range_conversion().base_quantity(item)[1]
+            return result
+
+        # Действие
+        before = service.opening_balances(start_date)
+        snapshots = len(start.data[reposity.snapshot_key()])
+        source = start.data[reposity.transaction_key()][0]
+        backdated = transaction_model()
+        backdated.period = datetime(2024, 12, 31)
+        backdated.nomenclature = source.nomenclature
+        backdated.storage = source.storage
+        backdated.range = source.range
+        backdated.value = 5.5
+        reposity().append(reposity.transaction_key(), backdated)
+        after = service.opening_balances(start_date)
+
+        # Проверка
+        assert snapshots > 0
+        assert {key: value[3] for key, value in before.items()} != {key: value[3] for key, value in after.items()}
+        assert {key: value[3] for key, value in after.items()} == expected()
+
+    # Проверить, что снимки не строятся дальше месяца после последней проводки
+    def test_equals_balance_snapshot_service_close_capped(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = balance_snapshot_service()
+        periods = [item.period for item in start.data[reposity.transaction_key()]]
+        first, last = min(periods), max(periods)
+        months = (last.year - first.year) * 12 + last.month - first.month + 1
+        start_date = datetime(9999, 1, 1)
+
+        # Действие
+        balances = service.opening_balances(start_date)
+
+        # Проверка
+        assert len(start.data[reposity.snapshot_key()]) == months
+        assert sum(value[3] for value in balances.values()) == \
+            sum(reposity().range_conversion().base_quantity(item)[1] for item in start.data[reposity.transaction_key()])
+
+    # Проверить, что построение снимков при чтении не меняет поколение данных
+    def test_equals_balance_snapshot_service_generation(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = balance_snapshot_service()
+        index = reposity().transaction_index()
+        periods = [item.period for item in start.data[reposity.transaction_key()]]
+        generation = reposity().generation()
+
+        # Действие
+        service.opening_balances(datetime(2025, 3, 5))
+
+        # Проверка
+        assert len(start.data[reposity.snapshot_key()]) > 0
+        assert reposity().generation() == generation
+        assert (index.first_period(), index.last_period()) == (min(periods), max(periods))
+
+    # Проверить, что дневные агрегаты совпадают с группировкой проводок после добавления и удаления транзакции
+    def test_equals_turnover_aggregate_service_totals(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = turnover_aggregate_service()
+        report = start.turnover_service
+        start_date = datetime(2025, 1, 1)
+        end_date = datetime(2025, 1, 20)
+
+        def expected() -> dict:
+            transactions = [item for item in start.data[reposity.transaction_key()]
+                            if start_date <= item.period <= end_date]
+            items = report._build_report_items(report._group_transactions(transactions))
+            return {(item.nomenclature_code, item.storage_code): (item.income, item.outcome) for item in items}
+
+        def actual() -> dict:
+            grouped, _ = service.totals(start_date, end_date)
+            items = report._build_report_items(grouped)
+            return {(item.nomenclature_code, item.storage_code): (item.income, item.outcome) for item in items}
+
+        # Действие
+        initial = actual()
+        source = start.data[reposity.transaction_key()][0]
+        added = transaction_model()
+        added.period = datetime(2025, 1, 10)
+        added.nomenclature = source.nomenclature
+        added.storage = source.storage
+        added.range = source.range
+        added.value = -2.25
+        reposity().append(reposity.transaction_key(), added)
+        appended = actual()
+        expected_appended = expected()
+        reposity().remove(reposity.transaction_key(), added)
+
+        # Проверка
+        assert service.covers(start_date, end_date)
+        assert appended == expected_appended
+        assert appended != initial
+        assert actual() == initial == expected()
+
+    # Проверить удаление одной из транзакций с одинаковым кодом
+    def test_equals_turnover_aggregate_service_shared_code(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = turnover_aggregate_service()
+        report = start.turnover_service
+        transactions = start.data[reposity.transaction_key()]
+        removed = transactions[0]
+        shared = [item for item in transactions if item.unique_code == removed.unique_code]
+
+        def totals(grouped: dict) -> dict:
+            items = report._build_report_items(grouped)
+            return {(item.nomenclature_code, item.storage_code): (item.income, item.outcome) for item in items}
+
+        # Действие
+        service.totals()
+        reposity().remove(reposity.transaction_key(), removed)
+        actual = totals(service.totals()[0])
+        expected = totals(report._group_transactions(start.data[reposity.transaction_key()]))
+
+        # Проверка
+        assert len(shared) > 1
+        assert actual == expected
+        assert actual[(removed.nomenclature.unique_code, removed.storage.unique_code)] == (0, 13)
+
+    # Проверить, что векторизованный расчет ОСВ (numpy) совпадает с обычным
+    @unittest.skipUnless(turnover_numpy_engine.available(), "numpy не установлен")
+    def test_equals_turnover_report_numpy_engine(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        periods = [(None, None), (datetime(2025, 1, 13), None), (datetime(2025, 1, 1), datetime(2025, 1, 20))]
+
+        def rows(items: list) -> list:
+            return [(item.nomenclature_code, item.storage_code, str(item.start_balance), str(item.income),
+                     str(item.outcome), str(item.end_balance)) for item in items]
+
+        for start_date, end_date in periods:
+            # Действие
+            expected = report._generate_turnover_report(None, start_date, end_date)
+            actual = report._generate_turnover_report(None, start_date, end_date, engine="numpy")
+
+            # Проверка
+            assert len(actual) > 0
+            assert rows(actual) == rows(expected)
+
+    # Проверить, что ОСВ пересчитывает проводки в разных единицах в базовую единицу
+    def test_equals_turnover_report_mixed_units(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        gramm = range_model.create("грамм", 1, None)
+        kill = range_model.create("киллограмм", 1000, gramm)
+        ton = range_model.create("тонна", 1000, kill)
+        reposity().append(reposity.range_key(), ton)
+        source = start.data[reposity.transaction_key()][0]
+        values = [(kill, 1.5), (gramm, 250.0), (ton, 0.002), (gramm, -50.0)]
+        transactions = []
+        for unit, value in values:
+            item = transaction_model()
+            item.period = datetime(2030, 1, 1)
+            item.nomenclature = source.nomenclature
+            item.storage = source.storage
+            item.range = unit
+            item.value = value
+            transactions.append(item)
+        report = start.turnover_service
+
+        # Действие
+        conversion = range_conversion([ton])
+        items = report._build_report_items(report._group_transactions(transactions))
+
+        # Проверка
+        assert conversion.resolve(ton) == (gramm, 1000000)
+        assert conversion.resolve(kill) == (gramm, 1000)
+        assert len(items) == 1
+        assert items[0].unit_name == "грамм"
+        assert items[0].income == Decimal("3750.0")
+        assert items[0].outcome == Decimal("50.0")
+        assert items[0].end_balance == Decimal("3700.0")
+
+    # Проверить, что итоги по складу и номенклатуре совпадают с суммой строк ОСВ
+    def test_equals_turnover_rollup_build(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        items = report._generate_turnover_report()
+        rollup = turnover_rollup.create({"rollup": ["storage", "nomenclature"]})
+
+        # Действие
+        result = rollup.build(items, report._nomenclatures_by_code())
+
+        # Проверка
+        expected = {}
+        for item in items:
+            expected[item.unit_name] = expected.get(item.unit_name, Decimal("0")) + item.end_balance
+        assert {total["unit_name"]: total["end_balance"] for total in result["totals"]} == expected
+        assert len(result["children"]) == len({item.storage_code for item in items})
+        leaves = [leaf for storage in result["children"] for leaf in storage["children"]]
+        assert len(leaves) == len(items)
+        assert turnover_rollup.create({}) is None
+
+    # Проверить итоги уровня группы и сложение строк разной точности без округления
+    def test_equals_turnover_rollup_group_and_scales(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        items = report._generate_turnover_report()
+        nomenclatures = report._nomenclatures_by_code()
+        rollup = turnover_rollup.create({"rollup": True})
+        coarse = turnover_item()
+        fine = turnover_item()
+        for item, scale, units in [(coarse, 0, 2), (fine, 3, 500)]:
+            item.nomenclature_code = items[0].nomenclature_code
+            item.storage_code = items[0].storage_code
+            item.unit_name = "грамм"
+            item.set_quantities(scale, 0, units, 0)
+
+        # Действие
+        result = rollup.build(items, nomenclatures)
+        mixed = rollup.build([coarse, fine], nomenclatures)
+
+        # Проверка
+        expected = {}
+        for item in items:
+            group = nomenclatures[item.nomenclature_code].group
+            key = (group.unique_code, item.unit_name)
+            expected[key] = expected.get(key, Decimal("0")) + item.end_balance
+        actual = {(group["code"], total["unit_name"]): total["end_balance"]
+                  for group in result["children"] for total in group["totals"]}
+        assert [group["level"] for group in result["children"]] == ["group"] * len(result["children"])
+        assert actual == expected
+        assert mixed["totals"][0]["income"] == Decimal("2.5")
+
+    # Проверить, что движение за поддиапазон по накопленным суммам совпадает с прямым суммированием
+    def test_equals_prefix_series_movement(self):
+        # Подготовка
+        random.seed(7)
+        labels = list(range(12))
+        income = [random.randint(0, 100) for _ in labels]
+        outcome = [random.randint(0, 100) for _ in labels]
+        series = prefix_series(labels, {"key": (50, income, outcome)})
+
+        # Действие / Проверка
+        for lo in range(len(labels) + 1):
+            for hi in range(lo, len(labels) + 1):
+                assert series.movement("key", lo, hi) == (sum(income[lo:hi]), sum(outcome[lo:hi]))
+                assert series.balance("key", hi) == 50 + sum(income[:hi]) - sum(outcome[:hi])
+
+    # Проверить, что остаток на конец ряда по неделям совпадает с ОСВ за тот же период
+    def test_equals_turnover_series_end_balance(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        items = report._generate_turnover_report()
+        app = Flask(__name__)
+        report.setup_routes(app)
+
+        # Действие
+        result = app.test_client().post("/api/report/turnover/series", json={"bucket": "week"}).get_json()
+
+        # Проверка
+        expected = {(item.nomenclature_code, item.storage_code): str(item.end_balance) for item in items}
+        actual = {(row["nomenclature_code"], row["storage_code"]): row["end_balance"][-1] for row in result["series"]}
+        assert len(result["labels"]) > 0
+        assert actual == expected
+
+    # Проверить ограничение количества интервалов и сложение единиц разной точности без округления
+    def test_equals_turnover_series_limits_and_scales(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        app = Flask(__name__)
+        report.setup_routes(app)
+        client = app.test_client()
+        gramm = range_model.create("грамм", 1, None)
+        gramm.scale = 0
+        kill = range_model.create("киллограмм", 1000, gramm)
+        kill.scale = 3
+        liter = range_model.create("литр", 1, None)
+        liter.scale = 3
+        reposity().append(reposity.range_key(), kill)
+        reposity().append(reposity.range_key(), liter)
+        source = start.data[reposity.transaction_key()][0]
+        storage = storage_model()
+        storage.name = "Склад точности"
+        for unit, value in [(kill, 2.0), (liter, 0.5)]:
+            item = transaction_model()
+            item.period = datetime(2030, 1, 10)
+            item.nomenclature = source.nomenclature
+            item.storage = storage
+            item.range = unit
+            item.value = value
+            reposity().append(reposity.transaction_key(), item)
+
+        # Действие
+        limited = client.post("/api/report/turnover/series", json={"bucket": "day", "start_date": "0001-01-01"})
+        result = client.post("/api/report/turnover/series",
+                             json={"bucket": "month", "start_date": "2030-01-01", "end_date": "2030-01-31"}).get_json()
+
+        # Проверка
+        rows = [row for row in result["series"] if row["storage_code"] == storage.unique_code]
+        assert limited.status_code == 400
+        assert len(rows) == 1
+        assert rows[0]["income"] == ["2000.5"]
+
+    # Проверить суммы дерева Фенвика относительно прямого суммирования
+    def test_equals_fenwick_tree_range_sum(self):
+        # Подготовка
+        random.seed(7)
+        tree = fenwick_tree(64)
+        values = [0] * 64
+        for _ in range(200):
+            position = random.randint(0, 63)
+            delta = random.randint(-20, 20)
+            values[position] += delta
+
+            # Действие
+            tree.add(position, delta)
+
+        # Проверка
+        for lo in range(64):
+            assert tree.prefix(lo) == sum(values[:lo + 1])
+            hi = random.randint(lo, 63)
+            assert tree.range_sum(lo, hi) == sum(values[lo:hi + 1])
+
+    # Проверить остаток на дату после проводки задним числом
+    def test_equals_stock_balance_service_backdated(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = start.stock_service
+        source = start.data[reposity.transaction_key()][0]
+        nomenclature_code = source.nomenclature.unique_code
+        storage_code = source.storage.unique_code
+        date = datetime(2025, 1, 15)
+
+        def expected() -> int:
+            conversion = reposity().range_conversion()
+            return sum(conversion.base_quantity(item)[1] for item in start.data[reposity.transaction_key()]
+                       if item.nomenclature.unique_code == nomenclature_code
+                       and item.storage.unique_code == storage_code and item.period < datetime(2025, 1, 16))
+
+        # Действие
+        before = service.balance(nomenclature_code, storage_code, date)
+        backdated = transaction_model()
+        backdated.period = datetime(2024, 6, 1)
+        backdated.nomenclature = source.nomenclature
+        backdated.storage = source.storage
+        backdated.range = source.range
+        backdated.value = 3.0
+        reposity().append(reposity.transaction_key(), backdated)
+        after = service.balance(nomenclature_code, storage_code, date)
+
+        # Проверка
+        assert before != after
+        assert after == expected()
+        assert service.movement(nomenclature_code, storage_code, datetime(2024, 6, 1), datetime(2024, 6, 1))[0] > 0
+
+    # Проверить проводку до 1900 года и удаление проводки, измененной после добавления
+    def test_equals_stock_balance_service_old_and_mutated(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = start.stock_service
+        source = start.data[reposity.transaction_key()][0]
+        nomenclature_code = source.nomenclature.unique_code
+        storage_code = source.storage.unique_code
+        date = datetime(2025, 1, 15)
+        before = service.balance(nomenclature_code, storage_code, date)
+        items = []
+        for period in [datetime(1850, 3, 1), datetime(2024, 6, 1)]:
+            item = transaction_model()
+            item.period = period
+            item.nomenclature = source.nomenclature
+            item.storage = source.storage
+            item.range = source.range
+            item.value = 2.0
+            items.append(item)
+
+        # Действие
+        for item in items:
+            reposity().append(reposity.transaction_key(), item)
+        added = service.balance(nomenclature_code, storage_code, date)
+        old = service.balance(nomenclature_code, storage_code, datetime(1850, 3, 1))
+        items[1].value = 7.0
+        items[1].period = datetime(2024, 7, 1)
+        reposity().remove(reposity.transaction_key(), items[1])
+        removed = service.balance(nomenclature_code, storage_code, date)
+
+        # Проверка
+        assert old == reposity().range_conversion().base_quantity(items[0])[1]
+        assert added == before + 2 * old
+        assert removed == before + old
+
+    # Проверить остаток после удаления одной из транзакций с одинаковым кодом
+    def test_equals_stock_balance_service_shared_code(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = start.stock_service
+        transactions = start.data[reposity.transaction_key()]
+        removed = transactions[0]
+        nomenclature_code = removed.nomenclature.unique_code
+        storage_code = removed.storage.unique_code
+        date = datetime(2025, 1, 31)
+        unit, _ = reposity().range_conversion().base_quantity(removed)
+        scale = fixed_point.scale_of(unit)
+        before = service.balance(nomenclature_code, storage_code, date)
+
+        # Действие
+        reposity().remove(reposity.transaction_key(), removed)
+        after = service.balance(nomenclature_code, storage_code, date)
+
+        # Проверка
+        assert len([item for item in transactions if item.unique_code == removed.unique_code]) > 1
+        assert before == 17 * 10 ** scale
+        assert after == -13 * 10 ** scale
+
+    # Проверить, что расчет ОСВ по складам в пуле процессов совпадает с обычным
+    def test_equals_turnover_report_parallel_engine(self):
+        # Подготовка
+        random.seed(7)
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        sources = list(start.data[reposity.transaction_key()])
+        for number in range(3):
+            storage = storage_model()
+            storage.name = f"Ресторан {number}"
+            for day in range(1, 20):
+                source = random.choice(sources)
+                item = transaction_model()
+                item.period = datetime(2025, 2, day)
+                item.nomenclature = source.nomenclature
+                item.storage = storage
+                item.range = source.range
+                item.value = float(random.choice([-1, 1]) * random.randint(1, 500)) / 10
+                reposity().append(reposity.transaction_key(), item)
+
+        def rows(items: list) -> list:
+            return [(item.nomenclature_code, item.storage_code, str(item.start_balance), str(item.income),
+                     str(item.outcome), str(item.end_balance)) for item in items]
+
+        # Действие
+        expected = report._generate_turnover_report(None, datetime(2025, 2, 5), None)
+        actual = report._generate_turnover_report(None, datetime(2025, 2, 5), None, engine="parallel")
+
+        # Проверка
+        assert turnover_parallel_engine().partition_count() == 4
+        assert len(actual) > 0
+        assert rows(actual) == rows(expected)
+
+    # Проверить, что процесс-исполнитель запрашивает раздел один раз и хранит разделы нескольких наборов
+    def test_equals_turnover_parallel_worker_cache(self):
+        # Подготовка
+        parallel_module._worker_partitions.clear()
+        periods = [datetime(2025, 1, 1), datetime(2025, 1, 2)]
+        payload = pickle.dumps((periods, array("q", [0, 1]), array("q", [0, 0]), array("q", [5, -2])))
+
+        # Действие
+        missing = parallel_module._turnover_partition("repository", 0, None, None, None)
+        loaded = parallel_module._turnover_partition("repository", 0, payload, None, None)
+        other = parallel_module._turnover_partition("filtered", 0, payload, periods[1], None)
+        cached = parallel_module._turnover_partition("repository", 0, None, None, None)
+
+        # Проверка
+        assert missing is None
+        assert loaded == [(0, 0, 5, 2)]
+        assert other == [(0, 1, 0, 2)]
+        assert cached == loaded
+        parallel_module._worker_partitions.clear()
+
+    # Проверить параллельный расчет наборов с одинаковыми кодами транзакций и больших количеств
+    def test_equals_turnover_parallel_engine_filtered(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        engine = turnover_parallel_engine()
+        transactions = start.data[reposity.transaction_key()]
+        source = transactions[3]
+        large = transaction_model()
+        large.period = datetime(2025, 1, 15)
+        large.nomenclature = source.nomenclature
+        large.storage = source.storage
+        large.range = source.range
+        large.value = 1e13
+        sets = [[item for item in transactions if item.value <= -3],
+                [item for item in transactions if item.period <= datetime(2025, 1, 5)],
+                transactions + [large]]
+
+        def totals(grouped: dict) -> dict:
+            items = report._build_report_items(grouped)
+            return {(item.nomenclature_code, item.storage_code): (item.income, item.outcome) for item in items}
+
+        # Действие
+        actual = [totals(engine.group_transactions(items)) for items in sets]
+        expected = [totals(report._group_transactions(items)) for items in sets]
+
+        # Проверка
+        assert len({item.unique_code for item in sets[0]}) == len({item.unique_code for item in sets[1]}) == 1
+        assert actual[0] != actual[1]
+        assert actual == expected
+
+    # Проверить, что результат фонового задания ОСВ совпадает с синхронным ответом
+    def test_equals_turnover_job_result(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        app = Flask(__name__)
+        start.turnover_service.setup_routes(app)
+        client = app.test_client()
+        body = {"format": "markdown", "start_date": "2025-01-05"}
+        expected = client.post("/api/report/turnover", json=body).get_json()
+
+        # Действие
+        submitted = client.post("/api/report/turnover/jobs", json=body)
+        job_id = submitted.get_json()["job_id"]
+        for _ in range(100):
+            if client.get(f"/api/report/turnover/jobs/{job_id}").get_json()["status"] in ["done", "failed"]:
+                break
+            time.sleep(0.05)
+        result = client.get(f"/api/report/turnover/jobs/{job_id}/result")
+
+        # Проверка
+        assert submitted.status_code == 202
+        assert result.status_code == 200
+        assert result.get_json() == expected
+        assert client.get("/api/report/turnover/jobs/unknown").status_code == 404
+
+    # Проверить удаление результата задания по истечении срока хранения
+    def test_none_report_job_service_expired(self):
+        # Подготовка
+        now = [datetime(2025, 1, 1)]
+        service = report_job_service(workers=1, ttl=1, clock=lambda: now[0])
+        job = service.submit("turnover", lambda listener: listener("grouping") or {"data": []})
+        wait_until(lambda: job.status == job_status.DONE)
+
+        # Действие
+        found = service.get(job.unique_code)
+        now[0] += timedelta(seconds=2)
+        expired = service.get(job.unique_code)
+
+        # Проверка
+        assert found is job
+        assert found.stage == "grouping"
+        assert found.finished == datetime(2025, 1, 1)
+        assert expired is None
+
+    # Проверить завершение задания с ошибкой без текста
+    def test_equals_report_job_service_empty_error(self):
+        # Подготовка
+        now = [datetime(2025, 1, 1)]
+        service = report_job_service(workers=1, ttl=1, clock=lambda: now[0])
+
+        def task(listener):
+            raise ValueError()
+
+        # Действие
+        job = service.submit("turnover", task)
+        wait_until(lambda: job.status == job_status.FAILED)
+        now[0] += timedelta(seconds=2)
+
+        # Проверка
+        assert job.error == "ValueError"
+        assert job.finished == datetime(2025, 1, 1)
+        assert service.get(job.unique_code) is None
+
+    # Проверить ограничение количества хранимых заданий и отклонение некорректных параметров до постановки
+    def test_equals_report_job_service_limits(self):
+        # Подготовка
+        service = report_job_service(workers=1, max_pending=2, max_jobs=3)
+        jobs = []
+        for _ in range(5):
+            job = service.submit("turnover", lambda listener: {"data": []})
+            for _ in range(100):
+                if job.status == job_status.DONE:
+                    break
+                time.sleep(0.02)
+            jobs.append(job)
+        start = start_service()
+        start.start()
+        app = Flask(__name__)
+        start.turnover_service.setup_routes(app)
+        client = app.test_client()
+
+        # Действие
+        stored = [service.get(job.unique_code) for job in jobs]
+        invalid = [client.post("/api/report/turnover/jobs", json=body) for body in [
+            {"start_date": "2025-13-01"},
+            {"engine": "unknown"},
+            {"field_name": "period", "filter_type": "between", "value": "2025-01-01"}]]
+
+        # Проверка
+        assert all(job.finished is not None for job in jobs)
+        assert stored[:2] == [None, None]
+        assert stored[2:] == jobs[2:]
+        assert [response.status_code for response in invalid] == [400, 400, 400]
+
+    # Проверить, что потоковая выдача ОСВ совпадает с обычным ответом и идет по строкам
+    def test_equals_turnover_stream_response(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        app = Flask(__name__)
+        start.turnover_service.setup_routes(app)
+        client = app.test_client()
+        body = {"format": "csv", "start_date": "2025-01-05"}
+        expected = client.post("/api/report/turnover", json=body).get_json()
+
+        # Действие
+        response = client.post("/api/report/turnover/stream", json=body)
+        chunks = [chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response]
+
+        # Проверка
+        assert response.status_code == 200
+        assert response.mimetype == "text/csv"
+        assert len(chunks) == expected["items_count"] + 1
+        assert "".join(chunks).strip() == expected["data"]
+
+    # Проверить план выполнения ОСВ с фильтром по вложенному полю
+    def test_plan_turnover_report_explain_filtered(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        app = Flask(__name__)
+        start.turnover_service.setup_routes(app)
+        client = app.test_client()
+        transactions = start.data[reposity.transaction_key()]
+        body = {"format": "csv", "start_date": "2025-01-01", "explain": True,
+                "nested_field": "nomenclature.name", "value": "Яйцо", "filter_type": "equals"}
+
+        # Действие
+        response = client.post("/api/report/turnover", json=body)
+        explain = response.get_json()["explain"]
+
+        # Проверка
+        assert response.status_code == 200
+        assert explain["plan"][0]["access_path"] == "period_index"
+        assert explain["plan"][0]["total_rows"] == len(transactions)
+        assert len(explain["plan"]) == 2
+
+    # Проверить, что одинаковые одновременные запросы считаются один раз
+    def test_equals_single_flight_do(self):
+        # Подготовка
+        flights = single_flight()
+        key = single_flight.key({"b": 1, "a": 2}, 5)
+        calls = []
+        results = []
+        release = threading.Event()
+
+        def factory():
+            calls.append(1)
+            release.wait()
+            return object()
+
+        def request():
+            results.append(flights.do(key, factory))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+
+        # Действие
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: flights.waiting(key) == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+        again, shared = flights.do(single_flight.key({"a": 2, "b": 1}, 6), factory)
+
+        # Проверка
+        assert len(calls) == 2
+        assert len({id(value) for value, _ in results}) == 1
+        assert sorted(flag for _, flag in results) == [False, True, True, True, True]
+        assert again is not results[0][0] and shared is False
+        assert flights.pending() == 0
+
+    # Проверить, что одновременные запросы ОСВ получают один ответ одного расчета
+    def test_equals_turnover_report_coalesced(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        app = Flask(__name__)
+        report.setup_routes(app)
+        calls = []
+        source = report._turnover_result
+        release = threading.Event()
+        key = single_flight.key(["turnover", {"format": "csv"}], reposity().generation())
+
+        def counted(data: dict, listener=None) -> dict:
+            calls.append(1)
+            release.wait()
+            return source(data, listener)
+
+        report._turnover_result = counted
+        bodies = []
+
+        def request():
+            bodies.append(app.test_client().post("/api/report/turnover", json={"format": "csv"}).get_data())
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+
+        # Действие
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: report.flights.waiting(key) == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # Проверка
+        assert len(calls) == 1
+        assert len(bodies) == 4
+        assert len(set(bodies)) == 1
+
+    # Проверить, что предварительно посчитанный отчет отдается из кэша до новой проводки
+    def test_equals_report_scheduler_service_cached(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        app = Flask(__name__)
+        report.setup_routes(app)
+        client = app.test_client()
+        settings = settings_model()
+        settings.report_cache_path = tempfile.mkdtemp()
+        settings.precomputed_reports = [{"period": "month_to_date", "per_storage": True, "format": "csv"}]
+        scheduler = report_scheduler_service(app, report, settings)
+        now = datetime(2025, 1, 25, 4)
+        body = scheduler.requests(now)[0]
+        expected = client.post("/api/report/turnover", json=body).get_data()
+
+        # Действие
+        stored = scheduler.run(now)
+        cached = client.post("/api/report/turnover", json=body)
+        source = start.data[reposity.transaction_key()][0]
+        item = transaction_model()
+        item.period = datetime(2025, 1, 20)
+        item.nomenclature = source.nomenclature
+        item.storage = source.storage
+        item.range = source.range
+        item.value = 1.0
+        reposity().append(reposity.transaction_key(), item)
+        recalculated = client.post("/api/report/turnover", json=body)
+
+        # Проверка
+        assert stored == len(start.data[reposity.storage_key()])
+        assert cached.headers.get("X-Report-Cache") == "hit"
+        assert cached.get_data() == expected
+        assert recalculated.headers.get("X-Report-Cache") is None
+        assert recalculated.get_data() != expected
+        assert scheduler.next_run(now) == datetime(2025, 1, 25, 5)
+
+    # Проверить, что записи кэша не переживают перезапуск и записи за прошедшие даты удаляются при расчете
+    def test_equals_report_disk_cache_restart_and_prune(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        app = Flask(__name__)
+        report.setup_routes(app)
+        settings = settings_model()
+        settings.report_cache_path = tempfile.mkdtemp()
+        settings.precomputed_reports = [{"period": "yesterday", "format": "csv"}]
+        scheduler = report_scheduler_service(app, report, settings)
+        generation = reposity().generation()
+
+        # Действие
+        scheduler.run(datetime(2025, 1, 24, 4))
+        scheduler.run(datetime(2025, 1, 25, 4))
+        files = [name for name in os.listdir(settings.report_cache_path) if name.endswith(".cache")]
+        key = report_disk_cache.key(["turnover", scheduler.requests(datetime(2025, 1, 25, 4))[0]])
+        restarted = report_disk_cache(settings.report_cache_path)
+
+        # Проверка
+        assert len(files) == 1
+        assert scheduler.cache.get(key, generation) is not None
+        assert restarted.get(key, generation) is None
+
+    # Проверить, что рейтинг по расходу совпадает с полной сортировкой строк ОСВ
+    def test_equals_turnover_ranking_build(self):
+        # Подготовка
+        random.seed(7)
+        start = start_service()
+        start.start()
+        report = start.turnover_service
+        sources = list(start.data[reposity.transaction_key()])
+        for number in range(2):
+            storage = storage_model()
+            storage.name = f"Ресторан {number}"
+            for day in range(1, 28):
+                source = random.choice(sources)
+                item = transaction_model()
+                item.period = datetime(2025, 3, day)
+                item.nomenclature = source.nomenclature
+                item.storage = storage
+                item.range = source.range
+                item.value = float(random.choice([-1, 1]) * random.randint(1, 500)) / 10
+                reposity().append(reposity.transaction_key(), item)
+        items = report._generate_turnover_report()
+
+        # Действие
+        result = turnover_ranking("outcome", 3).build(report._generate_turnover_report(lazy=True))
+
+        # Проверка
+        assert len(result) == len({item.storage_code for item in items if item.outcome > 0})
+        for storage in result:
+            expected = sorted([item for item in items if item.storage_code == storage["storage_code"] and item.outcome > 0],
+                              key=lambda item: item.outcome, reverse=True)[:3]
+            assert [row["outcome"] for row in storage["items"]] == [item.outcome for item in expected]
+            assert [row["rank"] for row in storage["items"]] == list(range(1, len(expected) + 1))
+
+    # Проверить экранирование значений CSV с разделителем, кавычками и переводом строки
+    def test_equals_response_csv_quoting(self):
+        # Подготовка
+        names = ['Мука; высший сорт', 'Сыр "Российский"', 'Соль\nпищевая', 'Сахар']
+        data = []
+        for name in names:
+            item = group_model()
+            item.name = name
+            data.append(item)
+
+        # Действие
+        result = response_scv().build(data)
+
+        # Проверка
+        rows = list(csv.reader(io.StringIO(result), delimiter=";"))
+        assert rows[0] == ["name", "unique_code"]
+        assert [row[0] for row in rows[1:]] == names
+        assert [row[1] for row in rows[1:]] == [item.unique_code for item in data]
+
+    # Проверить пересчет в базовую единицу с другой точностью (граммы без дробной части)
+    def test_equals_range_conversion_base_quantity_scales(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        gramm = range_model.create("грамм", 1, None)
+        gramm.scale = 0
+        kill = range_model.create("киллограмм", 1000, gramm)
+        kill.scale = 3
+        reposity().append(reposity.range_key(), kill)
+        source = start.data[reposity.transaction_key()][0]
+        transactions = []
+        for value in [1.5, 0.0015, 5000000000000000.0, 5000000000000000.0]:
+            item = transaction_model()
+            item.period = datetime(2030, 1, 1)
+            item.nomenclature = source.nomenclature
+            item.storage = source.storage
+            item.range = kill
+            item.value = value
+            transactions.append(item)
+        report = start.turnover_service
+
+        # Действие
+        conversion = range_conversion([kill])
+        expected = report._build_report_items(report._group_transactions(transactions))
+        actual = report._build_report_items(turnover_numpy_engine().group_transactions(transactions))
+
+        # Проверка
+        assert conversion.base_quantity(transactions[0]) == (gramm, 1500)
+        assert conversion.base_quantity(transactions[1]) == (gramm, 2)
+        assert expected[0].quantities() == (0, 0, 10000000000000001502, 0)
+        assert actual[0].quantities() == expected[0].quantities()
 
-        
-  
 if __name__ == '__main__':
-    unittest.main()   
+    unittest.main()
@@ -4,6 +4,10 @@ import unittest
 from Src.Models.storage_model import storage_model
 import uuid
 from Src.Models.nomenclature_model import nomenclature_model
+from Src.Models.transaction_model import transaction_model
+from Src.Models.range_model import range_model
+from Src.Core.fixed_point import fixed_point
+from decimal import Decimal
 
 class test_models(unittest.TestCase):
 
@@ -95,7 +99,36 @@ class test_models(unittest.TestCase):
         # Проверки
         assert item1 == item2
 
-    
-  
+
+    # Проверить хранение количества транзакции в целых единицах без потери точности
+    def test_equals_transaction_model_quantity(self):
+        # Подготовка
+        unit = range_model.create("грамм", 1, None)
+        unit.scale = 2
+        rough = range_model.create("грамм", 1, None)
+        rough.scale = 0
+        first = transaction_model()
+        first.range = unit
+        first.value = 0.1
+        second = transaction_model()
+        second.value = 1.5
+        small = transaction_model()
+        small.range = unit
+        small.value = 0.0004
+
+        # Действие
+        second.range = rough
+        total = first.quantity + second.quantity_at(unit.scale)
+
+        # Проверка
+        assert first.quantity == 10
+        assert (second.quantity, second.scale, second.value) == (1500, 3, 1.5)
+        assert (small.quantity, small.scale, small.value) == (4, 4, 0.0004)
+        assert first.quantity_at(4) == 1000
+        assert fixed_point.to_decimal(total, unit.scale) == Decimal("1.6")
+        assert str(fixed_point.to_decimal(3000, 2)) == "30.0"
+
+
+
 if __name__ == '__main__':
-    unittest.main()   
+    unittest.main()
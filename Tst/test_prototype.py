@@ -1,10 +1,26 @@
 import unittest
 from Src.Core.prototype import prototype
+from Src.Core.common import common
 from Src.Logics.prototype_report import prototype_report
 from Src.start_service import start_service
 from Src.reposity import reposity
-from Src.Core.validator import operation_exception
+from Src.Core.validator import operation_exception, argument_exception
 from Src.Dtos.filter_dto import filter_dto
+from Src.Core.universal_prototype import universal_prototype
+from Src.Core.filter_type import FilterType
+from Src.Models.group_model import group_model
+from Src.Dtos.universal_filter_dto import universal_filter_dto
+from Src.Core.lazy_query import lazy_query
+from Src.Dtos.sorting_dto import sorting_dto
+from Src.Dtos.aggregation_dto import aggregation_dto
+from Src.Core.query_profile import query_profile
+from Src.Core.bk_tree import bk_tree
+from Src.Core.period_index import period_index
+from Src.Core.sharded_executor import sharded_executor
+import Src.Core.sharded_executor as sharded_module
+import pickle
+import operator
+import random
 
 class test_prototype(unittest.TestCase):
 
@@ -46,6 +62,432 @@ class test_prototype(unittest.TestCase):
         # Проверка
         assert len(next_prototype.data) == 1 
 
+    # Проверить, что строковый фильтр сравнивает ключи поиска без учета регистра и ё/е
+    def test_casefold_universal_prototype_filter_by_name(self):
+        # Подготовка
+        data = []
+        for name in [ "Ёжики в тумане", "STRASSE", "Мука" ]:
+            item = group_model()
+            item.name = name
+            data.append( item )
+        start_prototype = universal_prototype( data )
+
+        # Действие
+        yo_prototype = start_prototype.filter_by_name( "ежики", FilterType.LIKE )
+        sharp_prototype = start_prototype.filter_by_name( "Straße", FilterType.EQUALS )
+
+        # Проверка
+        assert len(yo_prototype.data) == 1
+        assert yo_prototype.data[0].name == "Ёжики в тумане"
+        assert len(sharp_prototype.data) == 1
+
+    # Проверить пересчет ключа поиска при смене наименования
+    def test_refresh_entity_model_search_key(self):
+        # Подготовка
+        item = group_model.create("Мёд")
+
+        # Действие
+        item.name = "  Сахар "
+
+        # Проверка
+        assert item.search_key == "сахар"
+        assert "search_key" not in common.get_fields( item )
+
+    # Проверить, что диапазон по периоду через индекс совпадает с полным перебором
+    def test_equals_universal_prototype_filter_transaction_period_index(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        repo = reposity()
+        transactions = start.data[ reposity.transaction_key() ]
+        dto = universal_filter_dto()
+        dto.model_type = "transaction"
+        dto.field_name = "period"
+        dto.filter_type = FilterType.BETWEEN
+        dto.value = "2025-01-05"
+        dto.value_to = "2025-01-20"
+
+        # Действие
+        indexed = universal_prototype( transactions, repo.transaction_index() ).apply_filter( dto )
+        scanned = universal_prototype( transactions ).apply_filter( dto )
+
+        # Проверка
+        assert len(indexed.data) > 0
+        assert len(indexed.data) < len(transactions)
+        assert indexed.data == scanned.data
+
+    # Проверить, что некорректная дата отклоняется одинаково при поиске по индексу и перебором
+    def test_equals_universal_prototype_filter_invalid_date(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        repo = reposity()
+        transactions = list( reversed( start.data[ reposity.transaction_key() ] ) )
+        dto = universal_filter_dto()
+        dto.model_type = "transaction"
+        dto.field_name = "period"
+        dto.filter_type = FilterType.GREATER_OR_EQUALS
+        dto.value = "2025-02-30"
+        nested = universal_filter_dto()
+        nested.model_type = "transaction"
+        nested.nested_field = "period"
+        nested.filter_type = FilterType.GREATER_OR_EQUALS
+        nested.value = "2025-02-30"
+
+        # Действие / Проверка
+        for start_prototype, filter_dto in [ ( universal_prototype( transactions, period_index( transactions ) ), dto ),
+                                             ( universal_prototype( transactions ), dto ),
+                                             ( universal_prototype( transactions ), nested ) ]:
+            with self.assertRaises( argument_exception ):
+                start_prototype.apply_filter( filter_dto ).data
+        dto.value = "2025-01-10"
+        assert universal_prototype( transactions, period_index( transactions ) ).apply_filter( dto ).data == \
+            universal_prototype( transactions ).apply_filter( dto ).data
+
+    # Проверить типизированное сравнение по числовому полю транзакции
+    def test_any_universal_prototype_filter_transaction_value(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        transactions = start.data[ reposity.transaction_key() ]
+        dto = universal_filter_dto()
+        dto.model_type = "transaction"
+        dto.field_name = "value"
+        dto.filter_type = FilterType.LESS_OR_EQUALS
+        dto.value = "0"
+
+        # Действие
+        result = universal_prototype( transactions ).apply_filter( dto )
+
+        # Проверка
+        assert len(result.data) > 0
+        assert all(item.value <= 0 for item in result.data)
+
+    # Проверить, что пакетная фильтрация дает те же результаты, что и фильтры по отдельности
+    def test_equals_universal_prototype_apply_filters(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        nomenclatures = start.data[ reposity.nomenclature_key() ]
+        filters = []
+        for value in [ "мука", "сахар", "а" ]:
+            dto = universal_filter_dto()
+            dto.model_type = "nomenclature"
+            dto.field_name = "name"
+            dto.filter_type = FilterType.LIKE
+            dto.value = value
+            filters.append( dto )
+        start_prototype = universal_prototype( nomenclatures )
+
+        # Действие
+        results = start_prototype.apply_filters( filters )
+
+        # Проверка
+        assert len(results) == len(filters)
+        for dto, result in zip( filters, results ):
+            assert result.data == start_prototype.apply_filter( dto ).data
+
+    # Проверить, что ошибка одного фильтра пакета возвращается по его ключу, а повторяющиеся ключи отклоняются
+    def test_equals_filter_batch_errors_per_id(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        service = start.filter_service
+        requests = [
+            { "id": "flour", "model_type": "nomenclature", "field_name": "name", "filter_type": "like", "value": "мука", "count_only": True },
+            { "id": "range", "model_type": "transaction", "field_name": "value", "filter_type": "between", "value": "1" },
+            { "id": "date", "model_type": "transaction", "field_name": "period", "filter_type": "greater_or_equals", "value": "2025-13-45" }
+        ]
+
+        # Действие
+        results = service._filter_batch( requests, "csv" )
+
+        # Проверка
+        assert list(results.keys()) == [ "flour", "range", "date" ]
+        assert results["flour"]["items_count"] > 0
+        assert "error" in results["range"]
+        assert "error" in results["date"]
+        with self.assertRaises( argument_exception ):
+            service._filter_batch( [ requests[0], dict( requests[1], id = "flour" ) ], "csv" )
+
+    # Проверить, что цепочка фильтров прототипа выполняется один раз и только при обращении к данным
+    def test_lazy_prototype_report_filter_chain(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        transactions = start.data[ reposity.transaction_key() ]
+        first_nomenclature = transactions[0].nomenclature
+        visited = []
+        start_prototype = prototype_report( transactions )
+
+        # Действие
+        query = start_prototype.query().filter( lambda item: visited.append(item) is None )
+        next_prototype = start_prototype.clone_query( query )
+        next_prototype = prototype_report.filter_by_nomenclature( next_prototype, first_nomenclature )
+        before = len(visited)
+        result = next_prototype.data
+
+        # Проверка
+        assert before == 0
+        assert len(visited) == len(transactions)
+        assert len(result) > 0
+        assert all( item.nomenclature == first_nomenclature for item in result )
+
+    # Проверить, что limit прекращает просмотр источника
+    def test_shortCircuit_lazy_query_limit(self):
+        # Подготовка
+        visited = []
+        query = lazy_query( range(1000) )
+
+        # Действие
+        result = query.filter( lambda x: visited.append(x) is None and x % 2 == 0 ).map( lambda x: x * 10 ).limit( 3 ).to_list()
+
+        # Проверка
+        assert result == [0, 20, 40]
+        assert len(visited) == 5
+
+    # Проверить, что выбор первых K через кучу совпадает с полной сортировкой
+    def test_equals_lazy_query_sort_limit(self):
+        # Подготовка
+        random.seed( 7 )
+        data = [ random.randint(0, 50) for _ in range(500) ]
+
+        for count in [ 0, 1, 5, 200, 1000 ]:
+            # Действие
+            ascending = lazy_query( data ).sort().limit( count ).to_list()
+            descending = lazy_query( data ).sort( reverse=True ).limit( count ).to_list()
+
+            # Проверка
+            assert ascending == sorted(data)[:count]
+            assert descending == sorted(data, reverse=True)[:count]
+
+    # Проверить сортировку прототипа по вложенному полю с ограничением количества
+    def test_top_prototype_order_by_nested_field(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        transactions = start.data[ reposity.transaction_key() ]
+        sorting = sorting_dto().create( { "sort_by": "nomenclature.name", "descending": True, "top": 2 } )
+        text = universal_filter_dto()
+        text.value = "текст"
+        mixed = sorting_dto().create( { "sort_by": "value" } )
+
+        # Действие
+        result = prototype_report( transactions ).order( sorting ).data
+
+        # Проверка
+        names = sorted( ( item.nomenclature.search_key for item in transactions ), reverse = True )
+        assert len(result) == 2
+        assert [ item.nomenclature.search_key for item in result ] == names[:2]
+        with self.assertRaises( argument_exception ):
+            prototype_report( [ text, transactions[0] ] ).order( mixed ).data
+
+    # Проверить агрегацию транзакций с группировкой по вложенному полю
+    def test_sum_universal_prototype_aggregate(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        transactions = start.data[ reposity.transaction_key() ]
+        dto = aggregation_dto().create( {
+            "group_by": [ "nomenclature.name" ],
+            "aggregates": [ { "function": "count" }, { "function": "sum", "field": "value" }, { "function": "max", "field": "value" } ] } )
+
+        # Действие
+        rows = universal_prototype( transactions ).aggregate( dto )
+
+        # Проверка
+        assert sum( row["count"] for row in rows ) == len(transactions)
+        for row in rows:
+            items = [ item for item in transactions if item.nomenclature.name == row["nomenclature.name"] ]
+            assert abs( row["sum(value)"] - sum( item.value for item in items ) ) < 1e-9
+            assert row["max(value)"] == max( item.value for item in items )
+
+    # Проверить, что агрегаты по нечисловым полям и группировка по списку отклоняются
+    def test_sum_universal_prototype_aggregate_invalid(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        transactions = start.data[ reposity.transaction_key() ]
+        receipts = start.data[ reposity.receipt_key() ]
+        requests = [
+            ( transactions, { "aggregates": [ { "function": "sum", "field": "nomenclature" } ] } ),
+            ( transactions, { "aggregates": [ { "function": "sum", "field": "nomenclature.name" } ] } ),
+            ( transactions, { "aggregates": [ { "function": "max", "field": "storage" } ] } ),
+            ( receipts, { "group_by": [ "composition" ] } )
+        ]
+
+        # Действие / Проверка
+        for data, request in requests:
+            with self.assertRaises( argument_exception ):
+                universal_prototype( data ).aggregate( aggregation_dto().create( request ) )
+
+    # Проверить, что профиль запроса фиксирует путь доступа и количество строк
+    def test_plan_universal_prototype_apply_filter_explain(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        repo = reposity()
+        transactions = start.data[ reposity.transaction_key() ]
+        period_dto = universal_filter_dto()
+        period_dto.model_type = "transaction"
+        period_dto.field_name = "period"
+        period_dto.filter_type = FilterType.GREATER_OR_EQUALS
+        period_dto.value = "2025-01-12"
+        name_dto = universal_filter_dto()
+        name_dto.model_type = "transaction"
+        name_dto.nested_field = "nomenclature.name"
+        name_dto.filter_type = FilterType.LIKE
+        name_dto.value = "мука"
+        profile = query_profile()
+
+        # Действие
+        with profile.stage( "filtering" ):
+            result = universal_prototype( transactions, repo.transaction_index() ) \
+                .apply_filter( period_dto, profile ) \
+                .apply_filter( name_dto, profile ).data
+        explain = profile.to_dict()
+
+        # Проверка
+        assert [ step["access_path"] for step in explain["plan"] ] == [ "period_index", "full_scan" ]
+        assert explain["plan"][1]["rows_examined"] == explain["plan"][0]["rows_returned"]
+        assert explain["rows_returned"] == len(result)
+        assert "filtering" in explain["timings_ms"]
+
+    # Проверить, что поиск в BK-дереве совпадает с полным перебором
+    def test_equals_bk_tree_search(self):
+        # Подготовка
+        random.seed( 7 )
+        words = [ "".join( random.choice("абвгд") for _ in range( random.randint(1, 7) ) ) for _ in range(300) ]
+        tree = bk_tree( words, lambda word: word )
+
+        for query in [ "абв", "гдгд", "а", "вввввв" ]:
+            # Действие
+            found = tree.search( query, 2 )
+
+            # Проверка
+            expected = sorted( word for word in words if bk_tree.distance( query, word ) <= 2 )
+            assert sorted( word for _, word in found ) == expected
+            assert [ distance for distance, _ in found ] == sorted( distance for distance, _ in found )
+
+    # Проверить нечеткий поиск номенклатуры по наименованию с опечаткой
+    def test_fuzzy_universal_prototype_filter_by_name(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        repo = reposity()
+        nomenclatures = start.data[ reposity.nomenclature_key() ]
+        dto = universal_filter_dto()
+        dto.model_type = "nomenclature"
+        dto.field_name = "name"
+        dto.filter_type = FilterType.FUZZY
+        dto.value = "ПШЕНИЧНАЯ МУККА"
+
+        # Действие
+        indexed = universal_prototype( nomenclatures, name_index=repo.nomenclature_name_index() ).apply_filter( dto )
+        scanned = universal_prototype( nomenclatures ).apply_filter( dto )
+
+        # Проверка
+        assert len(indexed.data) == 1
+        assert indexed.data[0].name == "Пшеничная мука"
+        assert indexed.data == scanned.data
+
+    # Проверить нечеткий поиск после переименования, ранжирование в пакете и проверку max_distance
+    def test_fuzzy_universal_prototype_renamed_and_batch(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        repo = reposity()
+        nomenclatures = start.data[ reposity.nomenclature_key() ]
+        before = repo.nomenclature_name_index()
+        renamed = [ item for item in nomenclatures if item.name == "Пшеничная мука" ][0]
+        renamed.name = "Ржаная мука"
+        dto = universal_filter_dto()
+        dto.model_type = "nomenclature"
+        dto.field_name = "name"
+        dto.filter_type = FilterType.FUZZY
+        dto.max_distance = 5
+        dto.value = "РЖАНАЯ МУКК"
+
+        # Действие
+        start_prototype = universal_prototype( nomenclatures, name_index=repo.nomenclature_name_index() )
+        single = start_prototype.apply_filter( dto )
+        batch = start_prototype.apply_filters( [ dto ] )[0]
+
+        # Проверка
+        assert repo.nomenclature_name_index() is not before
+        assert single.data[0] is renamed
+        assert batch.data == single.data
+        assert batch.data == universal_prototype( nomenclatures ).apply_filter( dto ).data
+        with self.assertRaises( argument_exception ):
+            dto.max_distance = -1
+
+    # Проверить, что параллельная фильтрация по шардам совпадает с последовательной
+    def test_equals_universal_prototype_filter_sharded(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        transactions = start.data[ reposity.transaction_key() ]
+        executor = sharded_executor( transactions, shard_count = 3, workers = 2 )
+        dto = universal_filter_dto()
+        dto.model_type = "transaction"
+        dto.nested_field = "nomenclature.name"
+        dto.filter_type = FilterType.LIKE
+        dto.value = "мука"
+
+        # Действие
+        parallel = universal_prototype( transactions, executor = executor ).apply_filter( dto )
+        sequential = universal_prototype( transactions ).apply_filter( dto )
+
+        # Проверка
+        assert executor.shard_count == 3
+        assert len(parallel.data) > 0
+        assert parallel.data == sequential.data
+
+    # Проверить, что процесс-исполнитель запрашивает шард один раз и хранит шарды нескольких наборов
+    def test_equals_sharded_executor_worker_cache(self):
+        # Подготовка
+        sharded_module._worker_shards.clear()
+        payload = pickle.dumps([1, 5, 10])
+        predicate = operator.ge
+
+        # Действие
+        missing = sharded_module._match_shard("first", "value", 0, None, predicate, 5)
+        loaded = sharded_module._match_shard("first", "value", 0, payload, predicate, 5)
+        other = sharded_module._match_shard("second", "value", 0, payload, predicate, 1)
+        cached = sharded_module._match_shard("first", "value", 0, None, predicate, 5)
+
+        # Проверка
+        assert missing is None
+        assert loaded == [1, 2]
+        assert other == [0, 1, 2]
+        assert cached == [1, 2]
+        sharded_module._worker_shards.clear()
+
+    # Проверить, что шарды репозитория перестраиваются после переименования номенклатуры
+    def test_equals_reposity_sharded_renamed(self):
+        # Подготовка
+        start = start_service()
+        start.start()
+        repo = reposity()
+        transactions = start.data[ reposity.transaction_key() ]
+        dto = universal_filter_dto()
+        dto.model_type = "transaction"
+        dto.nested_field = "nomenclature.name"
+        dto.filter_type = FilterType.LIKE
+        dto.value = "сахарная мука"
+        before = repo.sharded( reposity.transaction_key() )
+        universal_prototype( transactions, executor = before ).apply_filter( dto )
+
+        # Действие
+        transactions[3].nomenclature.name = "Сахарная мука"
+        after = repo.sharded( reposity.transaction_key() )
+        parallel = universal_prototype( transactions, executor = after ).apply_filter( dto )
+
+        # Проверка
+        assert repo.sharded( reposity.transaction_key() ) is after
+        assert after is not before
+        assert len(parallel.data) > 0
+        assert parallel.data == universal_prototype( transactions ).apply_filter( dto ).data
 
      
   
@@ -2,6 +2,7 @@ from Src.start_service import start_service
 from Src.Logics.markdown_response import markdown_response
 from Src.reposity import reposity
 from Src.Logics.response_markdown import response_markdown
+from Src.Models.group_model import group_model
 import unittest
 
 # Набор тестов для проверки формирования данных
@@ -24,6 +25,27 @@ class test_responses(unittest.TestCase):
         assert len(result) > 0
         print(result)
 
+    # Проверить, что markdown_response выводит все элементы, как response_markdown
+    def test_equals_markdown_response_build(self):
+        # Подготовка
+        data = []
+        for number in range(150):
+            item = group_model()
+            item.name = f"Группа {number}"
+            data.append(item)
+
+        # Действие
+        result = markdown_response().build(data)
+        chunks = list(response_markdown().iter_build(iter(data)))
+
+        # Проверка
+        lines = result.splitlines()
+        assert result == response_markdown().build(data)
+        assert result == "".join(chunks)
+        assert len(lines) == len(data) + 3
+        assert lines[-1] == f"| {data[-1].name} | {data[-1].unique_code} |"
+        assert len(chunks) > 2
+
   
 if __name__ == '__main__':
     unittest.main()  
\ No newline at end of file
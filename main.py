@@ -1,6 +1,8 @@
 from flask import request
 import connexion
 from Src.start_service import start_service
+from Src.settings_manager import settings_manager
+from Src.Logics.report_scheduler_service import report_scheduler_service
 
 # Инициализируем сервисы
 service = start_service()
@@ -14,6 +16,16 @@ service.filter_service.setup_routes(app.app)
 # Настраиваем роуты ОСВ
 service.turnover_service.setup_routes(app.app)
 
+# Настраиваем роуты остатков
+service.stock_service.setup_routes(app.app)
+
+# Предварительный расчет стандартных отчетов по расписанию
+manager = settings_manager()
+manager.file_name = "settings.json"
+manager.load()
+scheduler = report_scheduler_service(app.app, service.turnover_service, manager.settings)
+scheduler.start()
+
 """
 Проверить доступность REST API
 """